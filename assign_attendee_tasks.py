@@ -1,12 +1,14 @@
+import atexit
 import json
 import logging
-import os
 import sys
 from pprint import pprint
 
 import requests
 from taiga import TaigaAPI
 
+from util import bulk_tasks, lease
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 # Set urllib3 logging level to INFO to reduce noise when individual modules are set to debug
@@ -22,28 +24,16 @@ if "--import" in sys.argv:
     import_from_tidyhq = True
 
 
-# Look for --force flag
+# Look for --dry-run flag, count the tasks that would be assigned without changing them
+dry_run = False
+if "--dry-run" in sys.argv:
+    dry_run = True
+
+# Look for --force flag, take over any leases held by attendee runs
 force = False
 if "--force" in sys.argv:
     force = True
 
-# Look for a attendee.lock file
-if not force:
-    try:
-        with open("attendee.lock") as f:
-            setup_logger.error(
-                "attendee.lock found. Exiting to prevent concurrent runs"
-            )
-            sys.exit(1)
-    except FileNotFoundError:
-        pass
-
-# Create main.lock file
-with open("attendee.lock", "w") as f:
-    f.write("")
-    setup_logger.info("attendee.lock created")
-
-
 # Load config
 try:
     with open("config.json") as f:
@@ -70,6 +60,16 @@ if not all(
     )
     sys.exit(1)
 
+# Take a lease on the whole board so attendee runs don't change tasks underneath us
+lease_ttl = config.get("lease_ttl", 600)
+lease_id = lease.acquire(ttl=lease_ttl, force=force)
+if not lease_id:
+    setup_logger.error("Another run is processing the board. Exiting")
+    sys.exit(1)
+heartbeat = lease.heartbeat(lease_id, ttl=lease_ttl)
+atexit.register(lease.release, lease_id)
+atexit.register(heartbeat.set)
+
 # Check for cache expiry and set if not present
 if "cache_expiry" not in config:
     config["cache_expiry"] = 86400
@@ -150,7 +150,7 @@ setup_logger.info(f"Retrieved {len(all_tasks)} tasks from project")
 # Really we should be looking for the bot-managed tag on the user story here
 # but that seems pretty intensive so we're ignoring it for now
 
-changes = 0
+changes = []
 
 for task in all_tasks:
     logger.debug(f"Checking task: {task.subject} for story: {task.user_story}")
@@ -169,28 +169,24 @@ for task in all_tasks:
         continue
 
     # Assign the task to the user specified in the template
-    # Completed via the Taiga api directly
-    task_assigned_to = task_assignee[task.subject]
-    logger.info(f"Assigning {task.subject} to {task_assigned_to}")
-    url = f"{config['taiga']['url']}/api/v1/tasks/{task.id}"
-    data = {"assigned_to": int(task_assigned_to), "version": task.version}
-    response = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
-        json=data,
+    logger.debug(f"Assigning {task.subject} to {task_assignee[task.subject]}")
+    changes.append(
+        (task.id, task.version, {"assigned_to": int(task_assignee[task.subject])})
     )
 
-    if response.status_code != 200:
-        logger.error(f"Failed to assign {task.subject}: {response.status_code}")
-        logger.error(response.text)
-        sys.exit()
-        continue
-
-    logger.info(f"Assigned {task.subject} to {task_assigned_to}")
-    changes += 1
-
-
-logger.info(f"Assigned {changes} tasks")
+results = bulk_tasks.apply_changes(
+    config=config,
+    taiga_auth_token=taiga_auth_token,
+    changes=changes,
+    dry_run=dry_run,
+    progress=lambda done, total: logger.info(f"Processed {done}/{total} tasks"),
+    # Don't overwrite anyone assigned since the tasks were listed
+    still_applies=lambda current: not current["assigned_to"],
+)
 
-# Clean up the lock file
-os.remove("attendee.lock")
+if dry_run:
+    logger.info(f"Would assign {results['planned']} tasks")
+else:
+    logger.info(
+        f"Assigned {results['succeeded']} tasks, {results['skipped']} changed in the meantime, {results['failed']} failed"
+    )
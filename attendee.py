@@ -1,13 +1,21 @@
+import atexit
 import json
 import logging
-import os
 import sys
 from pprint import pprint
 
 import requests
 from taiga import TaigaAPI
 
-from util import conditional_closing, intake, taiga_janitor, tasks, tidyhq
+from util import (
+    boards,
+    conditional_closing,
+    intake,
+    lease,
+    taiga_janitor,
+    tasks,
+    tidyhq,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -25,27 +33,39 @@ if "--import" in sys.argv:
     import_from_tidyhq = True
 
 
-# Look for --force flag
+# Look for --simulate flag, work out every change against one snapshot of the board then write them all at once
+simulate = False
+if "--simulate" in sys.argv:
+    simulate = True
+
+# Look for --force flag, take over any leases held by other runs
 force = False
 if "--force" in sys.argv:
     force = True
 
-# Look for a attendee.lock file
-if not force:
+# Look for --shard i/n flag, only process stories whose ID is i modulo n
+shard, shards = 0, 1
+if "--shard" in sys.argv:
     try:
-        with open("attendee.lock") as f:
-            setup_logger.error(
-                "attendee.lock found. Exiting to prevent concurrent runs"
-            )
-            sys.exit(1)
-    except FileNotFoundError:
-        pass
-
-# Create main.lock file
-with open("attendee.lock", "w") as f:
-    f.write("")
-    setup_logger.info("attendee.lock created")
-
+        shard, shards = map(int, sys.argv[sys.argv.index("--shard") + 1].split("/"))
+    except (IndexError, ValueError):
+        setup_logger.error("--shard must be given as i/n, e.g. --shard 0/4")
+        sys.exit(1)
+    if not 0 <= shard < shards:
+        setup_logger.error(f"Shard {shard} is outside 0-{shards - 1}")
+        sys.exit(1)
+    if not simulate:
+        setup_logger.error("--shard is only supported with --simulate")
+        sys.exit(1)
+
+# Look for --wait flag, wait up to this many seconds for overlapping runs to finish instead of skipping
+wait = 0
+if "--wait" in sys.argv:
+    try:
+        wait = float(sys.argv[sys.argv.index("--wait") + 1])
+    except (IndexError, ValueError):
+        setup_logger.error("--wait must be given a number of seconds")
+        sys.exit(1)
 
 # Load config
 try:
@@ -73,6 +93,37 @@ if not all(
     )
     sys.exit(1)
 
+# Work out which boards to process, only the simulated pipeline can handle more than the Attendee board
+board_list = boards.board_configs(config)
+if board_list is None:
+    setup_logger.error(
+        "Missing status or custom attribute IDs in boards. Check config.json"
+    )
+    sys.exit(1)
+if not simulate and [board["name"] for board in board_list] != ["Attendee"]:
+    setup_logger.error("Boards other than Attendee are only supported with --simulate")
+    sys.exit(1)
+
+# Take a lease on our part of each board, leases expire so a crashed run can't block later ones
+lease_ttl = config.get("lease_ttl", 600)
+for board in board_list:
+    lease_id = lease.acquire(
+        board=board["name"],
+        shard=shard,
+        shards=shards,
+        ttl=lease_ttl,
+        wait=wait,
+        force=force,
+    )
+    if not lease_id:
+        setup_logger.info(
+            f"Another run is processing this part of the {board['name']} board, skipping"
+        )
+        sys.exit(0)
+    heartbeat = lease.heartbeat(lease_id, ttl=lease_ttl)
+    atexit.register(lease.release, lease_id)
+    atexit.register(heartbeat.set)
+
 # Check for cache expiry and set if not present
 if "cache_expiry" not in config:
     config["cache_expiry"] = 86400
@@ -100,47 +151,126 @@ else:
 taigacon = TaigaAPI(host=config["taiga"]["url"], token=taiga_auth_token)
 
 
-# Find the Attendee project
-projects = taigacon.projects.list()
-attendee_project = None
-for project in projects:
-    if project.name == "Attendee":
-        attendee_project = project
-        break
-
-if not attendee_project:
-    setup_logger.error("Attendee project not found")
-    sys.exit(1)
+# Set up TidyHQ cache
+tidyhq_cache = tidyhq.fresh_cache(config=config)
+setup_logger.info(
+    f"TidyHQ cache set up: {len(tidyhq_cache['contacts'])} contacts, {len(tidyhq_cache['groups'])} groups"
+)
 
-setup_logger.debug(f"Attendee project found: {attendee_project.id}")
 
-# Reconstruct status IDs because the Taiga API endpoint for them doesn't work
-statuses = {}
+# Look for --plan flag, show which tasks would be ticked off for each contact without touching Taiga
+if "--plan" in sys.argv:
+    contact_ids = boards.managed_contacts(
+        taigacon=taigacon,
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        boards=board_list,
+    )
+    if contact_ids is None:
+        setup_logger.error("Failed to read the bot managed stories")
+        sys.exit(1)
+    eligibility = tasks.eligibility_matrix(
+        config=config, tidyhq_cache=tidyhq_cache, contact_ids=contact_ids
+    )
+    print(
+        json.dumps(
+            {
+                contact_id: completed
+                for contact_id in eligibility["contacts"]
+                if (completed := tasks.eligible_tasks(eligibility, contact_id))
+            },
+            indent=4,
+        )
+    )
+    sys.exit(0)
 
-# Get all user stories in the Attendee project
-stories = taigacon.user_stories.list(project=attendee_project.id)
-for story in stories:
-    statuses[story.status] = None
+if simulate:
+    # Every board is processed in its own worker sharing the cache loaded above
+    review = "--review" in sys.argv
+    board_results = boards.run_boards(
+        boards=board_list,
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        tidyhq_cache=tidyhq_cache,
+        options={
+            "import": import_from_tidyhq,
+            "review": review,
+            "shard": shard,
+            "shards": shards,
+        },
+    )
 
-# Get information about each status
-for status in statuses.keys():
-    status_info = taigacon.user_story_statuses.get(status)
-    statuses[status] = status_info.to_dict()
+    # Look for --review flag, show the planned writes without making them
+    if review:
+        print(
+            json.dumps(
+                {
+                    name: result["plan"] if result else None
+                    for name, result in board_results.items()
+                },
+                indent=4,
+            )
+        )
+        sys.exit(0)
+
+    for name, result in board_results.items():
+        if not result:
+            loop_logger.error(f"Failed to process the {name} board")
+            continue
+        loop_logger.info(
+            f"{name}: settled after {result['plan']['iterations']} iterations, {result['results']['succeeded']} writes succeeded, {result['results']['skipped']} skipped, {result['results']['failed']} failed"
+        )
 
-story_statuses = statuses
+    # Another run may have taken over, leave compaction and housekeeping to it
+    if lease.lost.is_set():
+        loop_logger.error("Lease lost part way through the run, stopping")
+        sys.exit(1)
+
+    taiga_janitor.compact_template_actions()
+
+    # Add helper fields to user stories
+    # This covers whole boards so only the first shard does it
+    if shard == 0:
+        postloop_logger.info("Adding helper fields to user stories")
+        for board in board_list:
+            result = board_results[board["name"]]
+            if result:
+                taiga_janitor.add_useful_fields(
+                    taigacon=taigacon,
+                    project_id=result["project_id"],
+                    taiga_auth_token=taiga_auth_token,
+                    config=config,
+                    tidyhq_cache=tidyhq_cache,
+                    attributes=board["attributes"],
+                )
+
+    sys.exit(0 if all(board_results.values()) else 1)
 
-# Get possible task statuses
+# Find the Attendee project
+attendee_board = boards.load_board(taigacon, "Attendee")
+if not attendee_board:
+    setup_logger.error("Attendee project not found")
+    sys.exit(1)
 
-statuses = taigacon.task_statuses.list(project=attendee_project.id)
-task_statuses = {task.id: task.name for task in statuses}
+attendee_project_id = attendee_board["project_id"]
+story_statuses = attendee_board["story_statuses"]
+task_statuses = attendee_board["task_statuses"]
+setup_logger.debug(f"Attendee project found: {attendee_project_id}")
 
-# Set up TidyHQ cache
-tidyhq_cache = tidyhq.fresh_cache(config=config)
+# Work out which automatic tasks the contacts on the board have completed in one pass over the cache
+contact_ids = boards.managed_contacts(
+    taigacon=taigacon,
+    config=config,
+    taiga_auth_token=taiga_auth_token,
+    boards=board_list,
+)
+eligibility = tasks.eligibility_matrix(
+    config=config, tidyhq_cache=tidyhq_cache, contact_ids=contact_ids or []
+)
 setup_logger.info(
-    f"TidyHQ cache set up: {len(tidyhq_cache['contacts'])} contacts, {len(tidyhq_cache['groups'])} groups"
+    f"Eligibility evaluated for {len(eligibility['contacts'])} contacts across {len(eligibility['tasks'])} tasks"
 )
 
-
 # Enter processing loop
 email_mapping_changes = 0
 intake_from_tidyhq = 0
@@ -165,6 +295,10 @@ while (
     or progress_on_tidyhq
     or progress_on_membership
 ):
+    if lease.lost.is_set():
+        loop_logger.error("Lease lost part way through the run, stopping")
+        sys.exit(1)
+
     if not first:
         loop_logger.info(f"Iteration: {iteration}")
         # Show which modules made changes in the last iteration
@@ -210,7 +344,7 @@ while (
         tidyhq_cache=tidyhq_cache,
         taigacon=taigacon,
         taiga_auth_token=taiga_auth_token,
-        project_id=attendee_project.id,
+        project_id=attendee_project_id,
     )
     loop_logger.info(f"Changes: {email_mapping_changes}")
 
@@ -222,7 +356,7 @@ while (
             tidyhq_cache=tidyhq_cache,
             taigacon=taigacon,
             taiga_auth_token=taiga_auth_token,
-            project_id=attendee_project.id,
+            project_id=attendee_project_id,
         )
         loop_logger.info(f"Changes: {intake_from_tidyhq}")
     else:
@@ -231,7 +365,7 @@ while (
     # Sync templates
     loop_logger.info("Syncing templates")
     template_changes = taiga_janitor.sync_templates(
-        taigacon=taigacon, project_id=attendee_project.id
+        taigacon=taigacon, project_id=attendee_project_id
     )
     loop_logger.info(f"Changes: {template_changes}")
 
@@ -242,8 +376,9 @@ while (
         taiga_auth_token=taiga_auth_token,
         config=config,
         tidyhq_cache=tidyhq_cache,
-        project_id=attendee_project.id,
+        project_id=attendee_project_id,
         task_statuses=task_statuses,
+        eligibility=eligibility,
     )
     loop_logger.info(f"Changes: {task_changes}")
 
@@ -251,7 +386,7 @@ while (
     loop_logger.info("Progressing user stories")
     progress_changes = taiga_janitor.progress_stories(
         taigacon=taigacon,
-        project_id=attendee_project.id,
+        project_id=attendee_project_id,
         taiga_auth_token=taiga_auth_token,
         config=config,
         story_statuses=story_statuses,
@@ -263,7 +398,7 @@ while (
     loop_logger.info("Checking for tasks that can be closed based on story order")
     closed_by_order = conditional_closing.close_by_order(
         taigacon=taigacon,
-        project_id=attendee_project.id,
+        project_id=attendee_project_id,
         config=config,
         taiga_auth_token=taiga_auth_token,
         story_statuses=story_statuses,
@@ -276,7 +411,7 @@ while (
     )
     progress_on_tidyhq = taiga_janitor.progress_on_tidyhq(
         taigacon=taigacon,
-        project_id=attendee_project.id,
+        project_id=attendee_project_id,
         taiga_auth_token=taiga_auth_token,
         config=config,
         story_statuses=story_statuses,
@@ -289,7 +424,7 @@ while (
     )
     progress_on_membership = taiga_janitor.progress_on_membership(
         taigacon=taigacon,
-        project_id=attendee_project.id,
+        project_id=attendee_project_id,
         taiga_auth_token=taiga_auth_token,
         config=config,
         story_statuses=story_statuses,
@@ -306,12 +441,12 @@ while (
 postloop_logger.info("Adding helper fields to user stories")
 taiga_janitor.add_useful_fields(
     taigacon=taigacon,
-    project_id=attendee_project.id,
+    project_id=attendee_project_id,
     taiga_auth_token=taiga_auth_token,
     config=config,
     tidyhq_cache=tidyhq_cache,
 )
 
-# Delete main.lock
-postloop_logger.info("Removing attendee.lock")
-os.remove("attendee.lock")
+postloop_logger.info(
+    f"Task checks: {tasks.check_stats['matrix']} from the eligibility matrix, {tasks.check_stats['hits']} reused, {tasks.check_stats['misses']} evaluated"
+)
@@ -0,0 +1,80 @@
+"""Micro-benchmark for block construction.
+
+Compares the cost per block of the old deepcopy based add_block/inject_text helpers against
+the current block_builder based implementation. Doesn't need a config file or network access.
+
+Usage: python block_timing.py [repeats]
+"""
+
+import sys
+import timeit
+from copy import deepcopy
+
+from slack import block_builder, block_formatters, blocks
+
+
+def legacy_inject_text(block_list: list, text: str) -> list[dict]:
+    block_list = deepcopy(block_list)
+    if block_list[-1]["type"] in ["section", "header", "button"]:
+        block_list[-1]["text"]["text"] = text
+    elif block_list[-1]["type"] in ["context"]:
+        block_list[-1]["elements"][0]["text"] = text
+    return block_list
+
+
+def legacy_add_block(block_list: list, block: dict | list) -> list[dict]:
+    block = deepcopy(block)
+    block_list = deepcopy(block_list)
+    if type(block) == list:
+        block_list += block
+    elif type(block) == dict:
+        block_list.append(block)
+
+    if len(block_list) > 100:
+        raise ValueError("Block list too long")
+
+    return block_list
+
+
+def legacy_view(size: int) -> list[dict]:
+    """Build a view the way format_tasks used to, one text block with a button per item."""
+    block_list = []
+    for i in range(size):
+        block_list = legacy_add_block(block_list, blocks.text)
+        block_list = legacy_inject_text(block_list, f"• Item {i}")
+        button = deepcopy(blocks.button)
+        button["text"]["text"] = "View/Edit"
+        button["action_id"] = f"viewedit-1-task-{i}"
+        block_list[-1]["accessory"] = button
+    return block_list
+
+
+def current_view(size: int) -> list[dict]:
+    block_list = []
+    for i in range(size):
+        block_list = block_formatters.add_block(block_list, blocks.text)
+        block_list = block_formatters.inject_text(block_list, f"• Item {i}")
+        block_list[-1]["accessory"] = block_builder.button(
+            text="View/Edit", action_id=f"viewedit-1-task-{i}"
+        )
+    return block_list
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    assert legacy_view(10) == current_view(
+        10
+    ), "Implementations produce different blocks"
+
+    print(
+        f"{'blocks':>6} {'deepcopy us/block':>18} {'builder us/block':>17} {'speedup':>8}"
+    )
+    for size in [10, 25, 50, 100]:
+        legacy = timeit.timeit(lambda: legacy_view(size), number=repeats)
+        current = timeit.timeit(lambda: current_view(size), number=repeats)
+        legacy_per_block = legacy / repeats / size * 1_000_000
+        current_per_block = current / repeats / size * 1_000_000
+        print(
+            f"{size:>6} {legacy_per_block:>18.2f} {current_per_block:>17.2f} {legacy_per_block / current_per_block:>7.1f}x"
+        )
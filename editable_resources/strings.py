@@ -21,5 +21,6 @@ trimmed = """Unfortunately I can only show you the first {items} items. If you n
 compressed = "(Some formatting has also been removed/compressed)"
 form_submission_success = "Your form has been submitted successfully: {form_name}"
 file_upload_failure = "Unfortunately there was an issue uploading your attached file(s). A volunteer will be in touch shortly."
+item_update_failure = "Unfortunately I couldn't save your changes to this {item_type}. Please try again or reach out to #it."
 newline = "\n"
 view_only = "Either you don't have permission to edit this item or I do not recognise you. If you believe this is an error, please reach out to #it."
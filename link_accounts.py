@@ -10,7 +10,7 @@ from slack_bolt import App
 from taiga import TaigaAPI
 
 from slack import blocks, block_formatters
-from util import taigalink, tidyhq
+from util import taiga_users, taigalink, tidyhq
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -130,36 +130,33 @@ else:
 
 setup_logger.info(f"Got {len(taiga_users_raw)} Taiga users")
 
-taiga_users = {}
-
-for user in taiga_users_raw:
-    # Get more detailed information about the user
-    url = f"{config['taiga']['url']}/api/v1/users/{user['id']}"
-    response = requests.get(
-        url, headers={"Authorization": f"Bearer {taiga_auth_token}"}
-    )
-    if response.status_code == 200:
-        user_info = response.json()
-    else:
-        setup_logger.error(
-            f"Failed to get user info for {user['id']}: {response.status_code}"
-        )
-        continue
+# Only users we haven't seen before are looked up
+user_details = taiga_users.get_details(
+    config=config,
+    taiga_auth_token=taiga_auth_token,
+    users=taiga_users_raw,
+    fresh="--fresh" in sys.argv,
+)
 
+# Index Taiga users by email and email addresses by Taiga ID
+unlinked_users = {}
+emails_by_id = {}
+for user_id, details in user_details.items():
     # Check if the user has an email address
-    if user_info.get("email"):
-        taiga_users[user_info["email"]] = {
-            "taiga": user["id"],
-            "username": user["username"],
+    if details.get("email"):
+        unlinked_users[details["email"]] = {
+            "taiga": user_id,
+            "username": details["username"],
         }
+        emails_by_id[user_id] = details["email"]
 
-first_count = len(taiga_users)
+first_count = len(unlinked_users)
 
 # Iterate through all TidyHQ contacts looking for ones that have a Taiga ID set
 for contact in tidyhq_cache["contacts"]:
     taiga_field = tidyhq.get_custom_field(
         config=config,
-        contact_id=contact["id"],
+        contact=contact,
         cache=tidyhq_cache,
         field_map_name="taiga",
     )
@@ -169,41 +166,40 @@ for contact in tidyhq_cache["contacts"]:
     # IDs are stored as strings in TidyHQ
     taiga_id = int(taiga_field["value"])
 
-    # Look for the Taiga user in the Taiga users list and remove it if it's already assigned to a TidyHQ contact
-    for email, user in taiga_users.items():
-        if user["taiga"] == taiga_id:
-            taiga_users.pop(email)
-            break
+    # Remove the Taiga user from the list if it's already assigned to a TidyHQ contact
+    if taiga_id in emails_by_id:
+        unlinked_users.pop(emails_by_id.pop(taiga_id), None)
 
 logger.info(
-    f"Taiga users that need to be linked to TidyHQ contacts: {len(taiga_users)}/{first_count}"
+    f"Taiga users that need to be linked to TidyHQ contacts: {len(unlinked_users)}/{first_count}"
 )
 
 # Search through TidyHQ contacts for ones that have a matching email address
 for contact in tidyhq_cache["contacts"]:
     email = contact["email_address"]
-    if email in taiga_users:
-        logger.info(f"Linking {email} to Taiga user {taiga_users[email]['taiga']}")
+    if email in unlinked_users:
+        taiga_user = unlinked_users[email]
+        logger.info(f"Linking {email} to Taiga user {taiga_user['taiga']}")
         # Set the Taiga ID field on the contact
         setting = tidyhq.set_custom_field(
             config=config,
             contact_id=contact["id"],
             field_map_name="taiga",
-            value=taiga_users[email]["taiga"],
+            value=taiga_user["taiga"],
         )
 
         if setting:
             logger.info(f"Set Taiga ID on contact {contact['id']}")
             # Remove the user from the list
-            taiga_users.pop(email)
+            unlinked_users.pop(email)
             notify_blocks = construct_link_blocks(
                 tidyhq_id=contact["id"],
                 tidyhq_name=contact["display_name"],
-                taiga_username=taiga_users[email]["username"],
+                taiga_username=taiga_user["username"],
                 method="Email address matching",
             )
             notify(
-                message=f"Linking TidyHQ contact {contact['display_name']} to Taiga user {taiga_users[email]['taiga']}",
+                message=f"Linking TidyHQ contact {contact['display_name']} to Taiga user {taiga_user['taiga']}",
                 blocks=notify_blocks,
                 slack_app=app,
             )
@@ -211,14 +207,14 @@ for contact in tidyhq_cache["contacts"]:
             logger.error(f"Failed to set Taiga ID on contact {contact['id']}")
 
 logger.info(f"Auto linking complete")
-logger.info(f"Taiga users remaining: {len(taiga_users)}/{first_count}")
+logger.info(f"Taiga users remaining: {len(unlinked_users)}/{first_count}")
 
 # If we're running in cron mode, that's it
 if cron_mode:
     sys.exit(0)
 
 removing = []
-for user in taiga_users:
+for user in unlinked_users:
     logger.info(f"Taiga user {user} not linked to a TidyHQ contact")
     tidyhq_id = input(
         "Enter the TidyHQ contact ID to link this user to (Leave blank to skip): "
@@ -240,7 +236,7 @@ for user in taiga_users:
         config=config,
         contact_id=tidyhq_id,
         field_map_name="taiga",
-        value=taiga_users[user]["taiga"],
+        value=unlinked_users[user]["taiga"],
     )
     if setting:
         logger.info(f"Set Taiga ID on contact {tidyhq_id}")
@@ -248,11 +244,11 @@ for user in taiga_users:
         notify_blocks = construct_link_blocks(
             tidyhq_id=tidyhq_id,
             tidyhq_name=contact["display_name"],
-            taiga_username=taiga_users[user]["username"],
+            taiga_username=unlinked_users[user]["username"],
             method="Manual linking",
         )
         notify(
-            message=f"Linking TidyHQ contact {contact['display_name']} to Taiga user {taiga_users[user]['username']}",
+            message=f"Linking TidyHQ contact {contact['display_name']} to Taiga user {unlinked_users[user]['username']}",
             blocks=notify_blocks,
             slack_app=app,
         )
@@ -260,7 +256,7 @@ for user in taiga_users:
         logger.error(f"Failed to set Taiga ID on contact {tidyhq_id}")
 
 for user in removing:
-    taiga_users.pop(user)
+    unlinked_users.pop(user)
 
 logger.info(f"Manual linking complete")
-logger.info(f"Taiga users remaining: {len(taiga_users)}/{first_count}")
+logger.info(f"Taiga users remaining: {len(unlinked_users)}/{first_count}")
@@ -9,7 +9,6 @@ import subprocess
 import sys
 import time
 import uuid
-from copy import deepcopy as copy
 from pprint import pprint
 
 import requests
@@ -23,9 +22,9 @@ from waitress import serve
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from editable_resources import strings
-from slack import blocks, block_formatters
+from slack import blocks, block_formatters, block_builder
 from slack import misc as slack_misc
-from util import taigalink, tidyhq
+from util import taiga_history, taiga_mirror, taigalink, tidyhq
 
 
 def verify_signature(key, data, signature):
@@ -138,6 +137,12 @@ def incoming():
 
     data = request.get_json()
 
+    # Keep the local comment history and open item mirror current so they don't need to be fetched from Taiga
+    taiga_history.record_webhook(config=config, data=data)
+    taiga_mirror.apply_webhook(
+        config=config, taiga_auth_token=taiga_auth_token, data=data
+    )
+
     if data["type"] == "userstory":
         type_str = "story"
     else:
@@ -231,15 +236,11 @@ def incoming():
     url = data["data"].get("permalink", None)
     if url:
         # Construct the "View in Taiga" button
-        visit_button = copy(blocks.button)
-        visit_button["text"]["text"] = "View on web"
-        visit_button["url"] = url
-        visit_button["action_id"] = f"tlink{uuid.uuid4().hex}"
+        visit_button = block_builder.button(
+            text="View on web", url=url, action_id=f"tlink{uuid.uuid4().hex}"
+        )
 
         # Construct the "Watch" button
-        watch_button = copy(blocks.button)
-        watch_button["text"]["text"] = "Watch"
-        watch_button["action_id"] = f"twatch{uuid.uuid4().hex}"
         # Create a value that will let us identify the issue later
         item_data = {
             "project_id": project_id,
@@ -247,22 +248,24 @@ def incoming():
             "type": data["type"],
             "permalink": url,
         }
-        watch_button["value"] = json.dumps(item_data)
+        watch_button = block_builder.button(
+            text="Watch",
+            action_id=f"twatch{uuid.uuid4().hex}",
+            value=json.dumps(item_data),
+        )
 
         # Construct the "View in app" button
-        app_button = copy(blocks.button)
-        app_button["text"]["text"] = "View in app"
-        app_button["action_id"] = (
-            f"viewedit-{project_id}-{type_str}-{data['data']['id']}"
+        app_button = block_builder.button(
+            text="View in app",
+            action_id=f"viewedit-{project_id}-{type_str}-{data['data']['id']}",
         )
 
         # Check if we should add a promote button
         promote_button = None
         if data["type"] == "issue" and data["action"] == "create":
-            promote_button = copy(blocks.button)
-            promote_button["text"]["text"] = "Promote to story"
-            promote_button["action_id"] = (
-                f"promote_issue-{project_id}-issue-{data['data']['id']}"
+            promote_button = block_builder.button(
+                text="Promote to story",
+                action_id=f"promote_issue-{project_id}-issue-{data['data']['id']}",
             )
             promote_button["confirm"] = {
                 "title": {"type": "plain_text", "text": "Promote to story"},
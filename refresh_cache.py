@@ -1,8 +1,10 @@
 import logging
-from util import tidyhq
+from util import taiga_mirror, tidyhq
 import json
 import sys
 
+import requests
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 # Set urllib3 logging level to INFO to reduce noise when individual modules are set to debug
@@ -35,3 +37,32 @@ tidyhq_cache = tidyhq.fresh_cache(config=config)
 logger.info(
     f"TidyHQ cache set up: {len(tidyhq_cache['contacts'])} contacts, {len(tidyhq_cache['groups'])} groups"
 )
+
+# Reconcile the open item mirror with Taiga in case any webhooks were missed
+if not config["taiga"].get("auth_token"):
+    auth_url = f"{config['taiga']['url']}/api/v1/auth"
+    auth_data = {
+        "password": config["taiga"]["password"],
+        "type": "normal",
+        "username": config["taiga"]["username"],
+    }
+    response = requests.post(
+        auth_url,
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(auth_data),
+    )
+
+    if response.status_code == 200:
+        taiga_auth_token = response.json().get("auth_token")
+    else:
+        logger.error(f"Failed to get auth token: {response.status_code}")
+        sys.exit(1)
+
+else:
+    taiga_auth_token = config["taiga"]["auth_token"]
+
+if taiga_mirror.reconcile(config=config, taiga_auth_token=taiga_auth_token):
+    logger.info("Taiga mirror reconciled")
+else:
+    logger.error("Failed to reconcile Taiga mirror")
+    sys.exit(1)
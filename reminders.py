@@ -2,17 +2,14 @@ import json
 import logging
 import sys
 import time
-from copy import deepcopy as copy
 from datetime import datetime
 from pprint import pformat, pprint
 
 import requests
 from slack_bolt import App
-from taiga import TaigaAPI
 
-from slack import block_formatters, blocks
-from slack import misc as slack_misc
-from util import taigalink, tidyhq
+from slack import block_formatters, blocks, delivery
+from util import taiga_mirror, tidyhq
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -60,8 +57,6 @@ if not config["taiga"].get("auth_token"):
 else:
     taiga_auth_token = config["taiga"]["auth_token"]
 
-taigacon = TaigaAPI(host=config["taiga"]["url"], token=taiga_auth_token)
-
 # Set up TidyHQ cache
 tidyhq_cache = tidyhq.fresh_cache(config=config)
 setup_logger.info(
@@ -71,26 +66,24 @@ setup_logger.info(
 # Connect to slack
 app = App(token=config["slack"]["bot_token"], logger=slack_logger)
 
-items = {}
-
-
-start_time = time.time()
-logger.info("Fetching stories from Taiga")
-items["story"] = taigacon.user_stories.list(status__is_closed=False)
-logger.info(f"Got {len(items['story'])} stories")
-logger.info(f"Time taken to fetch stories: {(time.time() - start_time) * 1000:.2f} ms")
+# Open items are read from the local mirror, reconcile it first if the webhooks can't be relied on
+if not taiga_mirror.is_fresh(config):
+    logger.info("Taiga mirror is out of date, reconciling")
+    if not taiga_mirror.reconcile(config=config, taiga_auth_token=taiga_auth_token):
+        logger.error("Failed to reconcile Taiga mirror")
+        sys.exit(1)
 
-start_time = time.time()
-logger.info("Fetching issues from Taiga")
-items["issue"] = taigacon.issues.list(status__is_closed=False)
-logger.info(f"Got {len(items['issue'])} issues")
-logger.info(f"Time taken to fetch issues: {(time.time() - start_time) * 1000:.2f} ms")
+items = {}
 
 start_time = time.time()
-logger.info("Fetching tasks from Taiga")
-items["task"] = taigacon.tasks.list(status__is_closed=False)
-logger.info(f"Got {len(items['task'])} tasks")
-logger.info(f"Time taken to fetch tasks: {(time.time() - start_time) * 1000:.2f} ms")
+for item_type in ["story", "issue", "task"]:
+    items[item_type] = taiga_mirror.query(
+        config=config, item_type=item_type, has_due_date=True
+    )
+    logger.info(f"Got {len(items[item_type])} {item_type}s with due dates")
+logger.info(
+    f"Time taken to query the mirror: {(time.time() - start_time) * 1000:.2f} ms"
+)
 
 
 for item_type in items:
@@ -100,37 +93,30 @@ assignees = {"unassigned": {"story": [], "issue": [], "task": []}}
 
 for item_type in items:
     for item in items[item_type]:
-        assigned_to = getattr(item, "assigned_to", "unassigned")
-        watchers = item.watchers
+        assigned_to = item.get("assigned_to")
+        watchers = list(item["watchers"])
         # Remove the assignee from the watchers if they are there
         if assigned_to in watchers:
             watchers.remove(assigned_to)
         if not assigned_to:
             assigned_to = "unassigned"
-        if item.due_date:
-            if assigned_to not in assignees:
-                assignees[assigned_to] = {
+        if assigned_to not in assignees:
+            assignees[assigned_to] = {
+                "story": [],
+                "issue": [],
+                "task": [],
+            }
+        assignees[assigned_to][item_type].append(item)
+        logger.info(f"{item['subject']} ({item_type}) is assigned to {assigned_to}")
+        for watcher in watchers:
+            if watcher not in assignees:
+                assignees[watcher] = {
                     "story": [],
                     "issue": [],
                     "task": [],
                 }
-            info = taigalink.get_info(
-                taiga_auth_token=taiga_auth_token,
-                config=config,
-                item_id=item.id,
-                item_type=item_type,
-            )
-            assignees[assigned_to][item_type].append(copy(info))
-            logger.info(f"{item.subject} ({item_type}) is assigned to {assigned_to}")
-            for watcher in watchers:
-                if watcher not in assignees:
-                    assignees[watcher] = {
-                        "story": [],
-                        "issue": [],
-                        "task": [],
-                    }
-                assignees[watcher][item_type].append(copy(info))
-                logger.info(f"{item.subject} is watched by {watcher}")
+            assignees[watcher][item_type].append(item)
+            logger.info(f"{item['subject']} is watched by {watcher}")
 
 weekly = {}
 daily = {}
@@ -212,6 +198,11 @@ if not working_items:
     pprint(weekly)
     sys.exit()
 
+# Render every message before sending anything so delivery can be done in parallel
+messages = []
+start_time = time.time()
+taiga_to_slack = tidyhq.taiga_to_slack_index(tidyhq_cache=tidyhq_cache, config=config)
+
 for current in working_items:
     working = current["items"]
     message = current["message"]
@@ -224,31 +215,40 @@ for current in working_items:
             continue
         assignee = str(assignee)
 
-        footer_blocks = []
-        footer_blocks = block_formatters.add_block(footer_blocks, blocks.context)
-        footer_blocks = block_formatters.inject_text(footer_blocks, current["footer"])
-
         if assignee.startswith("C"):
-            app.client.chat_postMessage(
-                channel=assignee,
-                blocks=block_list + reminder_blocks,
-                text="Upcoming due items on Taiga",
-                unfurl_links=False,
-                unfurl_media=False,
-            )
+            channel = assignee
         else:
-            # Translate from Taiga ID to slack ID
-            slack_id = tidyhq.map_taiga_to_slack(
-                tidyhq_cache=tidyhq_cache, taiga_id=assignee, config=config
-            )
-            if not slack_id:
+            # Translate from Taiga ID to slack ID, DMs can be posted straight to the user ID
+            channel = taiga_to_slack.get(assignee)
+            if not channel:
                 logger.error(f"No slack ID found for Taiga user {assignee}")
                 continue
-            slack_misc.send_dm(
-                slack_id=slack_id,
-                message="Upcoming due items on Taiga",
-                slack_app=app,
-                blocks=block_list + reminder_blocks,
-                unfurl_links=False,
-                unfurl_media=False,
-            )
+
+        messages.append(
+            {
+                "channel": channel,
+                "blocks": block_list + reminder_blocks,
+                "text": "Upcoming due items on Taiga",
+                "unfurl_links": False,
+                "unfurl_media": False,
+            }
+        )
+
+logger.info(
+    f"Rendered {len(messages)} reminders in {(time.time() - start_time) * 1000:.2f} ms"
+)
+
+dry_run = "--dry-run" in sys.argv
+if dry_run:
+    print(json.dumps(messages, indent=4))
+
+start_time = time.time()
+results = delivery.deliver(
+    slack_app=app,
+    messages=messages,
+    workers=config.get("reminder_workers", 4),
+    dry_run=dry_run,
+)
+logger.info(
+    f"{'Dry run: ' if dry_run else ''}Delivered {sum(results)}/{len(messages)} reminders in {(time.time() - start_time) * 1000:.2f} ms"
+)
@@ -1,12 +1,14 @@
+import atexit
 import json
 import logging
-import os
 import sys
 from pprint import pprint
 
 import requests
 from taiga import TaigaAPI
 
+from util import bulk_tasks, lease
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 # Set urllib3 logging level to INFO to reduce noise when individual modules are set to debug
@@ -22,28 +24,16 @@ if "--import" in sys.argv:
     import_from_tidyhq = True
 
 
-# Look for --force flag
+# Look for --dry-run flag, count the tasks that would be reset without changing them
+dry_run = False
+if "--dry-run" in sys.argv:
+    dry_run = True
+
+# Look for --force flag, take over any leases held by attendee runs
 force = False
 if "--force" in sys.argv:
     force = True
 
-# Look for a attendee.lock file
-if not force:
-    try:
-        with open("attendee.lock") as f:
-            setup_logger.error(
-                "attendee.lock found. Exiting to prevent concurrent runs"
-            )
-            sys.exit(1)
-    except FileNotFoundError:
-        pass
-
-# Create main.lock file
-with open("attendee.lock", "w") as f:
-    f.write("")
-    setup_logger.info("attendee.lock created")
-
-
 # Load config
 try:
     with open("config.json") as f:
@@ -70,6 +60,16 @@ if not all(
     )
     sys.exit(1)
 
+# Take a lease on the whole board so attendee runs don't change tasks underneath us
+lease_ttl = config.get("lease_ttl", 600)
+lease_id = lease.acquire(ttl=lease_ttl, force=force)
+if not lease_id:
+    setup_logger.error("Another run is processing the board. Exiting")
+    sys.exit(1)
+heartbeat = lease.heartbeat(lease_id, ttl=lease_ttl)
+atexit.register(lease.release, lease_id)
+atexit.register(heartbeat.set)
+
 # Check for cache expiry and set if not present
 if "cache_expiry" not in config:
     config["cache_expiry"] = 86400
@@ -145,50 +145,49 @@ setup_logger.info(f"Retrieved {len(all_tasks)} tasks from project")
 # Really we should be looking for the bot-managed tag on the user story here
 # but that seems pretty intensive so we're ignoring it for now
 
-changes = 0
 
-for task in all_tasks:
-    logger.debug(f"Checking task: {task.subject} for story: {task.user_story}")
-    if task.subject not in task_base:
-        logger.debug(f"Task not found in templates: {task.subject}")
-        continue
-    if task.status == task_base[task.subject]:
-        logger.debug(f"Task already in base status: {task.subject}")
-        continue
-    if task_status[task.status] in ["waiting for info", "in progress"]:
-        logger.debug(
-            f"Task in definitely user set state: {task.subject} - {task_status[task.status]}"
-        )
-        continue
-    if task_status[task.status] in ["not applicable", "optional"]:
+def should_reset(subject: str, status: int) -> bool:
+    """Check whether a task with this subject and status should go back to its template status."""
+    if subject not in task_base:
+        logger.debug(f"Task not found in templates: {subject}")
+        return False
+    if status == task_base[subject]:
+        logger.debug(f"Task already in base status: {subject}")
+        return False
+    if task_status.get(status) in ["waiting for info", "in progress"]:
         logger.debug(
-            f"Task in non-blocking state: {task.subject} - {task_status[task.status]}"
+            f"Task in definitely user set state: {subject} - {task_status[status]}"
         )
-        continue
+        return False
+    if task_status.get(status) in ["not applicable", "optional"]:
+        logger.debug(f"Task in non-blocking state: {subject} - {task_status[status]}")
+        return False
+    return True
 
-    logger.info(f"Resetting task: {task.subject}")
-
-    # Reset the task
-    # python-taiga was being difficult again so we're doing it directly
-    task_url = f"{config['taiga']['url']}/api/v1/tasks/{task.id}"
-    task_data = {"status": task_base[task.subject], "version": task.version}
-    response = requests.patch(
-        task_url,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {taiga_auth_token}",
-        },
-        data=json.dumps(task_data),
-    )
-    if response.status_code != 200:
-        logger.error(f"Failed to reset task: {task.subject}")
-        logger.error(response.json())
-        continue
 
-    logger.debug(f"Task reset: {task.subject}")
-    changes += 1
+changes = []
+
+for task in all_tasks:
+    logger.debug(f"Checking task: {task.subject} for story: {task.user_story}")
+    if not should_reset(task.subject, task.status):
+        continue
 
-logger.info(f"Reset {changes} tasks")
+    logger.debug(f"Resetting task: {task.subject}")
+    changes.append((task.id, task.version, {"status": task_base[task.subject]}))
+
+results = bulk_tasks.apply_changes(
+    config=config,
+    taiga_auth_token=taiga_auth_token,
+    changes=changes,
+    dry_run=dry_run,
+    progress=lambda done, total: logger.info(f"Processed {done}/{total} tasks"),
+    # Tasks moved by someone else since they were listed are checked again
+    still_applies=lambda current: should_reset(current["subject"], current["status"]),
+)
 
-# Clean up the lock file
-os.remove("attendee.lock")
+if dry_run:
+    logger.info(f"Would reset {results['planned']} tasks")
+else:
+    logger.info(
+        f"Reset {results['succeeded']} tasks, {results['skipped']} changed in the meantime, {results['failed']} failed"
+    )
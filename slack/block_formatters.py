@@ -2,7 +2,6 @@ import json
 import logging
 import platform
 import subprocess
-from copy import deepcopy as copy
 from datetime import datetime, timedelta
 from pprint import pprint
 import time
@@ -13,13 +12,19 @@ import jsonschema
 import taiga
 
 from editable_resources import strings
-from slack import blocks, block_formatters
+from slack import blocks, block_formatters, block_builder
 from slack import misc as slack_misc
-from util import taigalink, tidyhq, misc
+from util import taiga_history, taigalink, tidyhq, misc
 
 # Set up logging
 logger = logging.getLogger("slack.block_formatters")
 
+# Slack refuses to publish views with more blocks than this
+home_block_limit = 100
+
+# Number of comments loaded at a time in the view/edit modal
+comment_page_size = 10
+
 
 def format_stories(story_list, compressed=False):
     """Format a list of stories into a header, a newline formatted string and a list of blocks"""
@@ -49,12 +54,10 @@ def format_stories(story_list, compressed=False):
         story_blocks = inject_text(block_list=story_blocks, text=story_formatted)
 
         # Set up button
-        button = copy(blocks.button)
-        button["text"]["text"] = "View/Edit"
-        button["action_id"] = (
-            f"viewedit-{story['project_extra_info']['id']}-story-{story['id']}"
+        story_blocks[-1]["accessory"] = block_builder.button(
+            text="View/Edit",
+            action_id=f"viewedit-{story['project_extra_info']['id']}-story-{story['id']}",
         )
-        story_blocks[-1]["accessory"] = button
 
     out_str = "\n".join(story_strs)
 
@@ -84,12 +87,10 @@ def format_issues(issue_list, compressed=False):
         issue_blocks = inject_text(block_list=issue_blocks, text=issue_formatted)
 
         # Set up button
-        button = copy(blocks.button)
-        button["text"]["text"] = "View/Edit"
-        button["action_id"] = (
-            f"viewedit-{issue['project_extra_info']['id']}-issue-{issue['id']}"
+        issue_blocks[-1]["accessory"] = block_builder.button(
+            text="View/Edit",
+            action_id=f"viewedit-{issue['project_extra_info']['id']}-issue-{issue['id']}",
         )
-        issue_blocks[-1]["accessory"] = button
 
     out_str = "\n".join(issue_strs)
 
@@ -123,12 +124,10 @@ def format_tasks(task_list, compressed=False):
         task_blocks = inject_text(block_list=task_blocks, text=task_formatted)
 
         # Set up button
-        button = copy(blocks.button)
-        button["text"]["text"] = "View/Edit"
-        button["action_id"] = (
-            f"viewedit-{task['project_extra_info']['id']}-task-{task['id']}"
+        task_blocks[-1]["accessory"] = block_builder.button(
+            text="View/Edit",
+            action_id=f"viewedit-{task['project_extra_info']['id']}-task-{task['id']}",
         )
-        task_blocks[-1]["accessory"] = button
 
     out_str = "\n".join(task_strs)
 
@@ -228,7 +227,7 @@ def format_tasks_modal_blocks(
                     "closing_statuses"
                 ]["task"]
                 for status in closing_statuses:
-                    button = copy(blocks.button)
+                    button = block_builder.build(blocks.button)
                     button["text"]["text"] = f"Close as {status['name']}"
                     button["action_id"] = (
                         f"close_task-{task['project']}-task-{task['id']}-{status['id']}"
@@ -276,7 +275,7 @@ def construct_reminder_section(reminders: dict) -> list:
         for reminder in reminders[item_type]:
             block_list = add_block(block_list, blocks.text)
             block_list = inject_text(block_list, reminder["string"])
-            button = copy(blocks.button)
+            button = block_builder.build(blocks.button)
             button["text"]["text"] = "View in app"
             button["action_id"] = (
                 f"viewedit-{reminder['item']['project_extra_info']['id']}-{item_type}-{reminder['item']['id']}"
@@ -287,7 +286,10 @@ def construct_reminder_section(reminders: dict) -> list:
 
 
 def inject_text(block_list: list, text: str) -> list[dict]:
-    block_list = copy(block_list)
+    """Sets the text of the last block in the list and returns the updated list.
+
+    The last block is expected to have been added via add_block so it's safe to modify in place.
+    """
     if block_list[-1]["type"] in ["section", "header", "button"]:
         block_list[-1]["text"]["text"] = text
     elif block_list[-1]["type"] in ["context"]:
@@ -301,32 +303,23 @@ def inject_text(block_list: list, text: str) -> list[dict]:
 
 
 def add_block(block_list: list, block: dict | list) -> list[dict]:
-    """Adds a block to the block list and returns the updated list."""
-    block = copy(block)
-    block_list = copy(block_list)
+    """Adds a block to the block list and returns the updated list.
+
+    The list is extended in place and only the new block is copied from its template.
+    """
+    block = block_builder.build(block)
     if type(block) == list:
+        if len(block_list) + len(block) > 100:
+            raise ValueError("Block list too long")
         block_list += block
     elif type(block) == dict:
+        if len(block_list) + 1 > 100:
+            raise ValueError("Block list too long")
         block_list.append(block)
 
-    if len(block_list) > 100:
-        raise ValueError("Block list too long")
-
     return block_list
 
 
-def compress_blocks(block_list) -> list:
-    compressed_blocks = []
-
-    # Remove dividers
-    for block in block_list:
-        if block["type"] != "divider":
-            compressed_blocks.append(block)
-    logging.debug(f"Blocks reduced from {len(block_list)} to {len(compressed_blocks)}")
-
-    return compressed_blocks
-
-
 def render_form_list(form_list: dict, member=False) -> list[dict]:
     """Takes a list of forms and renders them as a list of blocks"""
     block_list = []
@@ -350,7 +343,7 @@ def render_form_list(form_list: dict, member=False) -> list[dict]:
             block_list=block_list, text=form["description"]
         )
         # Add a button to fill out the form as an attachment
-        accessory = copy(blocks.button)
+        accessory = block_builder.build(blocks.button)
         accessory["text"]["text"] = form["action_name"]
         accessory["value"] = form_id
         accessory["action_id"] = f"form-open-{form_id}"
@@ -403,6 +396,8 @@ def questions_to_blocks(
         taiga_project_id = int(taiga_project_id)
 
     for question in questions:
+        # Work on a copy so the shared form definitions are never modified
+        question = dict(question)
 
         # Some fields will break if they're included but are empty, so we'll remove them now
         for key in ["placeholder", "text", "action_id"]:
@@ -655,9 +650,7 @@ def text_to_options(options: list[str]):
                 f"Option '{option}' is too long for value to be set. Truncating to 150 characters"
             )
             option = option[:150]
-        formatted_options.append(copy(blocks.option))
-        formatted_options[-1]["text"]["text"] = option
-        formatted_options[-1]["value"] = option
+        formatted_options.append(block_builder.option(text=option))
 
     return formatted_options
 
@@ -671,28 +664,55 @@ def viewedit_blocks(
     config: dict,
     taiga_auth_token: str,
     edit=True,
+    state: dict | None = None,
 ):
-    """Generate the blocks for a modal for viewing and editing an item"""
+    """Generate the blocks for a modal for viewing and editing an item
 
-    if item_type == "issue":
-        item = taigacon.issues.get(resource_id=item_id)
-        history: list = taigacon.history.issue.get(resource_id=item_id)
-    elif item_type == "task":
-        item = taigacon.tasks.get(resource_id=item_id)
-        history: list = taigacon.history.task.get(resource_id=item_id)
-    elif item_type in ["story", "userstory"]:
-        item = taigacon.user_stories.get(resource_id=item_id)
-        history: list = taigacon.history.user_story.get(resource_id=item_id)
+    Anything fetched from Taiga is stored in state (if provided) and reused from there when rendering again.
+    """
+    if state is None:
+        state = {}
+
+    if item_type in ["story", "userstory"]:
         item_type = "story"
-    else:
+    elif item_type not in ["issue", "task"]:
         raise ValueError(f"Unknown item type {item_type}")
 
+    if "item" not in state:
+        if item_type == "issue":
+            state["item"] = taigacon.issues.get(resource_id=item_id)
+        elif item_type == "task":
+            state["item"] = taigacon.tasks.get(resource_id=item_id)
+        else:
+            state["item"] = taigacon.user_stories.get(resource_id=item_id)
+    item = state["item"]
+
+    # Comments are loaded a page at a time, most recent first
+    state.setdefault("history", [])
+    state.setdefault("comment_pages", 1)
+    state.setdefault("loaded_pages", 0)
+    state.setdefault("comment_total", 0)
+    while state["loaded_pages"] < state["comment_pages"]:
+        events, state["comment_total"] = taiga_history.get_comments(
+            config=config,
+            taiga_auth_token=taiga_auth_token,
+            item_type=item_type,
+            item_id=item_id,
+            page=state["loaded_pages"] + 1,
+            page_size=comment_page_size,
+        )
+        state["history"] += events
+        state["loaded_pages"] += 1
+        if state["loaded_pages"] * comment_page_size >= state["comment_total"]:
+            break
+    more_comments = state["loaded_pages"] * comment_page_size < state["comment_total"]
+    history: list = state["history"]
+
     # Check if the item has an actual description
-    if not item.description:
-        item.description = "<No description provided>"
+    description = item.description or "<No description provided>"
 
     # Convert normal description markdown to slack markdown
-    item.description = slack_misc.convert_markdown(item.description)
+    description = slack_misc.convert_markdown(description)
 
     # Build up a history of comments
     comments = []
@@ -708,8 +728,8 @@ def viewedit_blocks(
 
             # Calculate a useful date
             # Comes in format of 2024-11-29T06:09:39.642Z
-            comment_date: datetime = datetime.strptime(
-                event["created_at"], "%Y-%m-%dT%H:%M:%S.%fZ"
+            comment_date: datetime = datetime.fromisoformat(
+                event["created_at"].replace("Z", "+00:00")
             )
 
             # Date is in UTC, convert to WAST by adding 8 hours
@@ -724,12 +744,10 @@ def viewedit_blocks(
                     comment = match.group(2)
 
                     # Look for a Taiga user with the same name
-                    found_taiga = False
-                    for user_info in taiga_cache["users"].values():
-                        if user_info["name"].lower() == name.lower():
-                            image = user_info["photo"]
-                            found_taiga = True
-                    if not found_taiga:
+                    taiga_id = taigalink.users_by_name(taiga_cache).get(name.lower())
+                    if taiga_id:
+                        image = taiga_cache["users"][taiga_id]["photo"]
+                    else:
                         image = None
 
             comments.append(
@@ -780,18 +798,18 @@ def viewedit_blocks(
 
     # Add a promote button if the item is an issue
     if item_type == "issue" and edit:
-        button = copy(blocks.button)
+        button = block_builder.build(blocks.button)
         button["text"]["text"] = "Promote to story"
         button["action_id"] = (
             f"promote_issue-{item.project_extra_info['id']}-issue-{item.id}"
         )
         # If there are comments warn that they'll be removed
-        if comments:
+        if state["comment_total"]:
             button["confirm"] = {
                 "title": {"type": "plain_text", "text": "Promote to story"},
                 "text": {
                     "type": "plain_text",
-                    "text": f"The {len(comments)} comment{'s' if len(comments)> 1 else ''} on this issue will be mirrored to the new story as a single message. Are you sure?",
+                    "text": f"The {state['comment_total']} comment{'s' if state['comment_total'] > 1 else ''} on this issue will be mirrored to the new story as a single message. Are you sure?",
                 },
                 "confirm": {"type": "plain_text", "text": "Promote"},
                 "deny": {"type": "plain_text", "text": "Cancel"},
@@ -810,7 +828,7 @@ def viewedit_blocks(
             text=f"*Parent card:* {item.user_story_extra_info['subject']}",
         )
         # Add an accessory to view the parent card
-        button = copy(blocks.button)
+        button = block_builder.build(blocks.button)
         button["text"]["text"] = "View parent"
         button["action_id"] = (
             f"viewedit-{item.project_extra_info['id']}-story-{item.user_story_extra_info['id']}-update"
@@ -820,7 +838,7 @@ def viewedit_blocks(
 
     block_list = block_formatters.add_block(block_list, blocks.text)
     block_list = block_formatters.inject_text(
-        block_list=block_list, text=f"{item.description}"
+        block_list=block_list, text=f"{description}"
     )
 
     # Info fields
@@ -900,19 +918,21 @@ def viewedit_blocks(
 
     # Attach info field edit button
     if edit:
-        button = copy(blocks.button)
+        button = block_builder.build(blocks.button)
         button["text"]["text"] = "Edit"
         button["action_id"] = f"edit_info"
         block_list[-1]["accessory"] = button
 
     # Tasks
     if item_type == "story":
-        tasks = taigalink.get_tasks(
-            config=config,
-            taiga_auth_token=taiga_auth_token,
-            exclude_done=False,
-            story_id=item_id,
-        )
+        if "tasks" not in state:
+            state["tasks"] = taigalink.get_tasks(
+                config=config,
+                taiga_auth_token=taiga_auth_token,
+                exclude_done=False,
+                story_id=item_id,
+            )
+        tasks = state["tasks"]
         if tasks:
             block_list = block_formatters.add_block(block_list, blocks.divider)
             block_list = block_formatters.add_block(block_list, blocks.header)
@@ -934,7 +954,7 @@ def viewedit_blocks(
                     block_list = block_formatters.inject_text(
                         block_list=block_list, text=task_str
                     )
-                    button = copy(blocks.button)
+                    button = block_builder.build(blocks.button)
                     if edit:
                         button["text"]["text"] = "View/edit"
                     else:
@@ -954,7 +974,7 @@ def viewedit_blocks(
             # Add a button to view all tasks
             block_list = block_formatters.add_block(block_list, blocks.actions)
             block_list[-1].pop("block_id")
-            button = copy(blocks.button)
+            button = block_builder.build(blocks.button)
             button["text"][
                 "text"
             ] = f"View all tasks {misc.calculate_circle_emoji(closed,len(tasks))} ({closed}/{len(tasks)})"
@@ -966,7 +986,10 @@ def viewedit_blocks(
     block_list = block_formatters.add_block(block_list, blocks.header)
     block_list = block_formatters.inject_text(block_list=block_list, text="Files")
 
-    if len(item.list_attachments()) == 0:
+    if "attachments" not in state:
+        state["attachments"] = item.list_attachments()
+
+    if len(state["attachments"]) == 0:
         block_list = block_formatters.add_block(block_list, blocks.text)
         block_list = block_formatters.inject_text(
             block_list=block_list, text="<No files attached>"
@@ -974,7 +997,7 @@ def viewedit_blocks(
 
     images_attached = 0
 
-    for attachment in item.list_attachments():
+    for attachment in state["attachments"]:
         if attachment.is_deprecated:
             continue
 
@@ -1000,14 +1023,14 @@ def viewedit_blocks(
     buttons = []
     # Create attach button
     if edit:
-        button = copy(blocks.button)
+        button = block_builder.build(blocks.button)
         button["text"]["text"] = "Attach files"
         button["action_id"] = "home-attach_files"
         buttons.append(button)
 
     # Add view images button if there's at least one image
     if images_attached:
-        button = copy(blocks.button)
+        button = block_builder.build(blocks.button)
         button["text"]["text"] = f"View image attachments inline ({images_attached})"
         button["action_id"] = f"view_attachments-{project_id}-{item_type}-{item_id}"
         buttons.append(button)
@@ -1021,6 +1044,23 @@ def viewedit_blocks(
     block_list = block_formatters.add_block(block_list, blocks.divider)
     block_list = block_formatters.add_block(block_list, blocks.header)
     block_list = block_formatters.inject_text(block_list=block_list, text="Comments")
+
+    # Leave room for the load more button and the comment input and button
+    room = (100 - len(block_list) - 3) // 2
+    if len(comments) > room:
+        comments = comments[-room:] if room > 0 else []
+        more_comments = False
+
+    if more_comments:
+        block_list = block_formatters.add_block(block_list, blocks.actions)
+        block_list[-1].pop("block_id")
+        block_list[-1]["elements"].append(
+            block_builder.button(
+                "Load older comments",
+                action_id=f"more_comments-{project_id}-{item_type}-{item_id}",
+            )
+        )
+
     for comment in comments:
         block_list = block_formatters.add_block(block_list, blocks.text)
         block_list = block_formatters.inject_text(
@@ -1074,7 +1114,7 @@ def viewedit_blocks(
     # Add a comment button
     # We use this instead of the submit button because we can't push the modal view to the user after a submission event
     block_list = block_formatters.add_block(block_list, blocks.actions)
-    block_list[-1]["elements"].append(copy(blocks.button))
+    block_list[-1]["elements"].append(block_builder.build(blocks.button))
     block_list[-1]["elements"][0]["text"]["text"] = "Comment"
     block_list[-1]["elements"][0]["action_id"] = "submit_comment"
 
@@ -1216,7 +1256,7 @@ def edit_info_blocks(
             ]
             button_list = []
             for status in closing_statuses:
-                button = copy(blocks.button)
+                button = block_builder.build(blocks.button)
                 button["text"]["text"] = f"Close as {status['name']}"
                 button["action_id"] = (
                     f"close_task-{item.project}-{item_type}-{item.id}-{status['id']}"
@@ -1325,7 +1365,7 @@ def edit_info_blocks(
     block_list[-1]["label"]["text"] = "Due date"
     block_list[-1]["block_id"] = "due_date"
     block_list[-1]["optional"] = True
-    cal = copy(blocks.cal_select)
+    cal = block_builder.build(blocks.cal_select)
     cal["action_id"] = "due_date"
     cal.pop("placeholder")
     if due_date:
@@ -1413,27 +1453,102 @@ def new_item_selector_blocks(taiga_id: int, taiga_cache: dict):
     return block_list
 
 
+def home_layout_cost(
+    fixed_cost: int, sections: list[list[int]], levels: list[list[str]]
+) -> int:
+    """Calculate the number of blocks app_home will produce for a set of detail levels.
+
+    sections is a list of the item block counts of each group in each section.
+    levels mirrors sections with "full", "compressed" or "dropped" for each group.
+    """
+    cost = fixed_cost
+    dropped = False
+    last_divider = False
+    for section_index, section in enumerate(sections):
+        # Section header
+        cost += 1
+        last_divider = False
+        if not section:
+            # Placeholder text
+            cost += 1
+        for group_cost, level in zip(section, levels[section_index]):
+            if level == "full":
+                # Group header and trailing divider
+                cost += group_cost + 2
+                last_divider = True
+            elif level == "compressed":
+                cost += group_cost
+                last_divider = False
+            else:
+                dropped = True
+        if section_index < len(sections) - 1:
+            if not last_divider:
+                cost += 1
+        elif last_divider:
+            cost -= 1
+
+    # Divider and text explaining that items have been left out
+    if dropped:
+        cost += 2
+
+    return cost
+
+
+def plan_home_layout(
+    fixed_cost: int,
+    sections: list[list[int]],
+    budget: int = home_block_limit,
+    compress: bool = False,
+) -> list[list[str]]:
+    """Pick the detail level of each group of items in the app home so the view fits within the block budget.
+
+    Groups are compressed from the bottom of the page up, then dropped from the bottom up if that isn't enough.
+    """
+    start_level = "compressed" if compress else "full"
+    levels = [[start_level for _ in section] for section in sections]
+    positions = [
+        (section_index, group_index)
+        for section_index, section in enumerate(sections)
+        for group_index in range(len(section))
+    ]
+
+    for new_level in ["compressed", "dropped"]:
+        for section_index, group_index in reversed(positions):
+            if home_layout_cost(fixed_cost, sections, levels) <= budget:
+                return levels
+            levels[section_index][group_index] = new_level
+
+    return levels
+
+
 def app_home(
     user_id: str,
     config: dict,
     tidyhq_cache: dict,
     taiga_auth_token: str,
-    provided_user_stories: list = [],
-    provided_issues: list = [],
-    provided_tasks: list = [],
+    provided_user_stories: list | None = None,
+    provided_issues: list | None = None,
+    provided_tasks: list | None = None,
     compress=False,
+    slack_to_taiga: dict[str, int] | None = None,
 ) -> list:
-    """Generate the blocks for the app home view for a specified user and return it as a list of blocks."""
+    """Generate the blocks for the app home view for a specified user and return it as a list of blocks.
+
+    Items that aren't provided are fetched for the user. Pass slack_to_taiga (from tidyhq.slack_to_taiga_index) when rendering many homes.
+    """
     # Check if the user has a Taiga account
 
     if compress:
         logger.info(f"Compressing blocks for user {user_id}")
 
-    taiga_id = tidyhq.map_slack_to_taiga(
-        tidyhq_cache=tidyhq_cache,
-        config=config,
-        slack_id=user_id,
-    )
+    if slack_to_taiga is not None:
+        taiga_id = slack_to_taiga.get(user_id)
+    else:
+        taiga_id = tidyhq.map_slack_to_taiga(
+            tidyhq_cache=tidyhq_cache,
+            config=config,
+            slack_id=user_id,
+        )
 
     block_list = []
     block_list = block_formatters.add_block(block_list, blocks.header)
@@ -1444,7 +1559,7 @@ def app_home(
     # Add a "submit form" button
     block_list = block_formatters.add_block(block_list, blocks.actions)
     block_list[-1].pop("block_id")
-    block_list[-1]["elements"].append(copy(blocks.button))
+    block_list[-1]["elements"].append(block_builder.build(blocks.button))
     block_list[-1]["elements"][-1]["text"]["text"] = "Submit a form"
     block_list[-1]["elements"][-1]["action_id"] = "submit_form"
 
@@ -1478,7 +1593,7 @@ def app_home(
         logger.info(f"User {user_id} has a Taiga account - {taiga_id}")
 
         # Add create button
-        block_list[-1]["elements"].append(copy(blocks.button))
+        block_list[-1]["elements"].append(block_builder.build(blocks.button))
         block_list[-1]["elements"][-1]["text"]["text"] = "Create an item"
         block_list[-1]["elements"][-1]["action_id"] = "create_item"
 
@@ -1490,20 +1605,9 @@ def app_home(
         block_list = block_formatters.add_block(block_list, blocks.divider)
 
     # High frequency users will end up going over the 100 block limit
-    at_block_limit = False
-    compressed_blocks = False
-    items_added = 0
-
-    ##########
-    # Stories
-    ##########
+    # Every group of items is formatted up front so a layout that fits can be picked in one pass
 
-    block_list = block_formatters.add_block(block_list, blocks.header)
-    block_list = block_formatters.inject_text(
-        block_list=block_list, text="Assigned Cards"
-    )
-
-    if provided_user_stories:
+    if provided_user_stories is not None:
         user_stories = provided_user_stories
     else:
         # Get all assigned user stories for the user
@@ -1514,61 +1618,7 @@ def app_home(
             exclude_done=True,
         )
 
-    if len(user_stories) == 0:
-        block_list = block_formatters.add_block(block_list, blocks.text)
-        block_list = block_formatters.inject_text(
-            block_list=block_list, text=strings.no_stories
-        )
-        block_list = block_formatters.add_block(block_list, blocks.divider)
-
-    else:
-        # Sort the user stories by project
-        sorted_stories = taigalink.sort_by_project(user_stories)
-
-        for project in sorted_stories:
-            if len(block_list) > 95:
-                block_list = block_formatters.compress_blocks(block_list=block_list)
-                compressed_blocks = True
-                if len(block_list) > 95:
-                    # Check if we're already in a compressed recursion
-                    if not compress:
-                        return app_home(
-                            user_id=user_id,
-                            config=config,
-                            tidyhq_cache=tidyhq_cache,
-                            taiga_auth_token=taiga_auth_token,
-                            provided_user_stories=user_stories,
-                            compress=True,
-                        )
-                    at_block_limit = True
-                    break
-            items_added += 1
-            header, body, story_blocks = block_formatters.format_stories(
-                story_list=sorted_stories[project], compressed=compress
-            )
-            if not compress:
-                block_list = block_formatters.add_block(block_list, blocks.text)
-                block_list = block_formatters.inject_text(
-                    block_list=block_list, text=f"*{header}*"
-                )
-            block_list += story_blocks
-            block_list = block_formatters.add_block(block_list, blocks.divider)
-
-        # Remove the last divider
-        block_list.pop()
-
-    block_list = block_formatters.add_block(block_list, blocks.divider)
-
-    ##########
-    # Issues
-    ##########
-
-    block_list = block_formatters.add_block(block_list, blocks.header)
-    block_list = block_formatters.inject_text(
-        block_list=block_list, text="Assigned Issues"
-    )
-
-    if provided_issues:
+    if provided_issues is not None:
         user_issues = provided_issues
     else:
         # Get all assigned issues for the user
@@ -1579,62 +1629,7 @@ def app_home(
             exclude_done=True,
         )
 
-    if len(user_issues) == 0:
-        block_list = block_formatters.add_block(block_list, blocks.text)
-        block_list = block_formatters.inject_text(
-            block_list=block_list, text=strings.no_issues
-        )
-        block_list = block_formatters.add_block(block_list, blocks.divider)
-
-    else:
-        # Sort the user issues by project
-        sorted_issues = taigalink.sort_by_project(user_issues)
-
-        for project in sorted_issues:
-            if len(block_list) > 95:
-                block_list = block_formatters.compress_blocks(block_list=block_list)
-                compressed_blocks = True
-                if len(block_list) > 95:
-                    # Check if we're already in a compressed recursion
-                    if not compress:
-                        return app_home(
-                            user_id=user_id,
-                            config=config,
-                            tidyhq_cache=tidyhq_cache,
-                            taiga_auth_token=taiga_auth_token,
-                            provided_user_stories=user_stories,
-                            provided_issues=user_issues,
-                            compress=True,
-                        )
-                    at_block_limit = True
-                    break
-            items_added += 1
-            header, body, issue_blocks = block_formatters.format_issues(
-                issue_list=sorted_issues[project], compressed=compress
-            )
-            if not compress:
-                block_list = block_formatters.add_block(block_list, blocks.text)
-                block_list = block_formatters.inject_text(
-                    block_list=block_list, text=f"*{header}*"
-                )
-            block_list += issue_blocks
-            block_list = block_formatters.add_block(block_list, blocks.divider)
-
-        # Remove the last divider
-        block_list.pop()
-
-    block_list = block_formatters.add_block(block_list, blocks.divider)
-
-    ##########
-    # Tasks
-    ##########
-
-    block_list = block_formatters.add_block(block_list, blocks.header)
-    block_list = block_formatters.inject_text(
-        block_list=block_list, text="Assigned Tasks"
-    )
-
-    if provided_tasks:
+    if provided_tasks is not None:
         tasks = provided_tasks
     else:
         # Get all tasks for the user
@@ -1645,56 +1640,98 @@ def app_home(
             exclude_done=True,
         )
 
-    if len(tasks) == 0:
-        block_list = block_formatters.add_block(block_list, blocks.text)
-        block_list = block_formatters.inject_text(
-            block_list=block_list, text=strings.no_tasks
-        )
+    sections = []
+    for title, empty_str, formatter, sorted_items in [
+        (
+            "Assigned Cards",
+            strings.no_stories,
+            format_stories,
+            taigalink.sort_by_project(user_stories),
+        ),
+        (
+            "Assigned Issues",
+            strings.no_issues,
+            format_issues,
+            taigalink.sort_by_project(user_issues),
+        ),
+        (
+            "Assigned Tasks",
+            strings.no_tasks,
+            format_tasks,
+            taigalink.sort_tasks_by_user_story(tasks),
+        ),
+    ]:
+        groups = []
+        for items in sorted_items.values():
+            header, body, item_blocks = formatter(items)
 
-    else:
+            # Skip over tasks assigned in template cards
+            if formatter == format_tasks and "template" in header.lower():
+                continue
 
-        # Sort the tasks based on user story
-        sorted_tasks = taigalink.sort_tasks_by_user_story(tasks)
+            groups.append(
+                {
+                    "items": items,
+                    "header": header,
+                    "blocks": item_blocks,
+                    "formatter": formatter,
+                }
+            )
+        sections.append({"title": title, "empty": empty_str, "groups": groups})
+
+    # Blocks above the sections plus the footer
+    fixed_cost = len(block_list) + 1
+    levels = plan_home_layout(
+        fixed_cost=fixed_cost,
+        sections=[
+            [len(group["blocks"]) for group in section["groups"]]
+            for section in sections
+        ],
+        compress=compress,
+    )
 
-        # Things will start to break down if there are too many tasks
-        for project in sorted_tasks:
-            if len(block_list) > 95:
-                block_list = block_formatters.compress_blocks(block_list=block_list)
-                compressed_blocks = True
-                if len(block_list) > 95:
-                    # Check if we're already in a compressed recursion
-                    if not compress:
-                        return app_home(
-                            user_id=user_id,
-                            config=config,
-                            tidyhq_cache=tidyhq_cache,
-                            taiga_auth_token=taiga_auth_token,
-                            provided_user_stories=user_stories,
-                            provided_issues=user_issues,
-                            provided_tasks=tasks,
-                            compress=True,
-                        )
-                    at_block_limit = True
-                    break
-            items_added += 1
-            header, body, task_blocks = block_formatters.format_tasks(
-                task_list=sorted_tasks[project], compressed=compress
+    items_added = 0
+    at_block_limit = False
+    compressed_blocks = False
+
+    for section_index, section in enumerate(sections):
+        block_list = block_formatters.add_block(block_list, blocks.header)
+        block_list = block_formatters.inject_text(
+            block_list=block_list, text=section["title"]
+        )
+
+        if not section["groups"]:
+            block_list = block_formatters.add_block(block_list, blocks.text)
+            block_list = block_formatters.inject_text(
+                block_list=block_list, text=section["empty"]
             )
 
-            # Skip over tasks assigned in template cards
-            if "template" in header.lower():
+        for group, level in zip(section["groups"], levels[section_index]):
+            if level == "dropped":
+                at_block_limit = True
                 continue
 
-            if not compress:
+            if level == "full":
                 block_list = block_formatters.add_block(block_list, blocks.text)
                 block_list = block_formatters.inject_text(
-                    block_list=block_list, text=f"*{header}*"
+                    block_list=block_list, text=f"*{group['header']}*"
                 )
-            block_list += task_blocks
-            block_list = block_formatters.add_block(block_list, blocks.divider)
+                block_list += group["blocks"]
+                block_list = block_formatters.add_block(block_list, blocks.divider)
+            else:
+                compressed_blocks = True
+                header, body, item_blocks = group["formatter"](
+                    group["items"], compressed=True
+                )
+                block_list += item_blocks
+            items_added += len(group["items"])
 
-        # Remove the last divider
-        block_list.pop()
+        # Sections are separated by a single divider
+        if section_index < len(sections) - 1:
+            if block_list[-1]["type"] != "divider":
+                block_list = block_formatters.add_block(block_list, blocks.divider)
+        elif block_list[-1]["type"] == "divider":
+            block_list.pop()
 
     if at_block_limit:
         block_list = block_formatters.add_block(block_list, blocks.divider)
@@ -0,0 +1,126 @@
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_sdk.errors import SlackApiError
+
+# Set up logging
+logger = logging.getLogger("slack.concurrency")
+
+# Settings are read from the optional "concurrency" section of config.json:
+#   listeners: size of the pool Bolt runs every listener on
+#   limits: number of instances of each limited handler that can run at once
+#   default_limit: limit for handlers not listed in limits
+#   queue: number of requests per limited handler that can be waiting before new ones are dropped
+settings = {"listeners": 10, "limits": {}, "default_limit": 2, "queue": 20}
+
+# One pool per limited handler so a backlog of slow requests can't hold up other handlers
+handler_pools: dict[str, ThreadPoolExecutor] = {}
+pending: dict[str, int] = {}
+pool_lock = threading.Lock()
+
+busy_message = "Sorry, I'm busy right now. Please try again in a minute."
+
+
+def setup(config: dict) -> ThreadPoolExecutor:
+    """Load concurrency settings from the config and return the executor Bolt should run listeners on."""
+    settings.update(config.get("concurrency", {}))
+    return ThreadPoolExecutor(
+        max_workers=settings["listeners"], thread_name_prefix="listener"
+    )
+
+
+def get_pool(name: str) -> ThreadPoolExecutor:
+    """Return the pool for a limited handler, creating it on first use."""
+    with pool_lock:
+        if name not in handler_pools:
+            handler_pools[name] = ThreadPoolExecutor(
+                max_workers=settings["limits"].get(name, settings["default_limit"]),
+                thread_name_prefix=name,
+            )
+            pending[name] = 0
+        return handler_pools[name]
+
+
+def busy(kwargs: dict):
+    """Acknowledge a dropped request and let the user know to try again.
+
+    View submissions show the message as an error on the form, clicks get an ephemeral message or DM.
+    """
+    body = kwargs.get("body") or {}
+    ack = kwargs.get("ack")
+
+    if body.get("type") == "view_submission" and ack:
+        input_blocks = [
+            block["block_id"]
+            for block in body["view"].get("blocks", [])
+            if block.get("type") == "input" and block.get("block_id")
+        ]
+        if input_blocks:
+            ack(response_action="errors", errors={input_blocks[0]: busy_message})
+            return
+
+    if ack:
+        ack()
+
+    # Only tell people about requests they made by clicking something
+    client = kwargs.get("client")
+    user = body.get("user", {}).get("id")
+    if body.get("type") not in ["block_actions", "view_submission"] or not (
+        client and user
+    ):
+        return
+
+    try:
+        channel = (body.get("channel") or {}).get("id")
+        if channel:
+            client.chat_postEphemeral(channel=channel, user=user, text=busy_message)
+        else:
+            client.chat_postMessage(channel=user, text=busy_message)
+    except SlackApiError as e:
+        logger.error(f"Failed to tell {user} their request was dropped: {e}")
+
+
+def limit(name: str):
+    """Acknowledge the request straight away and run the rest of the handler on its own bounded pool.
+
+    Only for handlers that call ack() before doing anything else. Requests that arrive while the queue is full
+    are dropped and the user is told to try again, see busy. Bolt still sees the arguments of the
+    original function so they are injected as usual. Later calls to ack() within the handler are ignored.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(**kwargs):
+            pool = get_pool(name)
+            with pool_lock:
+                accepted = pending[name] < settings["queue"]
+                if accepted:
+                    pending[name] += 1
+
+            if not accepted:
+                logger.error(
+                    f"Dropping {name} request, {pending[name]} requests already waiting"
+                )
+                busy(kwargs)
+                return
+
+            if "ack" in kwargs:
+                kwargs["ack"]()
+                kwargs["ack"] = lambda *args, **kwargs: None
+
+            def run():
+                try:
+                    func(**kwargs)
+                except Exception as e:
+                    logger.exception(f"Unhandled error in {name}: {e}")
+                finally:
+                    with pool_lock:
+                        pending[name] -= 1
+
+            pool.submit(run)
+
+        return wrapper
+
+    return decorator
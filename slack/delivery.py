@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_sdk.errors import SlackApiError
+
+# Set up logging
+logger = logging.getLogger("slack.delivery")
+
+# Slack rate limits apply to the whole workspace so every worker waits once one is limited
+backoff_until = 0.0
+backoff_lock = threading.Lock()
+
+
+def wait_for_rate_limit():
+    """Sleep until any rate limit reported by Slack has expired."""
+    delay = backoff_until - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def rate_limited(retry_after: float):
+    """Record that Slack has asked us to wait before sending anything else."""
+    global backoff_until
+    with backoff_lock:
+        backoff_until = max(backoff_until, time.time() + retry_after)
+
+
+def call(method, retries: int = 3, **kwargs):
+    """Call a Slack API method, waiting and retrying if Slack rate limits us.
+
+    Returns the response or None if the call failed.
+    """
+    for attempt in range(retries + 1):
+        wait_for_rate_limit()
+        try:
+            response = method(**kwargs)
+        except SlackApiError as e:
+            if e.response.status_code == 429 and attempt < retries:
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                logger.info(f"Rate limited, waiting {retry_after}s")
+                rate_limited(retry_after)
+                continue
+            logger.error(e)
+            return None
+
+        if not response["ok"]:
+            logger.error(response)
+            return None
+        return response
+
+    return None
+
+
+def post_message(slack_app, message: dict, retries: int = 3) -> bool:
+    """Post a message, waiting and retrying if Slack rate limits us.
+
+    message is a dict of chat_postMessage arguments. User IDs can be used as the channel to DM them.
+    """
+    if call(slack_app.client.chat_postMessage, retries=retries, **message) is None:
+        logger.error(f"Failed to send message to {message['channel']}")
+        return False
+
+    logger.info(f"Sent message to {message['channel']}")
+    return True
+
+
+def deliver(
+    slack_app, messages: list[dict], workers: int = 4, dry_run: bool = False
+) -> list[bool]:
+    """Post a batch of messages on a bounded pool of workers.
+
+    In a dry run nothing is sent and every message is reported as delivered.
+    Returns whether each message was delivered, in the same order as messages.
+    """
+    if dry_run:
+        return [True] * len(messages)
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="delivery"
+    ) as executor:
+        return list(
+            executor.map(lambda message: post_message(slack_app, message), messages)
+        )
@@ -0,0 +1,121 @@
+import hashlib
+import importlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from editable_resources import forms
+from slack import block_builder, block_formatters
+
+# Set up logging
+logger = logging.getLogger("slack.form_cache")
+
+# Rendered block lists keyed by (form id, project id, metadata version, forms version, date)
+renders: dict[tuple, list[dict]] = {}
+
+# Modification time of editable_resources/forms.py when it was last loaded
+forms_version: float | None = None
+
+# Handlers run on several threads, reloading and rendering is done by one at a time
+render_lock = threading.RLock()
+
+
+def reload_forms() -> bool:
+    """Reload editable_resources/forms.py if it has changed on disk since it was last loaded.
+
+    Returns True if the forms were reloaded.
+    """
+    global forms_version
+
+    try:
+        current_version = os.path.getmtime(forms.__file__)
+    except OSError:
+        logger.error(f"Could not stat {forms.__file__}, reloading forms anyway")
+        current_version = None
+
+    if forms_version is not None and current_version == forms_version:
+        return False
+
+    if forms_version is not None:
+        importlib.reload(forms)
+        logger.info("Forms changed on disk, cached renders discarded")
+    forms_version = current_version
+    renders.clear()
+    return True
+
+
+def form_project_id(form: dict, taiga_cache: dict) -> int | None:
+    """Resolve the Taiga project ID of a form."""
+    if not form.get("taiga_project"):
+        return None
+    try:
+        return int(form["taiga_project"])
+    except ValueError:
+        return taiga_cache["projects"]["by_name_with_extra"].get(
+            form["taiga_project"].lower()
+        )
+
+
+def metadata_version(taiga_cache: dict, project_id: int | None) -> str:
+    """Calculate a version string for the Taiga metadata forms can be rendered from.
+
+    Only the issue types and severities of a board are used when rendering forms.
+    """
+    if project_id is None or project_id not in taiga_cache["boards"]:
+        return ""
+    board = taiga_cache["boards"][project_id]
+    metadata = {
+        "types": [t["name"] for t in board["types"].values()],
+        "severities": [s["name"] for s in board["severities"].values()],
+    }
+    return hashlib.md5(json.dumps(metadata).encode()).hexdigest()
+
+
+def render_key(form_id: str, taiga_cache: dict) -> tuple:
+    """Return the cache key for a form."""
+    project_id = form_project_id(forms.forms[form_id], taiga_cache)
+    # Date questions default to the current date so renders can't outlive the day
+    return (
+        form_id,
+        project_id,
+        metadata_version(taiga_cache, project_id),
+        forms_version,
+        datetime.now().strftime("%Y-%m-%d"),
+    )
+
+
+def get_blocks(form_id: str, taigacon, taiga_cache: dict) -> list[dict]:
+    """Return the blocks for a form, rendering them if there isn't a current render cached.
+
+    The returned list is a fresh copy so the caller is free to modify it.
+    """
+    with render_lock:
+        reload_forms()
+        key = render_key(form_id=form_id, taiga_cache=taiga_cache)
+        if key not in renders:
+            logger.info(f"Rendering form {form_id}")
+            form = forms.forms[form_id]
+            renders[key] = block_formatters.questions_to_blocks(
+                form["questions"],
+                taigacon=taigacon,
+                taiga_project=form.get("taiga_project"),
+                taiga_cache=taiga_cache,
+            )
+        block_list = renders[key]
+
+    return block_builder.build(block_list)
+
+
+def precompute(taigacon, taiga_cache: dict) -> int:
+    """Render every form ahead of time. Returns the number of forms rendered."""
+    reload_forms()
+    rendered = 0
+    for form_id in forms.forms:
+        try:
+            get_blocks(form_id=form_id, taigacon=taigacon, taiga_cache=taiga_cache)
+            rendered += 1
+        except ValueError as e:
+            logger.error(f"Could not render form {form_id}: {e}")
+    return rendered
@@ -3,7 +3,7 @@ import logging
 from pprint import pprint
 
 from editable_resources import forms
-from util import misc
+from util import misc, taigalink
 
 # Set up logging
 logger = logging.getLogger("slack.forms")
@@ -124,7 +124,11 @@ def form_submission_to_description(
 
 
 def form_submission_to_metadata(
-    submission: dict, taigacon, taiga_cache: dict
+    submission: dict,
+    taigacon,
+    taiga_cache: dict,
+    taiga_auth_token: str | None = None,
+    config: dict | None = None,
 ) -> tuple[int, int | None, int | None]:
     """Extracts the Taiga project ID and mapped type/severity if applicable.
 
@@ -171,8 +175,14 @@ def form_submission_to_metadata(
     try:
         project_id = int(form["taiga_project"])
     except:
-        project_id = taiga_cache["projects"]["by_name_with_extra"].get(
-            form["taiga_project"]
+        project_id = taigalink.item_mapper(
+            item=form["taiga_project"],
+            field_type="board",
+            project_id=None,
+            taiga_auth_token=taiga_auth_token,
+            config=config,
+            taigacon=taigacon,
+            taiga_cache=taiga_cache,
         )
         if not project_id:
             raise ValueError(
@@ -180,17 +190,27 @@ def form_submission_to_metadata(
             )
 
     if project_id:
-        if taiga_type_str:
-            taiga_types: dict = taiga_cache["boards"][project_id]["types"]
-            for current_type_id, taiga_type in taiga_types.items():
-                if taiga_type["name"].lower() == taiga_type_str.lower():
-                    taiga_type_id = current_type_id
-                    break
-        if taiga_severity_str:
-            taiga_severities = taiga_cache["boards"][project_id]["severities"]
-            for current_severity_id, taiga_severity in taiga_severities:
-                if taiga_severity["name"].lower() == taiga_severity_str.lower():
-                    taiga_severity_id = current_severity_id
-                    break
+        for field_type, value in [
+            ("type", taiga_type_str),
+            ("severity", taiga_severity_str),
+        ]:
+            if not value:
+                continue
+            object_id = (
+                taigalink.item_mapper(
+                    item=value,
+                    field_type=field_type,
+                    project_id=project_id,
+                    taiga_auth_token=taiga_auth_token,
+                    config=config,
+                    taigacon=taigacon,
+                    taiga_cache=taiga_cache,
+                )
+                or None
+            )
+            if field_type == "type":
+                taiga_type_id = object_id
+            else:
+                taiga_severity_id = object_id
 
     return project_id, taiga_type_id, taiga_severity_id
@@ -1,17 +1,24 @@
+import hashlib
 import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 import requests
 
 import jsonschema
 import mistune
 
-from util import tidyhq
-from slack import block_formatters
+from util import taigalink, tidyhq
+from slack import block_formatters, delivery
 
 # Set up logging
 logger = logging.getLogger("slack.misc")
 
+# The app home hash store is written by several threads
+home_hashes_lock = threading.Lock()
+
 
 class mrkdwnRenderer(mistune.HTMLRenderer):
     def paragraph(self, text):
@@ -99,6 +106,32 @@ def check_for_empty_text(block, logger):
     return True
 
 
+def home_hash(block_list: list) -> str:
+    """Calculate a hash of a rendered app home."""
+    return hashlib.md5(json.dumps(block_list, sort_keys=True).encode()).hexdigest()
+
+
+def load_home_hashes(config: dict) -> dict[str, str]:
+    """Read the hashes of the app homes last published to each user."""
+    try:
+        with open(config.get("home_hash_path", "home_hashes.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_home_hashes(config: dict, hashes: dict[str, str]):
+    """Record the hashes of newly published app homes."""
+    path = config.get("home_hash_path", "home_hashes.json")
+    with home_hashes_lock:
+        # The app and cron runs both publish homes, keep what the other has recorded
+        current = load_home_hashes(config)
+        current.update(hashes)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(current, f)
+        os.replace(f"{path}.tmp", path)
+
+
 def push_home(
     user_id: str, config: dict, tidyhq_cache: dict, taiga_auth_token: str, slack_app
 ):
@@ -120,11 +153,77 @@ def push_home(
             },
         )
         logger.info(f"Set app home for {user_id} ")
-        return True
     except Exception as e:
         logger.error(f"Failed to push home view: {e}")
         return False
 
+    record_home_hashes(config, {user_id: home_hash(block_list)})
+    return True
+
+
+def refresh_homes(
+    user_ids: list[str],
+    config: dict,
+    tidyhq_cache: dict,
+    taiga_auth_token: str,
+    slack_app,
+) -> dict[str, int] | None:
+    """Render and publish the app home of many users at once.
+
+    Open items are fetched once for everyone and homes are rendered on a pool of workers.
+    Homes that haven't changed since they were last published are skipped.
+    Returns the number of homes published, unchanged and failed, or None if the items couldn't be fetched.
+    """
+    by_assignee = taigalink.open_items_by_assignee(
+        config=config, taiga_auth_token=taiga_auth_token
+    )
+    if by_assignee is None:
+        logger.error("Failed to fetch open items, homes not refreshed")
+        return None
+    slack_to_taiga = tidyhq.slack_to_taiga_index(
+        tidyhq_cache=tidyhq_cache, config=config
+    )
+    previous = load_home_hashes(config)
+    published = {}
+
+    def refresh(user_id: str) -> str:
+        taiga_id = slack_to_taiga.get(user_id) or config["taiga"]["guest_user"]
+        items = by_assignee.get(taiga_id, {})
+        block_list = block_formatters.app_home(
+            user_id=user_id,
+            config=config,
+            tidyhq_cache=tidyhq_cache,
+            taiga_auth_token=taiga_auth_token,
+            provided_user_stories=items.get("story", []),
+            provided_issues=items.get("issue", []),
+            provided_tasks=items.get("task", []),
+            slack_to_taiga=slack_to_taiga,
+        )
+        rendered_hash = home_hash(block_list)
+        if previous.get(user_id) == rendered_hash:
+            return "unchanged"
+
+        response = delivery.call(
+            slack_app.client.views_publish,
+            user_id=user_id,
+            view={"type": "home", "blocks": block_list},
+        )
+        if response is None:
+            logger.error(f"Failed to push home view for {user_id}")
+            return "failed"
+        published[user_id] = rendered_hash
+        return "published"
+
+    with ThreadPoolExecutor(
+        max_workers=config.get("home_workers", 4), thread_name_prefix="home"
+    ) as executor:
+        results = list(executor.map(refresh, user_ids))
+
+    record_home_hashes(config, published)
+    return {
+        result: results.count(result) for result in ["published", "unchanged", "failed"]
+    }
+
 
 def name_mapper(slack_id: str, slack_app) -> str:
     """
@@ -158,6 +257,32 @@ def name_mapper(slack_id: str, slack_app) -> str:
     return user_info["user"]["profile"]["display_name"]
 
 
+def paginate(method, key: str, **kwargs) -> list:
+    """Call a paginated Slack API method until every page has been read.
+
+    key is the list in each response to collect, eg "members" for conversations_members.
+    """
+    results = []
+    cursor = None
+    while True:
+        response = method(cursor=cursor, limit=1000, **kwargs)
+        results += response[key]
+        cursor = response.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return results
+
+
+def user_names(slack_app) -> dict[str, str]:
+    """Return the names of every user in the workspace keyed by ID.
+
+    Like name_mapper the real name is used where set, falling back to the display name.
+    """
+    return {
+        user["id"]: user.get("real_name") or user["profile"]["display_name"]
+        for user in paginate(slack_app.client.users_list, "members")
+    }
+
+
 def send_dm(
     slack_id: str,
     message: str,
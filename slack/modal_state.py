@@ -0,0 +1,63 @@
+import logging
+import threading
+from collections import OrderedDict
+
+# Set up logging
+logger = logging.getLogger("slack.modal_state")
+
+# The data each open modal was rendered from, keyed by Slack view ID
+# Slack doesn't tell us when a modal is closed so only the most recent views are kept
+views: OrderedDict[str, dict] = OrderedDict()
+max_views = 200
+
+# Handlers run on several threads
+views_lock = threading.Lock()
+
+
+def save(view_id: str | None, state: dict) -> None:
+    """Remember the data a modal was rendered from."""
+    if not view_id:
+        return
+    with views_lock:
+        views[view_id] = state
+        views.move_to_end(view_id)
+        while len(views) > max_views:
+            views.popitem(last=False)
+
+
+def get(view_id: str | None) -> dict | None:
+    """Return the data a modal was rendered from, or None if it isn't known."""
+    with views_lock:
+        state = views.get(view_id)  # type: ignore
+        if state is not None:
+            views.move_to_end(view_id)  # type: ignore
+        return state
+
+
+def find_task(state: dict | None, task_id: int | str) -> dict | None:
+    """Find a task in the cached task list of a modal."""
+    if not state:
+        return None
+    for task in state.get("tasks") or []:
+        if str(task["id"]) == str(task_id):
+            return task
+    return None
+
+
+def update_task(state: dict | None, task: dict) -> bool:
+    """Apply an updated task to the cached task list of a modal.
+
+    Returns True if the modal contained the task.
+    """
+    cached = find_task(state, task["id"])
+    if cached is None:
+        return False
+    with views_lock:
+        cached.update(task)
+    return True
+
+
+def forget(view_id: str | None) -> None:
+    """Discard the data of a modal, it will be fetched again the next time it's rendered."""
+    with views_lock:
+        views.pop(view_id, None)  # type: ignore
@@ -4,8 +4,8 @@ import logging
 import os
 import re
 import sys
+import threading
 import time
-from copy import deepcopy as copy
 from pprint import pprint
 
 import requests
@@ -16,10 +16,18 @@ from slack_sdk.errors import SlackApiError
 from taiga import TaigaAPI
 
 from editable_resources import forms, strings
-from slack import blocks, block_formatters
+from slack import blocks, block_formatters, block_builder
 from slack import misc as slack_misc
 from slack import forms as slack_forms
-from util import taigalink, tidyhq
+from slack import concurrency, form_cache, modal_state
+from util import (
+    file_transfer,
+    taiga_history,
+    taiga_mirror,
+    taiga_writes,
+    taigalink,
+    tidyhq,
+)
 
 
 def log_time(
@@ -131,14 +139,39 @@ with open("taiga_cache.json", "w") as f:
     json.dump(taiga_cache, f)
 
 
+# Open items are read from the local mirror, receive_webhook.py keeps it current
+if not taiga_mirror.is_fresh(config):
+    setup_logger.info("Taiga mirror is out of date, reconciling")
+    taiga_mirror.reconcile(config=config, taiga_auth_token=taiga_auth_token)
+
+# Render forms ahead of time so opening them is quick
+rendered_forms = form_cache.precompute(taigacon=taigacon, taiga_cache=taiga_cache)
+setup_logger.info(f"Pre-rendered {rendered_forms} forms")
+
 # Set up TidyHQ cache
 tidyhq_cache = tidyhq.fresh_cache(config=config)
 setup_logger.info(
     f"TidyHQ cache set up: {len(tidyhq_cache['contacts'])} contacts, {len(tidyhq_cache['groups'])} groups"
 )
 
+# Only one thread should refresh the TidyHQ cache at a time, others keep using the current one until it's replaced
+tidyhq_cache_lock = threading.Lock()
+
+
+def refresh_tidyhq_cache() -> dict:
+    """Refresh the shared TidyHQ cache if it has expired and return it"""
+    global tidyhq_cache
+    with tidyhq_cache_lock:
+        tidyhq_cache = tidyhq.fresh_cache(config=config, cache=tidyhq_cache)
+    return tidyhq_cache
+
+
 # Set up slack app
-app = App(token=config["slack"]["bot_token"], logger=slack_logger)
+app = App(
+    token=config["slack"]["bot_token"],
+    logger=slack_logger,
+    listener_executor=concurrency.setup(config),
+)
 
 # Get the ID for our team via the API
 auth_test = app.client.auth_test()
@@ -216,7 +249,7 @@ def handle_form_command(ack, respond, command, client, body):
     refreshed_cache = False
     if not artifactory_member:
         refreshed_cache = True
-        tidyhq_cache = tidyhq.fresh_cache(config=config, cache=tidyhq_cache)
+        tidyhq_cache = refresh_tidyhq_cache()
         tidyhq_id = tidyhq.map_slack_to_tidyhq(
             tidyhq_cache=tidyhq_cache,
             config=config,
@@ -295,20 +328,14 @@ def handle_form_open_button(ack, body, client):
     ack()
     form_name = body["actions"][0]["value"]
 
-    # Reload forms from file
-    importlib.reload(forms)
+    # Get the rendered form, forms are reloaded from file if they've changed
+    block_list = form_cache.get_blocks(
+        form_id=form_name, taigacon=taigacon, taiga_cache=taiga_cache
+    )
 
     # Get the form details
     form = forms.forms[form_name]
 
-    # Convert the form questions to blocks
-    block_list = block_formatters.questions_to_blocks(
-        form["questions"],
-        taigacon=taigacon,
-        taiga_project=form.get("taiga_project"),
-        taiga_cache=taiga_cache,
-    )
-
     # Form title can only be 25 characters long
     if len(form["title"]) > 25:
         if not form.get("short_title"):
@@ -354,7 +381,11 @@ def handle_form_submissions(ack, body, logger):
     )
     project_id, taiga_type_id, taiga_severity_id = (
         slack_forms.form_submission_to_metadata(
-            submission=body, taigacon=taigacon, taiga_cache=taiga_cache
+            submission=body,
+            taigacon=taigacon,
+            taiga_cache=taiga_cache,
+            taiga_auth_token=taiga_auth_token,
+            config=config,
         )
     )
 
@@ -371,15 +402,20 @@ def handle_form_submissions(ack, body, logger):
             taiga_type_id = int(form["taiga_type"])
         except ValueError:
             # IDs are ints, if it's not then we need map from a name
-            types = taiga_cache["boards"][project_id]["types"]
-            for current_type_id, current_type in types.items():
-                if current_type["name"].lower() == form["taiga_type"].lower():
-                    taiga_type_id = current_type_id
-                    break
-            else:
-                # If we get here then we didn't find the type
+            taiga_type_id = taigalink.item_mapper(
+                item=form["taiga_type"],
+                field_type="type",
+                project_id=project_id,
+                taiga_auth_token=taiga_auth_token,
+                config=config,
+                taigacon=taigacon,
+                taiga_cache=taiga_cache,
+            )
+            if not taiga_type_id:
                 logger.error(f"Failed to resolve type {form['taiga_type']} to an ID")
-            logger.info(f"Resolved {form['taiga_type']} to {taiga_type_id}")
+                taiga_type_id = None
+            else:
+                logger.info(f"Resolved {form['taiga_type']} to {taiga_type_id}")
 
     # Get the user's name from their Slack ID
     user_info = app.client.users_info(user=body["user"]["id"])
@@ -408,23 +444,18 @@ def handle_form_submissions(ack, body, logger):
         logger.error("Failed to create issue")
         return
 
-    upload_success = True
-    for filelink in files:
-        downloaded_file = slack_misc.download_file(url=filelink, config=config)
-
-        if not downloaded_file:
-            logger.error(f"Failed to download file {filelink}")
-
-        # Upload the file to Taiga
-        upload = taigalink.attach_file(
-            taiga_auth_token=taiga_auth_token,
-            config=config,
-            project_id=project_id,
-            item_type="issue",
-            item_id=issue["id"],
-            url=filelink,
-        )
+    # Stream the files from Slack to Taiga in parallel
+    uploads = file_transfer.transfer_files(
+        taiga_auth_token=taiga_auth_token,
+        config=config,
+        project_id=project_id,
+        item_type="issue",
+        item_id=issue["id"],
+        files=[{"url": filelink} for filelink in files],
+    )
 
+    upload_success = True
+    for filelink, upload in zip(files, uploads):
         if not upload:
             logger.error(f"Failed to upload file {filelink}")
             upload_success = False
@@ -467,7 +498,7 @@ def watch_button(ack, body, respond):
     watch_target = json.loads(body["actions"][0]["value"])
 
     global tidyhq_cache
-    tidyhq_cache = tidyhq.fresh_cache(config=config, cache=tidyhq_cache)
+    tidyhq_cache = refresh_tidyhq_cache()
 
     # Check if the Slack user can be mapped to a Taiga user
     taiga_id = tidyhq.map_slack_to_taiga(
@@ -560,6 +591,7 @@ def handle_reaction_added_events(ack):
 
 
 @app.event("app_home_opened")
+@concurrency.limit("app_home")
 def handle_app_home_opened_events(body, client, logger):
     """Regenerate the app home when it's opened by a user"""
     start_time = time.time()
@@ -569,7 +601,7 @@ def handle_app_home_opened_events(body, client, logger):
     user_info = client.users_info(user=user_id)
 
     global tidyhq_cache
-    tidyhq_cache = tidyhq.fresh_cache(config=config, cache=tidyhq_cache)
+    tidyhq_cache = refresh_tidyhq_cache()
 
     slack_misc.push_home(
         user_id=user_id,
@@ -587,6 +619,19 @@ def handle_app_home_opened_events(body, client, logger):
     )
 
 
+def can_edit(slack_id: str) -> bool:
+    """Check whether a Slack user can edit items, only users linked to a Taiga account can."""
+    taiga_id = tidyhq.map_slack_to_taiga(
+        tidyhq_cache=tidyhq_cache,
+        config=config,
+        slack_id=slack_id,
+    )
+    if not taiga_id:
+        logger.error(f"Failed to map Slack user {slack_id} to Taiga user")
+        return False
+    return True
+
+
 @app.action(re.compile(r"^viewedit-.*"))
 def handle_viewedit_actions(ack, body):
     """Listen for view in app and view/edit actions"""
@@ -610,15 +655,7 @@ def handle_viewedit_actions(ack, body):
     logger.info(f"Received view/edit for {item_type} {item_id} in project {project_id}")
     ack()
 
-    # Attempt to map the Slack user to a Taiga user
-    taiga_id = tidyhq.map_slack_to_taiga(
-        tidyhq_cache=tidyhq_cache,
-        config=config,
-        slack_id=body["user"]["id"],
-    )
-
-    if not taiga_id:
-        logger.error(f"Failed to map Slack user {body['user']['id']} to Taiga user")
+    if not can_edit(body["user"]["id"]):
         view_title = f"View {item_type}"
         edit = False
 
@@ -627,6 +664,7 @@ def handle_viewedit_actions(ack, body):
         edit = True
 
     # Generate the blocks for the view/edit modal
+    state = {"item_type": item_type, "item_id": item_id, "edit": edit}
     block_list = block_formatters.viewedit_blocks(
         taigacon=taigacon,
         project_id=project_id,
@@ -636,6 +674,7 @@ def handle_viewedit_actions(ack, body):
         config=config,
         taiga_auth_token=taiga_auth_token,
         edit=edit,
+        state=state,
     )
 
     if taiga_id:
@@ -650,7 +689,7 @@ def handle_viewedit_actions(ack, body):
     if modal_method == "open":
         # Open the modal
         try:
-            client.views_open(
+            response = client.views_open(
                 trigger_id=body["trigger_id"],
                 view={
                     "type": "modal",
@@ -662,6 +701,7 @@ def handle_viewedit_actions(ack, body):
                     "clear_on_close": True,
                 },
             )
+            modal_state.save(response["view"]["id"], state)
             logger.info(
                 f"View/edit modal for {item_type} {item_id} in project {project_id} opened for {body['user']['id']} ({taiga_id})"
             )
@@ -673,7 +713,7 @@ def handle_viewedit_actions(ack, body):
     elif modal_method == "update":
         # Update the modal
         try:
-            client.views_update(
+            response = client.views_update(
                 view_id=body["view"]["root_view_id"],
                 view={
                     "type": "modal",
@@ -685,6 +725,7 @@ def handle_viewedit_actions(ack, body):
                     "clear_on_close": True,
                 },
             )
+            modal_state.save(response["view"]["id"], state)
             logger.info(
                 f"View/edit modal for {item_type} {item_id} in project {project_id} updated for {body['user']['id']}"
             )
@@ -697,7 +738,7 @@ def handle_viewedit_actions(ack, body):
 
         # Push a new modal onto the stack
         try:
-            client.views_push(
+            response = client.views_push(
                 trigger_id=body["trigger_id"],
                 view={
                     "type": "modal",
@@ -709,6 +750,7 @@ def handle_viewedit_actions(ack, body):
                     "clear_on_close": True,
                 },
             )
+            modal_state.save(response["view"]["id"], state)
             logger.info(
                 f"View/edit modal for {item_type} {item_id} in project {project_id} pushed to {body['user']['id']}"
             )
@@ -786,8 +828,11 @@ def handle_comment_addition(ack, body, logger):
             f"Comment added to {item_type} {item_id} in project {project_id} by {user_id}"
         )
         logger.info(":".join(comment.split(":")[1:]))
+        # The webhook may not have arrived before the modal is refreshed
+        taiga_history.mark_stale(config, item_type, item_id)
 
     # Regenerate the view/edit modal
+    state = {"item_type": item_type, "item_id": item_id, "edit": True}
     block_list = block_formatters.viewedit_blocks(
         taigacon=taigacon,
         project_id=project_id,
@@ -796,6 +841,7 @@ def handle_comment_addition(ack, body, logger):
         taiga_cache=taiga_cache,
         config=config,
         taiga_auth_token=taiga_auth_token,
+        state=state,
     )
 
     log_time(
@@ -819,12 +865,66 @@ def handle_comment_addition(ack, body, logger):
                 "clear_on_close": True,
             },
         )
+        modal_state.save(body["view"]["root_view_id"], state)
         logger.info(f"Updated view/edit modal for {item_type} {item_id} for {user_id}")
     except SlackApiError as e:
         logger.error(f"Failed to push modal: {e.response['error']}")
         logger.error(e.response["response_metadata"]["messages"])
 
 
+@app.action(re.compile(r"^more_comments-.*"))
+def load_more_comments(ack, body):
+    """Load the next page of comments into the view/edit modal"""
+    start_time = time.time()
+    ack()
+
+    project_id, item_type, item_id = body["actions"][0]["action_id"].split("-")[1:]
+
+    # Continue from the comments already loaded if we have them
+    state = modal_state.get(body["view"]["id"])
+    if not state:
+        # The saved state has been evicted, work out whether the user can edit again
+        state = {
+            "item_type": item_type,
+            "item_id": item_id,
+            "edit": can_edit(body["user"]["id"]),
+        }
+    state["comment_pages"] = state.get("comment_pages", 1) + 1
+
+    block_list = block_formatters.viewedit_blocks(
+        taigacon=taigacon,
+        project_id=project_id,
+        item_type=item_type,
+        item_id=item_id,
+        taiga_cache=taiga_cache,
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        edit=state["edit"],
+        state=state,
+    )
+
+    log_time(start_time, time.time(), response_logger, cause="Comment page load")
+
+    try:
+        client.views_update(
+            view_id=body["view"]["id"],
+            hash=body["view"]["hash"],
+            view={
+                "type": "modal",
+                "callback_id": "finished_editing",
+                "title": body["view"]["title"],
+                "blocks": block_list,
+                "private_metadata": body["view"]["private_metadata"],
+                "submit": {"type": "plain_text", "text": "Finish"},
+                "clear_on_close": True,
+            },
+        )
+        modal_state.save(body["view"]["id"], state)
+    except SlackApiError as e:
+        logger.error(f"Failed to update modal: {e.response['error']}")
+        logger.error(e.response["response_metadata"]["messages"])
+
+
 @app.action("home-attach_files")
 def attach_files_modal(ack, body):
     """Open a modal to submit files for later attachment"""
@@ -895,7 +995,7 @@ def view_tasks(ack, body, logger):
 
     # Push a new modal
     try:
-        client.views_push(
+        response = client.views_push(
             trigger_id=body["trigger_id"],
             view={
                 "type": "modal",
@@ -906,6 +1006,7 @@ def view_tasks(ack, body, logger):
                 "private_metadata": body["view"]["private_metadata"],
             },
         )
+        modal_state.save(response["view"]["id"], {"tasks": tasks, "edit": edit})
         logger.info(f"Pushed tasks modal for user story {story_id}")
         logger.info(f"Task modal for story {story_id} pushed for {body['user']['id']}")
     except SlackApiError as e:
@@ -914,6 +1015,7 @@ def view_tasks(ack, body, logger):
 
 
 @app.view("submit_files")
+@concurrency.limit("attach_files")
 def attach_files(ack, body):
     """Take the submitted files, uploads them to Taiga and updates the view/edit modal"""
     start_time = time.time()
@@ -926,23 +1028,23 @@ def attach_files(ack, body):
     # Get the item details from the private metadata
     project_id, item_type, item_id = body["view"]["private_metadata"].split("-")[1:]
 
-    # Upload the files to Taiga
-    for file in files:
-        file_url = file["url_private"]
-        upload = taigalink.attach_file(
-            taiga_auth_token=taiga_auth_token,
-            config=config,
-            project_id=project_id,
-            item_type=item_type,
-            item_id=item_id,
-            url=file_url,
-        )
+    # Stream the files from Slack to Taiga in parallel
+    uploads = file_transfer.transfer_files(
+        taiga_auth_token=taiga_auth_token,
+        config=config,
+        project_id=project_id,
+        item_type=item_type,
+        item_id=item_id,
+        files=[{"url": file["url_private"]} for file in files],
+    )
 
+    for file, upload in zip(files, uploads):
         if not upload:
-            logger.error(f"Failed to upload file {file_url}")
+            logger.error(f"Failed to upload file {file['url_private']}")
 
     # Unlike trigger IDs (3s expiry) we seem to be able to update the view as required
 
+    state = {"item_type": item_type, "item_id": item_id, "edit": True}
     block_list = block_formatters.viewedit_blocks(
         taigacon=taigacon,
         project_id=project_id,
@@ -951,6 +1053,7 @@ def attach_files(ack, body):
         taiga_cache=taiga_cache,
         config=config,
         taiga_auth_token=taiga_auth_token,
+        state=state,
     )
 
     log_time(
@@ -975,6 +1078,7 @@ def attach_files(ack, body):
                 "clear_on_close": True,
             },
         )
+        modal_state.save(body["view"]["root_view_id"], state)
     except SlackApiError as e:
         logger.error(f"Failed to push modal: {e.response['error']}")
 
@@ -1019,6 +1123,7 @@ def send_info_modal(ack, body, logger):
 
 
 @app.view("edited_info")
+@concurrency.limit("edit_info")
 def edit_info(ack, body, logger):
     """Update the details of an item"""
     start_time = time.time()
@@ -1035,20 +1140,18 @@ def edit_info(ack, body, logger):
     elif item_type == "issue":
         item = taigacon.issues.get(item_id)
 
+    # Changed fields are collected and written together
+    fields = {}
     for field in body["view"]["state"]["values"]:
         data = body["view"]["state"]["values"][field][field]
 
-        # Patching everything at the same time didn't seem to work
-
         if field == "subject":
             if data["value"] != item.subject and data["value"]:
                 if data["value"].strip() != "":
                     logger.info(
                         f"Updating subject from {item.subject} to {data['value']}"
                     )
-                    item.patch(
-                        fields=["subject"], subject=data["value"], version=item.version
-                    )
+                    fields["subject"] = data["value"]
 
         elif field == "description":
             if not data["value"]:
@@ -1057,30 +1160,18 @@ def edit_info(ack, body, logger):
                 logger.info(
                     f"Updating description from {item.description} to {data['value']}"
                 )
-                item.patch(
-                    fields=["description"],
-                    description=data["value"],
-                    version=item.version,
-                )
+                fields["description"] = data["value"]
         elif field == "due_date":
             if data["selected_date"] != item.due_date:
                 logger.info(
                     f"Updating due date from {item.due_date} to {data['selected_date']}"
                 )
-                item.patch(
-                    fields=["due_date"],
-                    due_date=data["selected_date"],
-                    version=item.version,
-                )
+                fields["due_date"] = data["selected_date"]
         elif field == "assigned_to":
             assigned = data["selected_option"]["value"]
             if int(assigned) != item.assigned_to:
                 logger.info(f"Updating assigned from {item.assigned_to} to {assigned}")
-                item.patch(
-                    fields=["assigned_to"],
-                    assigned_to=int(assigned),
-                    version=item.version,
-                )
+                fields["assigned_to"] = int(assigned)
         elif field == "watchers":
             current_watchers = item.watchers
             watchers = [int(watcher["value"]) for watcher in data["selected_options"]]
@@ -1105,36 +1196,51 @@ def edit_info(ack, body, logger):
             if add_watchers:
                 logger.info(f"Adding watchers {add_watchers}")
                 current_watchers = current_watchers + add_watchers
-            logging.info(
-                f"Updating watchers from {item.watchers} to {current_watchers}"
-            )
-            item.patch(fields=["watchers"], watchers=watchers, version=item.version)
+            if set(current_watchers) != set(item.watchers):
+                logging.info(
+                    f"Updating watchers from {item.watchers} to {current_watchers}"
+                )
+                fields["watchers"] = current_watchers
         elif field == "status":
             status = data["selected_option"]["value"]
             if int(status) != item.status:
                 logger.info(f"Updating status from {item.status} to {status}")
-                item.patch(fields=["status"], status=int(status), version=item.version)
+                fields["status"] = int(status)
 
         # Issue specific fields
         elif field == "type":
             type_id = data["selected_option"]["value"]
             if int(type_id) != item.type:
                 logger.info(f"Updating type from {item.type} to {type_id}")
-                item.patch(fields=["type"], type=int(type_id), version=item.version)
+                fields["type"] = int(type_id)
         elif field == "severity":
             severity_id = data["selected_option"]["value"]
             if int(severity_id) != item.severity:
                 logger.info(f"Updating severity from {item.severity} to {severity_id}")
-                item.patch(
-                    fields=["severity"], severity=int(severity_id), version=item.version
-                )
+                fields["severity"] = int(severity_id)
         elif field == "priority":
             priority = data["selected_option"]["value"]
             if int(priority) != item.priority:
                 logger.info(f"Updating priority from {item.priority} to {priority}")
-                item.patch(
-                    fields=["priority"], priority=int(priority), version=item.version
-                )
+                fields["priority"] = int(priority)
+
+    # Write every changed field in one request
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type=item_type,
+        item_id=item_id,
+        fields=fields,
+        version=item.version,
+    )
+    modal_state.forget(body["view"]["root_view_id"])
+    if not updated:
+        logger.error(f"Failed to update {item_type} {item_id}")
+        slack_misc.send_dm(
+            slack_id=body["user"]["id"],
+            message=strings.item_update_failure.format(item_type=item_type),
+            slack_app=app,
+        )
 
     log_time(
         start_time,
@@ -1150,9 +1256,13 @@ def finished_editing(ack, body):
     ack()
 
 
-@app.action(re.compile(r"^complete-.*"))
+@app.action(re.compile(r"^(complete|close_task)-.*"))
+@concurrency.limit("complete_task")
 def complete_task(ack, body, client):
-    """Mark a task a complete"""
+    """Mark a task a complete
+
+    Open modals are re-rendered from the data they were built from, so the only Taiga request is the status change.
+    """
     start_time = time.time()
     ack()
 
@@ -1161,18 +1271,25 @@ def complete_task(ack, body, client):
         "-"
     )[1:]
 
-    # Get the item from Taiga
-    item = taigalink.get_info(
-        taiga_auth_token=taiga_auth_token,
-        config=config,
-        item_id=item_id,
-        item_type=item_type,
+    tasks_state = modal_state.get(body["view"]["id"])
+    root_state = modal_state.get(body["view"]["root_view_id"])
+
+    # Use the task the modal was rendered from if possible, the write is retried if it's out of date
+    item = modal_state.find_task(tasks_state, item_id) or modal_state.find_task(
+        root_state, item_id
     )
+    if not item:
+        item = taigalink.get_info(
+            taiga_auth_token=taiga_auth_token,
+            config=config,
+            item_id=item_id,
+            item_type=item_type,
+        )
     if not item:
         logger.error(f"Failed to get item {item_type} {item_id}")
         return
 
-    complete = taigalink.mark_complete(
+    updated = taigalink.mark_complete(
         config=config,
         taiga_auth_token=taiga_auth_token,
         item_id=item_id,
@@ -1182,25 +1299,33 @@ def complete_task(ack, body, client):
         taiga_cache=taiga_cache,
     )
 
-    if not complete:
+    if not updated:
         logger.error(f"Failed to mark {item_type} {item_id} as complete")
         return
 
-    if item_type == "task":
-        # Get the tasks for the modal
-        tasks = taigalink.get_tasks(
-            config=config,
-            taiga_auth_token=taiga_auth_token,
-            exclude_done=False,
-            story_id=item["user_story"],
-        )
+    modal_state.update_task(tasks_state, updated)
+    modal_state.update_task(root_state, updated)
+
+    if item_type == "task" and body["view"]["callback_id"] == "view_tasks":
+        if tasks_state is None:
+            tasks_state = {
+                "tasks": taigalink.get_tasks(
+                    config=config,
+                    taiga_auth_token=taiga_auth_token,
+                    exclude_done=False,
+                    story_id=item["user_story"],
+                ),
+                "edit": True,
+            }
+            modal_state.save(body["view"]["id"], tasks_state)
 
         # Regenerate the task view modal
         block_list = block_formatters.format_tasks_modal_blocks(
-            task_list=tasks,
+            task_list=tasks_state["tasks"],
             config=config,
             taiga_auth_token=taiga_auth_token,
             taiga_cache=taiga_cache,
+            edit=tasks_state["edit"],
         )
 
         log_time(
@@ -1230,15 +1355,35 @@ def complete_task(ack, body, client):
             logger.error(f"Failed to push modal: {e.response['error']}")
             logger.error(e.response["response_metadata"]["messages"])
 
+    # The root modal shows the parent story of a task, otherwise the item itself
+    if item_type == "task":
+        root_type, root_id = "story", item["user_story"]
+    else:
+        root_type, root_id = item_type, item_id
+
+    if (
+        not root_state
+        or root_state["item_type"] != root_type
+        or str(root_state["item_id"]) != str(root_id)
+    ):
+        root_state = {"item_type": root_type, "item_id": root_id, "edit": True}
+    elif item_type != "task" or all(
+        task["is_closed"] for task in root_state.get("tasks", [])
+    ):
+        # The item itself has changed (Taiga may close a story once all its tasks are)
+        root_state.pop("item", None)
+
     # Update the view/edit modal
     block_list = block_formatters.viewedit_blocks(
         taigacon=taigacon,
         project_id=project_id,
-        item_type="story",
-        item_id=item["user_story"],
+        item_type=root_type,
+        item_id=root_id,
         taiga_cache=taiga_cache,
         config=config,
         taiga_auth_token=taiga_auth_token,
+        edit=root_state["edit"],
+        state=root_state,
     )
 
     try:
@@ -1247,19 +1392,35 @@ def complete_task(ack, body, client):
             view={
                 "type": "modal",
                 "callback_id": "finished_editing",
-                "title": {"type": "plain_text", "text": f"View/edit {item_type}"},
+                "title": {
+                    "type": "plain_text",
+                    "text": (
+                        f"View/edit {root_type}"
+                        if root_state["edit"]
+                        else f"View {root_type}"
+                    ),
+                },
                 "blocks": block_list,
-                "private_metadata": body["view"]["private_metadata"],
+                "private_metadata": f"viewedit-{project_id}-{root_type}-{root_id}",
                 "submit": {"type": "plain_text", "text": "Finish"},
                 "clear_on_close": True,
             },
         )
+        modal_state.save(body["view"]["root_view_id"], root_state)
     except SlackApiError as e:
         logger.error(f"Failed to push modal: {e.response['error']}")
         logger.error(e.response["response_metadata"]["messages"])
 
+    log_time(
+        start_time,
+        time.time(),
+        response_logger,
+        cause="Task completion, view/edit modal regeneration",
+    )
+
 
 @app.action(re.compile(r"^promote_issue-.*"))
+@concurrency.limit("promote_issue")
 def promote_issue(ack, body, client, respond):
     """Promote an issue to a user story"""
     start_time = time.time()
@@ -1313,6 +1474,7 @@ def promote_issue(ack, body, client, respond):
     # Check if we're in a message or modal
     if "view" in body:
         # Update the view/edit modal
+        state = {"item_type": "story", "item_id": story_id, "edit": True}
         block_list = block_formatters.viewedit_blocks(
             taigacon=taigacon,
             project_id=project_id,
@@ -1321,6 +1483,7 @@ def promote_issue(ack, body, client, respond):
             taiga_cache=taiga_cache,
             config=config,
             taiga_auth_token=taiga_auth_token,
+            state=state,
         )
 
         try:
@@ -1336,6 +1499,7 @@ def promote_issue(ack, body, client, respond):
                     "clear_on_close": True,
                 },
             )
+            modal_state.save(body["view"]["root_view_id"], state)
         except SlackApiError as e:
             logger.error(f"Failed to push modal: {e.response['error']}")
             logger.error(e.response["response_metadata"]["messages"])
@@ -1568,7 +1732,6 @@ def new_item(ack, body, client):
 def write_item(ack, body, client):
     """Write the new item to Taiga"""
     start_time = time.time()
-    ack()
 
     # Get the project_id and item type from the private metadata
     project_id, item_type = body["view"]["private_metadata"].split("-")
@@ -1627,23 +1790,39 @@ def write_item(ack, body, client):
 
     if not item_id:
         logger.error(f"Failed to create new {item_type}")
+        ack(
+            response_action="errors",
+            errors={"subject": f"Failed to create {item_type}, please try again"},
+        )
         return
 
-    # This process typically takes longer than the 3s we have to respond to the view submission
-    # So we can't open the view/edit modal
-    # Instead we'll send a DM to the user to let them know the item has been created
-
+    # Creation is a single request so we can still respond to the view submission
+    # Swap the form for a confirmation with a button to open the new item
     block_list = []
     block_list = block_formatters.add_block(block_list, blocks.text)
-    block_list[-1]["text"][
-        "text"
-    ] = f"Created new {item_type}: {new_item_details['subject']}"
+    block_list = block_formatters.inject_text(
+        block_list=block_list,
+        text=f"Created new {item_type}: {new_item_details['subject']}",
+    )
+    block_list[-1]["accessory"] = block_builder.button(
+        text="View/Edit",
+        action_id=f"viewedit-{project_id}-{item_type}-{item_id}-update",
+    )
+    ack(
+        response_action="update",
+        view={
+            "type": "modal",
+            "title": {"type": "plain_text", "text": f"New {item_type} created"},
+            "blocks": block_list,
+            "close": {"type": "plain_text", "text": "Close"},
+        },
+    )
+    log_time(start_time, time.time(), response_logger, cause="Item creation")
 
-    # Add a button to view the new item
-    button = copy(blocks.button)
-    button["text"]["text"] = "View/Edit"
-    button["action_id"] = f"viewedit-{project_id}-{item_type}-{item_id}"
-    block_list[-1]["accessory"] = button
+    # Also DM the user so they can find the item later
+    block_list[-1]["accessory"] = block_builder.button(
+        text="View/Edit", action_id=f"viewedit-{project_id}-{item_type}-{item_id}"
+    )
 
     slack_misc.send_dm(
         slack_app=app,
@@ -1659,12 +1838,7 @@ if "--cron" in sys.argv:
     logger.info("Updating homes for all users")
 
     # Get a list of all users from slack
-    slack_response = app.client.users_list()
-    slack_users = []
-    while slack_response.data.get("response_metadata", {}).get("next_cursor"):  # type: ignore
-        slack_users += slack_response.data["members"]  # type: ignore
-        slack_response = app.client.users_list(cursor=slack_response.data["response_metadata"]["next_cursor"])  # type: ignore
-    slack_users += slack_response.data["members"]  # type: ignore
+    slack_users = slack_misc.paginate(app.client.users_list, "members")
 
     users = []
 
@@ -1675,23 +1849,19 @@ if "--cron" in sys.argv:
         users.append(user)
     logger.info(f"Found {len(users)} users")
 
-    x = 1
-
-    for user in users:
-        user_id = user["id"]
-        slack_misc.push_home(
-            user_id=user_id,
-            config=config,
-            tidyhq_cache=tidyhq_cache,
-            taiga_auth_token=taiga_auth_token,
-            slack_app=app,
-        )
-
-        logger.info(
-            f"Updated home for {user_id} - {slack_misc.name_mapper(slack_id=user_id, slack_app=app)} ({x}/{len(users)})"
-        )
-        x += 1
-    logger.info(f"All homes updated ({x})")
+    start_time = time.time()
+    results = slack_misc.refresh_homes(
+        user_ids=[user["id"] for user in users],
+        config=config,
+        tidyhq_cache=tidyhq_cache,
+        taiga_auth_token=taiga_auth_token,
+        slack_app=app,
+    )
+    if results is None:
+        sys.exit(1)
+    logger.info(
+        f"All homes updated in {time.time() - start_time:.2f}s: {results['published']} published, {results['unchanged']} unchanged, {results['failed']} failed"
+    )
     sys.exit(0)
 
 
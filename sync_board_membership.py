@@ -6,6 +6,7 @@ from slack_bolt import App
 from datetime import datetime
 from pprint import pprint, pformat
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from taiga import TaigaAPI
 
@@ -73,101 +74,83 @@ taiga_cache = taigalink.setup_cache(
 # Connect to Slack
 app = App(token=config["slack"]["bot_token"], logger=slack_logger)
 
-# Check over slack channels and look for ones that have corresponding boards
-slack_channels = app.client.conversations_list(
-    types="public_channel,private_channel", exclude_archived=True, limit=1000
-)["channels"]
-
-# Sort channels by name
-slack_channels = sorted(slack_channels, key=lambda x: x["name"])
-
-for channel in slack_channels:
-    if not channel["is_member"]:
-        logger.debug(f"We are not a member of channel {channel['name']}, skipping")
-        continue
-
-    logger.debug(f"Checking channel {channel['name']}")
-    for c_project_id, c_channel_id in config["taiga-channel"].items():
-        if c_channel_id == channel["id"]:
-            print("------------------")
-            project_id = int(c_project_id)
-            logger.info(
-                f"Found channel #{channel['name']} in config. Maps to Taiga project {taiga_cache['boards'][project_id]['name']}"
-            )
-            break
-    else:
-        logger.debug(f"Channel {channel['name']} not in config")
-        continue
-
-    # Get the channel's members
-    channel_members = app.client.conversations_members(channel=channel["id"])["members"]
+start_time = time.time()
 
-    # Check if any of the channel's members exist in taiga_users
-    for slack_id in channel_members:
-        taiga_id = tidyhq.map_slack_to_taiga(
-            tidyhq_cache=tidyhq_cache, slack_id=slack_id, config=config
+# Check over slack channels and look for ones that have corresponding boards
+slack_channels = slack_misc.paginate(
+    app.client.conversations_list,
+    "channels",
+    types="public_channel,private_channel",
+    exclude_archived=True,
+)
+mapped_channels = set(config["taiga-channel"].values())
+slack_channels = sorted(
+    [
+        channel
+        for channel in slack_channels
+        if channel["is_member"] and channel["id"] in mapped_channels
+    ],
+    key=lambda x: x["name"],
+)
+logger.info(f"Found {len(slack_channels)} channels with corresponding boards")
+
+# Get the members of every channel at once
+with ThreadPoolExecutor(max_workers=config.get("sync_workers", 4)) as executor:
+    channel_members = dict(
+        zip(
+            [channel["id"] for channel in slack_channels],
+            executor.map(
+                lambda channel: slack_misc.paginate(
+                    app.client.conversations_members, "members", channel=channel["id"]
+                ),
+                slack_channels,
+            ),
         )
+    )
 
-        if not taiga_id:
-            logger.debug(f"No Taiga ID found for user {slack_id}")
-            continue
+# Resolve every member through a single pass over the TidyHQ contacts
+slack_to_taiga = tidyhq.slack_to_taiga_index(tidyhq_cache=tidyhq_cache, config=config)
 
-        # Check if the slack user is a member of the project
-        if taiga_id in taiga_cache["boards"][project_id]["members"]:
-            logger.info(
-                f"User {slack_misc.name_mapper(slack_id=slack_id, slack_app=app)} ({slack_id}) is already a member of project: {taiga_cache['boards'][project_id]['name']}"
-            )
-            continue
-        else:
-            logger.info(
-                f"User {slack_misc.name_mapper(slack_id=slack_id, slack_app=app)} ({slack_id}) is not a member of project: {taiga_cache['boards'][project_id]['name']} and may need to be added"
-            )
-
-        private = False
-        # Check if the board is private
-        if taiga_cache["boards"][project_id]["private"]:
-            logger.info(
-                f"Project {taiga_cache['boards'][project_id]['name']} is private"
-            )
-
-            # Check if the channel is also private
-            if not channel["is_private"]:
-                logger.info(f"Channel #{channel['name']} not private, will not add")
-                continue
-
-            logger.info("Both the board and channel are private, will add")
-            role_key = "highest_role"
-            private = True
-        else:
-            logger.info(
-                f"Project {taiga_cache['boards'][project_id]['name']} is public, will add"
-            )
-            role_key = "lowest_role"
+additions = taigalink.plan_board_memberships(
+    taiga_cache=taiga_cache,
+    config=config,
+    channels=slack_channels,
+    channel_members=channel_members,
+    slack_to_taiga=slack_to_taiga,
+)
+logger.info(
+    f"Planned {sum(len(project['users']) for project in additions.values())} additions across {len(additions)} projects in {time.time() - start_time:.2f}s"
+)
 
-        logger.info(
-            f"Adding {slack_misc.name_mapper(slack_id=slack_id, slack_app=app)}/{taiga_cache['users'][taiga_id]['name']} to project {taiga_cache['boards'][project_id]['name']} (ID:{project_id})"
-        )
+if additions:
+    slack_names = slack_misc.user_names(slack_app=app)
+    taiga_to_slack = {
+        taiga_id: slack_id for slack_id, taiga_id in slack_to_taiga.items()
+    }
 
+for project_id, project in additions.items():
+    print("------------------")
+    board = taiga_cache["boards"][project_id]
+    for taiga_id in project["users"]:
+        slack_id = taiga_to_slack.get(taiga_id, "")
         logger.info(
-            f"Adding as {'lowest' if not private else 'highest'} role in project ({taiga_cache['boards'][project_id][role_key]['name']})"
+            f"Adding {slack_names.get(slack_id, slack_id)}/{taiga_cache['users'][taiga_id]['name']} to project {board['name']} (ID:{project_id}) as {project['role']['name']}"
         )
 
-        response = requests.post(
-            f"{config['taiga']['url']}/api/v1/memberships",
-            headers={
-                "Authorization": f"Bearer {taiga_auth_token}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps(
-                {
-                    "role": taiga_cache["boards"][project_id][role_key]["id"],
-                    "project": project_id,
-                    "username": taiga_cache["users"][taiga_id]["username"],
-                }
-            ),
-        )
+    added = taigalink.add_board_members(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        project_id=project_id,
+        role_id=project["role"]["id"],
+        usernames=[
+            taiga_cache["users"][taiga_id]["username"] for taiga_id in project["users"]
+        ],
+    )
+    for taiga_id in project["users"]:
+        user = taiga_cache["users"][taiga_id]
+        if added[user["username"]]:
+            logger.info(f"Added {user['name']} to {board['name']}")
+        else:
+            logger.error(f"Failed to add {user['name']} to {board['name']}")
 
-        if response.status_code == 201:
-            logger.info(
-                f"Added {slack_id}/{taiga_id} to {taiga_cache['boards'][project_id]['name']}"
-            )
+logger.info(f"Board membership sync took {time.time() - start_time:.2f}s")
@@ -0,0 +1,42 @@
+import pytest
+
+from slack import block_builder, block_formatters, blocks
+
+
+def test_build_does_not_share_state_with_template():
+    button = block_builder.build(blocks.button)
+    button["text"]["text"] = "Changed"
+    assert button == {
+        "type": "button",
+        "text": {"type": "plain_text", "text": "Changed"},
+    }
+    assert blocks.button["text"]["text"] == ""
+
+
+def test_button_factory_matches_template():
+    button = block_builder.build(blocks.button)
+    button["text"]["text"] = "View/Edit"
+    button["action_id"] = "viewedit-1-task-2"
+    assert (
+        block_builder.button(text="View/Edit", action_id="viewedit-1-task-2") == button
+    )
+
+
+def test_add_block_and_inject_text_leave_templates_untouched():
+    block_list = []
+    block_list = block_formatters.add_block(block_list, blocks.text)
+    block_list = block_formatters.inject_text(block_list, "first")
+    block_list = block_formatters.add_block(block_list, blocks.text)
+    block_list = block_formatters.inject_text(block_list, "second")
+
+    assert [block["text"]["text"] for block in block_list] == ["first", "second"]
+    assert blocks.text[0]["text"]["text"] == ""
+
+
+def test_add_block_limit():
+    block_list = []
+    for _ in range(100):
+        block_list = block_formatters.add_block(block_list, blocks.divider)
+    with pytest.raises(ValueError, match="Block list too long"):
+        block_formatters.add_block(block_list, blocks.divider)
+    assert len(block_list) == 100
@@ -0,0 +1,90 @@
+from slack import block_formatters
+
+
+def make_items(count: int, projects: int, item_type: str) -> list[dict]:
+    items = []
+    for i in range(count):
+        project = i % projects
+        items.append(
+            {
+                "id": i,
+                "ref": i,
+                "subject": f"{item_type} {i}",
+                "project": project,
+                "user_story": project,
+                "project_extra_info": {
+                    "id": project,
+                    "slug": f"project-{project}",
+                    "name": f"Project {project}",
+                },
+                "user_story_extra_info": {"ref": project, "subject": f"Card {project}"},
+                "status_extra_info": {"name": "In progress"},
+            }
+        )
+    return items
+
+
+def test_plan_home_layout_fits_without_changes():
+    levels = block_formatters.plan_home_layout(fixed_cost=5, sections=[[2, 3], [], [1]])
+    assert levels == [["full", "full"], [], ["full"]]
+
+
+def test_plan_home_layout_compresses_then_drops_from_bottom():
+    sections = [[10] * 4, [10] * 4]
+    levels = block_formatters.plan_home_layout(fixed_cost=5, sections=sections)
+    flat = [level for section in levels for level in section]
+    assert "dropped" not in flat
+    assert flat[-1] == "compressed"
+    assert (
+        block_formatters.home_layout_cost(5, sections, levels)
+        <= block_formatters.home_block_limit
+    )
+
+    sections = [[30] * 3, [30]]
+    levels = block_formatters.plan_home_layout(fixed_cost=5, sections=sections)
+    assert levels == [["compressed"] * 3, ["dropped"]]
+
+
+def test_app_home_heavy_user_single_render(mocker):
+    mocker.patch("util.tidyhq.map_slack_to_taiga", return_value=5)
+    format_stories = mocker.spy(block_formatters, "format_stories")
+
+    block_list = block_formatters.app_home(
+        user_id="U123",
+        config={"taiga": {"guest_user": 6}},
+        tidyhq_cache={},
+        taiga_auth_token="token",
+        provided_user_stories=make_items(60, 20, "story"),
+        provided_issues=make_items(20, 5, "issue"),
+        provided_tasks=make_items(30, 10, "task"),
+    )
+
+    assert len(block_list) <= block_formatters.home_block_limit
+    # Each project group is formatted once, plus once more for any that are compressed
+    assert format_stories.call_count <= 40
+    assert block_list[-1]["type"] == "context"
+    assert "first" in block_list[-2]["text"]["text"]
+
+
+def test_home_layout_cost_matches_app_home(mocker):
+    mocker.patch("util.tidyhq.map_slack_to_taiga", return_value=5)
+    mocker.patch("util.taigalink.get_tasks", return_value=[])
+    stories = make_items(6, 3, "story")
+    issues = make_items(2, 1, "issue")
+
+    block_list = block_formatters.app_home(
+        user_id="U123",
+        config={"taiga": {"guest_user": 6}},
+        tidyhq_cache={},
+        taiga_auth_token="token",
+        provided_user_stories=stories,
+        provided_issues=issues,
+        provided_tasks=[],
+        compress=False,
+    )
+
+    # Header, buttons, explainer, divider and footer
+    expected = block_formatters.home_layout_cost(
+        5, [[2, 2, 2], [2], []], [["full"] * 3, ["full"], []]
+    )
+    assert len(block_list) == expected
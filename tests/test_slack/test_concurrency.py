@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+from slack_bolt.util.utils import get_arg_names_of_callable
+
+from slack import concurrency
+
+
+@pytest.fixture(autouse=True)
+def reset_pools(mocker):
+    mocker.patch.dict(
+        concurrency.settings,
+        {"listeners": 10, "limits": {}, "default_limit": 2, "queue": 20},
+    )
+    mocker.patch.dict(concurrency.handler_pools, clear=True)
+    mocker.patch.dict(concurrency.pending, clear=True)
+
+
+def test_limit_keeps_handler_arguments():
+    @concurrency.limit("test_args")
+    def handler(ack, body, client):
+        pass
+
+    assert get_arg_names_of_callable(handler) == ["ack", "body", "client"]
+
+
+def test_limit_acks_before_running_on_pool(mocker):
+    ack = mocker.Mock()
+    finished = threading.Event()
+    calls = []
+
+    @concurrency.limit("test_ack")
+    def handler(ack, body):
+        ack()
+        calls.append((threading.current_thread().name, body))
+        finished.set()
+
+    handler(ack=ack, body="body")
+
+    assert finished.wait(5)
+    ack.assert_called_once()
+    assert calls[0][0].startswith("test_ack")
+    assert calls[0][1] == "body"
+
+
+def test_limit_drops_requests_when_queue_is_full(mocker):
+    concurrency.settings["limits"]["test_queue"] = 1
+    concurrency.settings["queue"] = 2
+    release = threading.Event()
+    started = []
+
+    @concurrency.limit("test_queue")
+    def handler(ack):
+        started.append(True)
+        release.wait(5)
+
+    acks = [mocker.Mock() for _ in range(4)]
+    for ack in acks:
+        handler(ack=ack)
+
+    # Every request is acknowledged but only the first two are accepted
+    assert all(ack.called for ack in acks)
+    assert concurrency.pending["test_queue"] == 2
+    release.set()
+    concurrency.handler_pools["test_queue"].shutdown(wait=True)
+    assert len(started) == 2
+    assert concurrency.pending["test_queue"] == 0
+
+
+def test_dropped_requests_tell_the_user(mocker):
+    concurrency.settings["queue"] = 0
+
+    @concurrency.limit("test_busy")
+    def handler(ack, body, client):
+        pass
+
+    # Form submissions get an error on the form
+    ack = mocker.Mock()
+    view = {"blocks": [{"type": "section"}, {"type": "input", "block_id": "title"}]}
+    handler(ack=ack, body={"type": "view_submission", "view": view}, client=None)
+    ack.assert_called_once_with(
+        response_action="errors", errors={"title": concurrency.busy_message}
+    )
+
+    # Clicks get an ephemeral message in the channel they came from
+    ack = mocker.Mock()
+    client = mocker.Mock()
+    body = {"type": "block_actions", "user": {"id": "U1"}, "channel": {"id": "C1"}}
+    handler(ack=ack, body=body, client=client)
+    ack.assert_called_once_with()
+    client.chat_postEphemeral.assert_called_once_with(
+        channel="C1", user="U1", text=concurrency.busy_message
+    )
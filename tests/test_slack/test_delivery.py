@@ -0,0 +1,57 @@
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from slack import delivery
+
+
+@pytest.fixture(autouse=True)
+def clear_backoff(mocker):
+    mocker.patch.object(delivery, "backoff_until", 0.0)
+
+
+def rate_limit_error(mocker, retry_after: str = "2"):
+    response = mocker.Mock(status_code=429, headers={"Retry-After": retry_after})
+    return SlackApiError("ratelimited", response)
+
+
+def test_messages_sent_in_order(mocker):
+    slack_app = mocker.Mock()
+    slack_app.client.chat_postMessage.return_value = {"ok": True}
+    messages = [{"channel": f"U{i}", "text": "Reminder"} for i in range(10)]
+
+    assert delivery.deliver(slack_app, messages, workers=3) == [True] * 10
+    sent = {
+        call.kwargs["channel"]
+        for call in slack_app.client.chat_postMessage.call_args_list
+    }
+    assert sent == {f"U{i}" for i in range(10)}
+
+
+def test_rate_limit_waits_and_retries(mocker):
+    sleep = mocker.patch("time.sleep")
+    mocker.patch("time.time", return_value=100.0)
+    slack_app = mocker.Mock()
+    slack_app.client.chat_postMessage.side_effect = [
+        rate_limit_error(mocker),
+        {"ok": True},
+    ]
+
+    assert delivery.post_message(slack_app, {"channel": "U1", "text": "Reminder"})
+    assert slack_app.client.chat_postMessage.call_count == 2
+    sleep.assert_called_once_with(2.0)
+
+
+def test_gives_up_after_repeated_rate_limits(mocker):
+    mocker.patch("time.sleep")
+    slack_app = mocker.Mock()
+    slack_app.client.chat_postMessage.side_effect = rate_limit_error(mocker, "0")
+
+    assert not delivery.post_message(slack_app, {"channel": "U1"}, retries=2)
+    assert slack_app.client.chat_postMessage.call_count == 3
+
+
+def test_dry_run_sends_nothing(mocker):
+    slack_app = mocker.Mock()
+
+    assert delivery.deliver(slack_app, [{"channel": "U1"}], dry_run=True) == [True]
+    slack_app.client.chat_postMessage.assert_not_called()
@@ -0,0 +1,67 @@
+from copy import deepcopy
+
+import pytest
+
+from editable_resources import forms
+from slack import block_formatters, form_cache
+
+
+@pytest.fixture
+def taiga_cache():
+    return {
+        "boards": {
+            1: {
+                "types": {1: {"name": "Broken Tool/Equipment"}, 2: {"name": "Other"}},
+                "severities": {1: {"name": "Minor"}, 2: {"name": "Critical"}},
+            }
+        },
+        "projects": {
+            "by_name_with_extra": {
+                "3d": 1,
+                "lasers": 1,
+                "infrastructure": 1,
+                "committee": 1,
+                "taiga": 1,
+            }
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_renders():
+    form_cache.renders.clear()
+    yield
+    form_cache.renders.clear()
+
+
+def test_precompute_does_not_modify_forms(mocker, taiga_cache):
+    mocker.patch("util.taigalink.validate_form_options", return_value=True)
+    original = deepcopy(forms.forms)
+
+    rendered = form_cache.precompute(taigacon=None, taiga_cache=taiga_cache)
+
+    assert rendered == len(forms.forms)
+    assert forms.forms == original
+
+
+def test_get_blocks_uses_cached_render(mocker, taiga_cache):
+    render = mocker.spy(block_formatters, "questions_to_blocks")
+
+    first = form_cache.get_blocks("infra", taigacon=None, taiga_cache=taiga_cache)
+    first[0]["label"]["text"] = "Changed"
+    second = form_cache.get_blocks("infra", taigacon=None, taiga_cache=taiga_cache)
+
+    assert render.call_count == 1
+    assert second[0]["label"]["text"] != "Changed"
+
+
+def test_metadata_change_rerenders(mocker, taiga_cache):
+    render = mocker.spy(block_formatters, "questions_to_blocks")
+
+    form_cache.get_blocks("infra", taigacon=None, taiga_cache=taiga_cache)
+    taiga_cache["boards"][1]["severities"][3] = {"name": "Wishlist"}
+    blocks = form_cache.get_blocks("infra", taigacon=None, taiga_cache=taiga_cache)
+
+    assert render.call_count == 2
+    severity_options = [option["value"] for option in blocks[1]["element"]["options"]]
+    assert "Wishlist" in severity_options
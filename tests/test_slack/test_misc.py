@@ -123,3 +123,43 @@ def test_map_recipients_channel():
     config = {}
     expected_output = {"user": [], "channel": ["C12345"]}
     assert misc.map_recipients(recipients, tidyhq_cache, config) == expected_output
+
+
+def test_paginate_follows_cursor(mocker):
+    method = mocker.Mock(
+        side_effect=[
+            {"members": ["U1", "U2"], "response_metadata": {"next_cursor": "abc"}},
+            {"members": ["U3"], "response_metadata": {"next_cursor": ""}},
+        ]
+    )
+
+    assert misc.paginate(method, "members", channel="C1") == ["U1", "U2", "U3"]
+    assert method.call_args_list[1].kwargs["cursor"] == "abc"
+    assert method.call_args_list[1].kwargs["channel"] == "C1"
+
+
+def test_refresh_homes_skips_unchanged(mocker, tmp_path):
+    config = {
+        "taiga": {"guest_user": 6},
+        "home_hash_path": str(tmp_path / "homes.json"),
+    }
+    by_assignee = mocker.patch(
+        "util.taigalink.open_items_by_assignee",
+        return_value={5: {"story": [], "issue": [], "task": []}},
+    )
+    mocker.patch("util.tidyhq.slack_to_taiga_index", return_value={"U1": 5})
+    app_home = mocker.patch(
+        "slack.block_formatters.app_home",
+        side_effect=lambda user_id, **kwargs: [{"type": "section", "text": user_id}],
+    )
+    slack_app = mocker.Mock()
+    slack_app.client.views_publish.return_value = {"ok": True}
+
+    results = misc.refresh_homes(["U1", "U2"], config, {}, "token", slack_app)
+    assert results == {"published": 2, "unchanged": 0, "failed": 0}
+    by_assignee.assert_called_once()
+    assert app_home.call_args_list[0].kwargs["slack_to_taiga"] == {"U1": 5}
+
+    results = misc.refresh_homes(["U1", "U2"], config, {}, "token", slack_app)
+    assert results == {"published": 0, "unchanged": 2, "failed": 0}
+    assert slack_app.client.views_publish.call_count == 2
@@ -0,0 +1,157 @@
+import pytest
+
+from slack import block_formatters, modal_state
+
+
+@pytest.fixture(autouse=True)
+def clear_views(mocker):
+    mocker.patch.object(modal_state, "views", modal_state.OrderedDict())
+
+
+def test_oldest_views_are_evicted(mocker):
+    mocker.patch.object(modal_state, "max_views", 2)
+    for view_id in ["V1", "V2", "V3"]:
+        modal_state.save(view_id, {"view": view_id})
+
+    assert modal_state.get("V1") is None
+    assert modal_state.get("V3") == {"view": "V3"}
+
+
+def test_update_task_applies_write_result():
+    state = {"tasks": [{"id": 1, "is_closed": False}, {"id": 2, "is_closed": False}]}
+    modal_state.save("V1", state)
+
+    assert modal_state.update_task(modal_state.get("V1"), {"id": 2, "is_closed": True})
+    assert not modal_state.update_task(modal_state.get("V1"), {"id": 3})
+    assert modal_state.find_task(state, "2")["is_closed"]
+    assert not modal_state.find_task(state, 1)["is_closed"]
+
+
+def test_viewedit_blocks_rerender_from_state(mocker):
+    taigacon = mocker.Mock()
+    item = mocker.Mock(
+        subject="Card",
+        description="**Bold**",
+        owner_extra_info={"photo": None, "full_name_display": "Owner"},
+        project_extra_info={"id": 1},
+        status_extra_info={"name": "New"},
+        assigned_to=None,
+        watchers=[],
+        due_date=None,
+    )
+    state = {
+        "item": item,
+        "history": [],
+        "loaded_pages": 1,
+        "tasks": [
+            {
+                "id": 5,
+                "subject": "Task",
+                "is_closed": False,
+                "status_extra_info": {"name": "New"},
+            }
+        ],
+        "attachments": [],
+    }
+    get_tasks = mocker.patch("util.taigalink.get_tasks")
+
+    first = block_formatters.viewedit_blocks(
+        taigacon=taigacon,
+        project_id=1,
+        item_id=1,
+        item_type="story",
+        taiga_cache={},
+        config={},
+        taiga_auth_token="token",
+        state=state,
+    )
+    modal_state.update_task(state, {"id": 5, "is_closed": True})
+    second = block_formatters.viewedit_blocks(
+        taigacon=taigacon,
+        project_id=1,
+        item_id=1,
+        item_type="story",
+        taiga_cache={},
+        config={},
+        taiga_auth_token="token",
+        state=state,
+    )
+
+    assert taigacon.method_calls == []
+    get_tasks.assert_not_called()
+    assert item.description == "**Bold**"
+    assert "View/edit" in str(first) and "<No open tasks>" in str(second)
+
+
+def test_viewedit_blocks_offers_older_comments(mocker):
+    taigacon = mocker.Mock()
+    taigacon.issues.get.return_value = mocker.Mock(
+        subject="Issue",
+        description="",
+        owner_extra_info={"photo": None, "full_name_display": "Owner"},
+        project_extra_info={"id": 1},
+        status_extra_info={"name": "New"},
+        assigned_to=None,
+        watchers=[],
+        due_date=None,
+        project=1,
+        type=1,
+        severity=1,
+        priority=1,
+    )
+    taigacon.issues.get.return_value.id = 2
+    taigacon.issues.get.return_value.list_attachments.return_value = []
+    page = [
+        {
+            "comment": "Posted from Slack by Jane Doe: Hello",
+            "delete_comment_user": None,
+            "user": {"name": "Giant Robot", "photo": None},
+            "created_at": "2024-11-29T06:09:39.642Z",
+        }
+    ] * 10
+    get_comments = mocker.patch(
+        "util.taiga_history.get_comments", return_value=(page, 15)
+    )
+    taiga_cache = {
+        "users": {7: {"name": "Jane Doe", "photo": "https://photo"}},
+        "boards": {
+            1: {
+                "types": {1: {"name": "Bug"}},
+                "severities": {1: {"name": "Minor"}},
+                "priorities": {1: {"name": "Low"}},
+            }
+        },
+    }
+
+    state = {}
+    block_list = block_formatters.viewedit_blocks(
+        taigacon=taigacon,
+        project_id=1,
+        item_id=2,
+        item_type="issue",
+        taiga_cache=taiga_cache,
+        config={},
+        taiga_auth_token="token",
+        state=state,
+    )
+
+    assert get_comments.call_args.kwargs["page"] == 1
+    assert "more_comments-1-issue-2" in str(block_list)
+    assert "https://photo" in str(block_list)
+    assert "The 15 comments" in str(block_list)
+
+    state["comment_pages"] += 1
+    block_list = block_formatters.viewedit_blocks(
+        taigacon=taigacon,
+        project_id=1,
+        item_id=2,
+        item_type="issue",
+        taiga_cache=taiga_cache,
+        config={},
+        taiga_auth_token="token",
+        state=state,
+    )
+
+    assert get_comments.call_args.kwargs["page"] == 2
+    assert get_comments.call_count == 2
+    assert "more_comments" not in str(block_list)
@@ -0,0 +1,321 @@
+import pytest
+
+from util import attendee_plan, contact_facts, lease, taiga_janitor, taigalink
+
+config = {
+    "taiga": {"url": "https://taiga.example"},
+    "tidyhq": {"ids": {}, "training_prefix": "[Training] "},
+}
+
+story_statuses = {
+    1: {"name": "Prospective", "order": 0},
+    2: {"name": "Attendee", "order": 1},
+    3: {"name": "Member", "order": 2},
+}
+task_statuses = {4: "Complete", 5: "New", 6: "Optional", 23: "Not applicable"}
+
+
+@pytest.fixture(autouse=True)
+def clear_facts(mocker):
+    mocker.patch.object(contact_facts, "current_table", None)
+
+
+@pytest.fixture
+def tidyhq_cache():
+    return {
+        "time": 1,
+        "contacts": [
+            {
+                "id": 7,
+                "email_address": "someone@example.com",
+                "custom_fields": [],
+                "groups": [],
+            }
+        ],
+        "memberships": [],
+        "invoices": {},
+    }
+
+
+@pytest.fixture
+def snapshot():
+    return {
+        "stories": {
+            10: {
+                "id": 10,
+                "subject": "Someone",
+                "status": 1,
+                "version": 3,
+                "bot_managed": True,
+                "attributes": {"2": "someone@example.com"},
+            },
+            20: {
+                "id": 20,
+                "subject": "Template",
+                "status": 2,
+                "version": 1,
+                "bot_managed": False,
+                "attributes": {},
+            },
+        },
+        "tasks": {10: [], 20: [{"id": 1, "subject": "Say hello", "status": 6}]},
+        "closed_statuses": [4, 23],
+        "actions": {},
+    }
+
+
+def test_simulation_runs_to_fixed_point(snapshot, tidyhq_cache):
+    plan = attendee_plan.simulate(
+        snapshot=snapshot,
+        config=config,
+        tidyhq_cache=tidyhq_cache,
+        story_statuses=story_statuses,
+        task_statuses=task_statuses,
+    )
+
+    # The story moves through both columns but is only written once
+    assert plan["update_stories"] == [
+        {
+            "story": 10,
+            "subject": "Someone",
+            "from_status": 1,
+            "status": 3,
+            "version": 3,
+        }
+    ]
+    assert plan["set_attributes"] == [{"story": 10, "field": "1", "value": 7}]
+    assert plan["create_tasks"] == [
+        {"story": 10, "status": 6, "subjects": ["Say hello"]}
+    ]
+    assert plan["template_actions"] == [{"story": 10, "status": "2"}]
+    assert plan["changes"]["progress"] == 2
+    # The snapshot itself is left untouched
+    assert snapshot["stories"][10]["status"] == 1
+
+
+def test_apply_attaches_writes_to_new_stories(mocker):
+    mocker.patch.object(attendee_plan, "create_story", return_value=99)
+    create_tasks = mocker.patch.object(attendee_plan, "create_tasks", return_value=True)
+    set_custom_field = mocker.patch.object(
+        taigalink, "set_custom_field", return_value=False
+    )
+    record = mocker.patch.object(taiga_janitor, "record_template_action")
+    mocker.patch.object(taiga_janitor, "compact_template_actions")
+
+    plan = {
+        "create_stories": [{"ref": "new-2", "subject": "Someone", "status": 2}],
+        "set_attributes": [{"story": "new-2", "field": "1", "value": 7}],
+        "update_stories": [],
+        "create_tasks": [{"story": "new-2", "status": 5, "subjects": ["Visit"]}],
+        "update_tasks": [],
+        "template_actions": [{"story": "new-2", "status": "2"}],
+    }
+
+    results = attendee_plan.apply(plan, config, "token", project_id=1)
+
+    assert results == {"succeeded": 2, "skipped": 0, "failed": 1}
+    assert set_custom_field.call_args.kwargs["story_id"] == 99
+    assert create_tasks.call_args.kwargs["story_id"] == 99
+    record.assert_called_once_with(99, "2")
+
+
+def test_simulation_leaves_other_shards_alone(snapshot, tidyhq_cache):
+    plan = attendee_plan.simulate(
+        snapshot=snapshot,
+        config=config,
+        tidyhq_cache=tidyhq_cache,
+        story_statuses=story_statuses,
+        task_statuses=task_statuses,
+        shard=1,
+        shards=2,
+    )
+
+    assert plan["update_stories"] == []
+    assert plan["set_attributes"] == []
+
+
+def test_eligibility_covers_only_bot_managed_contacts(snapshot):
+    snapshot["stories"][10]["attributes"]["1"] = 7
+    snapshot["stories"][20]["attributes"]["1"] = 8
+
+    assert attendee_plan.contact_ids(snapshot) == ["7"]
+
+
+def test_apply_only_records_templates_that_were_applied(mocker):
+    create_tasks = mocker.patch.object(
+        attendee_plan,
+        "create_tasks",
+        side_effect=lambda **kwargs: kwargs["story_id"] != 11,
+    )
+    record = mocker.patch.object(taiga_janitor, "record_template_action")
+
+    plan = {
+        "create_stories": [],
+        "set_attributes": [],
+        "update_stories": [],
+        "create_tasks": [
+            {"story": 10, "status": 5, "subjects": ["Visit"]},
+            {"story": 11, "status": 5, "subjects": ["Visit"]},
+        ],
+        "update_tasks": [],
+        # Story 12 already had every task in its template
+        "template_actions": [
+            {"story": 10, "status": "2"},
+            {"story": 11, "status": "2"},
+            {"story": 12, "status": "2"},
+        ],
+    }
+
+    results = attendee_plan.apply(plan, config, "token", project_id=1)
+
+    assert results == {"succeeded": 1, "skipped": 0, "failed": 1}
+    assert create_tasks.call_count == 2
+    assert record.call_args_list == [mocker.call(10, "2"), mocker.call(12, "2")]
+
+
+def test_apply_stops_when_the_lease_is_lost(mocker):
+    create_tasks = mocker.patch.object(attendee_plan, "create_tasks")
+    record = mocker.patch.object(taiga_janitor, "record_template_action")
+    mocker.patch.object(lease.lost, "is_set", return_value=True)
+
+    plan = {
+        "create_stories": [],
+        "set_attributes": [],
+        "update_stories": [],
+        "create_tasks": [{"story": 10, "status": 5, "subjects": ["Visit"]}],
+        "update_tasks": [],
+        "template_actions": [{"story": 10, "status": "2"}],
+    }
+
+    assert attendee_plan.apply(plan, config, "token", project_id=1) == {
+        "succeeded": 0,
+        "skipped": 0,
+        "failed": 0,
+    }
+    create_tasks.assert_not_called()
+    record.assert_not_called()
+
+
+def test_simulation_uses_the_boards_own_ids(tidyhq_cache):
+    # A board set up separately from Attendee, so none of its IDs line up
+    ids = {
+        "complete_status": 40,
+        "not_applicable_status": 41,
+        "new_story_status": 11,
+        "attributes": {
+            "tidyhq_id": "7",
+            "email": "8",
+            "tidyhq_url": "9",
+            "membership": "10",
+        },
+    }
+    snapshot = {
+        "stories": {
+            10: {
+                "id": 10,
+                "subject": "Someone",
+                "status": 11,
+                "version": 3,
+                "bot_managed": True,
+                "attributes": {"8": "someone@example.com"},
+            },
+            20: {
+                "id": 20,
+                "subject": "Template",
+                "status": 12,
+                "version": 1,
+                "bot_managed": False,
+                "attributes": {},
+            },
+        },
+        "tasks": {10: [], 20: [{"id": 1, "subject": "Say hello", "status": 51}]},
+        "closed_statuses": [40, 41],
+        "actions": {},
+    }
+
+    plan = attendee_plan.simulate(
+        snapshot=snapshot,
+        config=config,
+        tidyhq_cache=tidyhq_cache,
+        story_statuses={
+            11: {"name": "Prospective", "order": 0},
+            12: {"name": "Attendee", "order": 1},
+            13: {"name": "Member", "order": 2},
+        },
+        task_statuses={40: "Complete", 50: "New", 51: "Optional", 41: "Not applicable"},
+        task_map={1: ["Say hello"]},
+        ids=ids,
+    )
+
+    assert plan["update_stories"] == [
+        {
+            "story": 10,
+            "subject": "Someone",
+            "from_status": 11,
+            "status": 13,
+            "version": 3,
+        }
+    ]
+    assert plan["set_attributes"] == [{"story": 10, "field": "7", "value": 7}]
+    # The template task is closed by column with the board's complete status
+    assert plan["create_tasks"] == [
+        {"story": 10, "status": 40, "subjects": ["Say hello"]}
+    ]
+    assert attendee_plan.contact_ids(
+        {"stories": {10: {**snapshot["stories"][10], "attributes": {"7": 7}}}}, ids
+    ) == ["7"]
+
+
+def test_apply_leaves_statuses_moved_since_the_snapshot(mocker):
+    # Story 10 was moved by hand, task 5 was edited without changing its status
+    current = {
+        "https://taiga.example/api/v1/userstories/10": {"version": 4, "status": 3},
+        "https://taiga.example/api/v1/tasks/5": {"version": 8, "status": 5},
+    }
+    mocker.patch(
+        "requests.get",
+        side_effect=lambda url, **kwargs: mocker.Mock(
+            status_code=200, json=mocker.Mock(return_value=current[url])
+        ),
+    )
+    patch = mocker.patch(
+        "requests.patch",
+        side_effect=lambda url, **kwargs: mocker.Mock(
+            status_code=(
+                200 if kwargs["json"]["version"] == current[url]["version"] else 412
+            )
+        ),
+    )
+
+    plan = {
+        "create_stories": [],
+        "set_attributes": [],
+        "update_stories": [
+            {
+                "story": 10,
+                "subject": "Someone",
+                "from_status": 1,
+                "status": 2,
+                "version": 3,
+            }
+        ],
+        "create_tasks": [],
+        "update_tasks": [
+            {
+                "task": 5,
+                "subject": "Visit",
+                "from_status": 5,
+                "status": 4,
+                "version": 7,
+            }
+        ],
+        "template_actions": [],
+    }
+
+    results = attendee_plan.apply(plan, config, "token", project_id=1)
+
+    assert results == {"succeeded": 1, "skipped": 1, "failed": 0}
+    # Only the task was written again, on top of the refetched version
+    written = [call.kwargs["json"] for call in patch.call_args_list]
+    assert {"status": 4, "version": 8} in written
+    assert len(written) == 3
@@ -0,0 +1,103 @@
+from util import attendee_plan, boards
+
+volunteer_ids = {
+    "complete_status": 40,
+    "not_applicable_status": 41,
+    "new_story_status": 30,
+    "attributes": {"tidyhq_id": 7, "email": 8, "tidyhq_url": 9, "membership": 10},
+}
+
+
+def test_board_configs_default_to_attendee():
+    assert boards.board_configs({}) == [
+        {"name": "Attendee", **attendee_plan.attendee_ids}
+    ]
+    assert boards.board_configs(
+        {
+            "boards": [
+                {
+                    "name": "Volunteers",
+                    "order_task_map": {"2": ["Induct"]},
+                    **volunteer_ids,
+                }
+            ]
+        }
+    ) == [
+        {
+            "name": "Volunteers",
+            "order_task_map": {2: ["Induct"]},
+            **volunteer_ids,
+            "attributes": {
+                "tidyhq_id": "7",
+                "email": "8",
+                "tidyhq_url": "9",
+                "membership": "10",
+            },
+        }
+    ]
+
+    # Only the Attendee board's IDs are known without being configured
+    assert boards.board_configs({"boards": [{"name": "Volunteers"}]}) is None
+
+
+def test_boards_run_in_forked_workers(mocker):
+    mocker.patch.object(boards, "TaigaAPI")
+    mocker.patch.object(
+        boards,
+        "load_board",
+        side_effect=lambda taigacon, name: {
+            "project_id": len(name),
+            "story_statuses": {},
+            "task_statuses": {},
+        },
+    )
+    mocker.patch.object(attendee_plan, "load_snapshot", return_value={"stories": {}})
+    # Workers only see the cache through what they inherit from this process
+    simulate = mocker.patch.object(
+        attendee_plan,
+        "simulate",
+        side_effect=lambda **kwargs: {
+            "iterations": 1,
+            "changes": {},
+            "contacts": len(kwargs["tidyhq_cache"]["contacts"]),
+            "task_map": kwargs["task_map"],
+        },
+    )
+    mocker.patch.object(
+        attendee_plan, "apply", return_value={"succeeded": 0, "failed": 0}
+    )
+
+    results = boards.run_boards(
+        boards=boards.board_configs(
+            {
+                "boards": [
+                    {"name": "Attendee"},
+                    {"name": "Sponsors", "order_task_map": {1: []}, **volunteer_ids},
+                ]
+            }
+        ),
+        config={"taiga": {"url": "https://taiga.example"}, "tidyhq": {}},
+        taiga_auth_token="token",
+        tidyhq_cache={"time": 1, "contacts": [], "memberships": [], "invoices": {}},
+        options={"review": True},
+    )
+
+    assert results == {
+        "Attendee": {
+            "project_id": 8,
+            "plan": {"iterations": 1, "changes": {}, "contacts": 0, "task_map": None},
+            "results": None,
+        },
+        "Sponsors": {
+            "project_id": 8,
+            "plan": {
+                "iterations": 1,
+                "changes": {},
+                "contacts": 0,
+                "task_map": {1: []},
+            },
+            "results": None,
+        },
+    }
+    # Simulation happened in the workers rather than this process
+    simulate.assert_not_called()
@@ -0,0 +1,56 @@
+from util import bulk_tasks, taiga_writes
+
+config = {"taiga": {"url": "https://taiga.example"}, "bulk_workers": 3}
+
+
+def test_changes_written_and_counted(mocker):
+    update_item = mocker.patch.object(
+        taiga_writes,
+        "update_item",
+        side_effect=lambda **kwargs: kwargs["item_id"] != 3 and {"version": 2},
+    )
+    progress = mocker.Mock()
+    changes = [(task_id, 1, {"status": 4}) for task_id in range(1, 6)]
+
+    results = bulk_tasks.apply_changes(config, "token", changes, progress=progress)
+
+    assert results == {"planned": 5, "succeeded": 4, "skipped": 0, "failed": 1}
+    assert {call.kwargs["item_id"] for call in update_item.call_args_list} == {
+        1,
+        2,
+        3,
+        4,
+        5,
+    }
+    assert progress.call_args_list[-1].args == (5, 5)
+
+
+def test_dry_run_writes_nothing(mocker):
+    update_item = mocker.patch.object(taiga_writes, "update_item")
+
+    results = bulk_tasks.apply_changes(
+        config, "token", [(1, 1, {"status": 4})], dry_run=True
+    )
+
+    assert results == {"planned": 1, "succeeded": 0, "skipped": 0, "failed": 0}
+    update_item.assert_not_called()
+
+
+def test_conflicting_changes_are_rechecked(mocker):
+    conflict = mocker.Mock(status_code=412)
+    patch = mocker.patch("requests.patch", return_value=conflict)
+    # Someone started on the task after it was listed
+    mocker.patch("requests.get").return_value = mocker.Mock(
+        status_code=200, json=mocker.Mock(return_value={"version": 3, "status": 7})
+    )
+    statuses = {4: "new", 7: "in progress"}
+
+    results = bulk_tasks.apply_changes(
+        config,
+        "token",
+        [(1, 2, {"status": 4})],
+        still_applies=lambda current: statuses[current["status"]] != "in progress",
+    )
+
+    assert results == {"planned": 1, "succeeded": 0, "skipped": 1, "failed": 0}
+    patch.assert_called_once()
@@ -0,0 +1,56 @@
+from util import bulk_tasks, conditional_closing
+
+story_statuses = {
+    10: {"name": "Prospective", "order": 0},
+    11: {"name": "Attendee", "order": 2},
+    12: {"name": "Member", "order": 3},
+}
+
+
+def test_closable_tasks_include_next_order():
+    closable = conditional_closing.closable_tasks(story_statuses)
+
+    assert closable[10] == frozenset()
+    # Order 2 closes tasks mapped up to order 3
+    assert closable[11] == frozenset(conditional_closing.order_task_map[3])
+    assert "Visit" in closable[12]
+
+
+def test_close_by_order_uses_project_task_list(mocker):
+    taigacon = mocker.Mock()
+    taigacon.user_stories.list.return_value = [
+        mocker.Mock(id=1, status=11),
+        mocker.Mock(id=2, status=10),
+    ]
+    taigacon.tasks.list.return_value = [
+        mocker.Mock(
+            id=5, user_story=1, subject="Encourage to visit", status=1, version=2
+        ),
+        mocker.Mock(
+            id=6, user_story=1, subject="Respond to enquiry", status=4, version=1
+        ),
+        mocker.Mock(
+            id=7, user_story=2, subject="Encourage to visit", status=1, version=1
+        ),
+        mocker.Mock(
+            id=8, user_story=3, subject="Encourage to visit", status=1, version=1
+        ),
+    ]
+    apply_changes = mocker.patch.object(
+        bulk_tasks,
+        "apply_changes",
+        return_value={"planned": 1, "succeeded": 1, "failed": 0},
+    )
+
+    assert (
+        conditional_closing.close_by_order(
+            taigacon,
+            project_id=1,
+            config={},
+            taiga_auth_token="token",
+            story_statuses=story_statuses,
+        )
+        == 1
+    )
+    assert apply_changes.call_args.kwargs["changes"] == [(5, 2, {"status": 4})]
+    taigacon.tasks.list.assert_called_once_with(project=1)
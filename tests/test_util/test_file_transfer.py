@@ -0,0 +1,104 @@
+from email.parser import BytesParser
+
+import pytest
+
+from util import file_transfer
+
+config = {
+    "taiga": {"url": "https://taiga.example"},
+    "slack": {"bot_token": "xoxb-token"},
+    "transfer_workers": 2,
+}
+
+
+def parse_body(content_type: str, body: bytes):
+    message = BytesParser().parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part
+        for part in message.get_payload()
+    }
+
+
+def test_multipart_stream_known_length():
+    chunks = [b"abc", b"", b"defg"]
+    stream = file_transfer.MultipartStream(
+        fields={"project": 1, "object_id": 2},
+        filename="photo.jpg",
+        chunks=iter(chunks),
+        file_length=7,
+    )
+
+    body = b""
+    while data := stream.read(5):
+        body += data
+
+    assert stream.len == len(body)
+    parts = parse_body(stream.content_type, body)
+    assert parts["project"].get_payload() == "1"
+    assert parts["object_id"].get_payload() == "2"
+    assert parts["attached_file"].get_filename() == "photo.jpg"
+    assert parts["attached_file"].get_payload(decode=True) == b"abcdefg"
+
+
+def test_multipart_stream_unknown_length():
+    stream = file_transfer.MultipartStream(
+        fields={"project": 1}, filename="a.txt", chunks=iter([b"data"])
+    )
+    assert not hasattr(stream, "len")
+    body = b"".join(stream)
+    assert parse_body(stream.content_type, body)["attached_file"].get_payload() == (
+        "data"
+    )
+
+
+@pytest.fixture
+def download(mocker):
+    response = mocker.MagicMock()
+    response.status_code = 200
+    response.headers = {"Content-Length": "4"}
+    response.iter_content.return_value = iter([b"da", b"ta"])
+    response.__enter__.return_value = response
+    return mocker.patch("requests.get", return_value=response)
+
+
+def test_transfer_file_streams_to_taiga(mocker, download):
+    upload = mocker.patch("requests.post")
+    upload.return_value.status_code = 201
+
+    assert file_transfer.transfer_file(
+        taiga_auth_token="taiga-token",
+        config=config,
+        project_id=1,
+        item_type="issue",
+        item_id=2,
+        url="https://files.slack.com/files-pri/T1-F1/photo.jpg",
+    )
+
+    assert download.call_args.kwargs["stream"] is True
+    assert download.call_args.kwargs["headers"]["Authorization"] == "Bearer xoxb-token"
+    assert upload.call_args.args[0] == "https://taiga.example/api/v1/issues/attachments"
+    body = upload.call_args.kwargs["data"]
+    assert isinstance(body, file_transfer.MultipartStream)
+    assert b"data" in body.read()
+
+
+def test_transfer_files_reports_each_result(mocker):
+    transfer = mocker.patch(
+        "util.file_transfer.transfer_file", side_effect=[True, False, True]
+    )
+
+    results = file_transfer.transfer_files(
+        taiga_auth_token="taiga-token",
+        config=config,
+        project_id=1,
+        item_type="story",
+        item_id=2,
+        files=[{"url": "a"}, {"url": "b"}, {"url": "c", "description": "C"}],
+        source="taiga",
+    )
+
+    assert results == [True, False, True]
+    assert transfer.call_count == 3
+    assert {call.kwargs["source"] for call in transfer.call_args_list} == {"taiga"}
@@ -0,0 +1,46 @@
+import pytest
+
+from util import lease
+
+
+@pytest.fixture(autouse=True)
+def lease_file(tmp_path, mocker):
+    mocker.patch.object(lease, "lease_path", str(tmp_path / "leases.json"))
+
+
+def test_overlapping_shards_are_exclusive():
+    first = lease.acquire(shard=0, shards=2)
+    assert first
+    assert lease.acquire(shard=1, shards=2)
+    # Shard 2 of 4 only holds even IDs, which shard 0 of 2 already covers
+    assert lease.acquire(shard=2, shards=4) is None
+    assert lease.acquire() is None
+
+    lease.release(first)
+    assert lease.acquire(shard=2, shards=4)
+
+
+def test_expired_leases_are_ignored(mocker):
+    time = mocker.patch("time.time", return_value=1000.0)
+    held = lease.acquire(ttl=60)
+
+    assert lease.acquire() is None
+    time.return_value = 1061.0
+    assert not lease.renew(held)
+    assert lease.acquire()
+
+
+def test_in_shard():
+    assert lease.in_shard(6, 0, 3)
+    assert not lease.in_shard("7", 0, 3)
+    # Stories that haven't been created yet belong to the first shard
+    assert lease.in_shard("new-1", 0, 3)
+
+
+def test_heartbeat_flags_a_lost_lease(mocker):
+    mocker.patch.object(lease, "renew", return_value=False)
+    try:
+        lease.heartbeat("gone", ttl=0.03)
+        assert lease.lost.wait(1)
+    finally:
+        lease.lost.clear()
@@ -0,0 +1,180 @@
+import pytest
+
+from util import taiga_history
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "taiga": {"url": "https://taiga.example"},
+        "history_dir": str(tmp_path / "history"),
+    }
+
+
+def comment_event(comment: str, created_at: str, name: str = "Jane Doe") -> dict:
+    return {
+        "comment": comment,
+        "user": {"name": name, "photo": None},
+        "created_at": created_at,
+        "delete_comment_date": None,
+        "delete_comment_user": None,
+    }
+
+
+def webhook(comment: str, date: str, **change) -> dict:
+    return {
+        "action": "change",
+        "type": "userstory",
+        "by": {"full_name": "Jane Doe", "photo": None},
+        "date": date,
+        "data": {"id": 3},
+        "change": {"comment": comment, **change},
+    }
+
+
+def test_fetch_comments_uses_taiga_pagination(mocker, config):
+    get = mocker.patch("requests.get")
+    get.return_value.status_code = 200
+    get.return_value.headers = {"x-pagination-count": "25"}
+    get.return_value.json.return_value = [{"comment": "Newest"}]
+
+    comments, total = taiga_history.fetch_comments(
+        config=config,
+        taiga_auth_token="token",
+        item_type="story",
+        item_id=3,
+        page=2,
+    )
+
+    assert comments == [{"comment": "Newest"}]
+    assert total == 25
+    assert get.call_args.args[0] == "https://taiga.example/api/v1/history/userstory/3"
+    assert get.call_args.kwargs["params"] == {
+        "type": "comment",
+        "page": 2,
+        "page_size": 10,
+    }
+
+
+def test_fetch_comments_pages_unpaginated_history(mocker, config):
+    get = mocker.patch("requests.get")
+    get.return_value.status_code = 200
+    get.return_value.headers = {}
+    get.return_value.json.return_value = [
+        {"comment": f"Comment {i}" if i % 2 else ""} for i in range(10)
+    ]
+
+    comments, total = taiga_history.fetch_comments(
+        config=config,
+        taiga_auth_token="token",
+        item_type="issue",
+        item_id=3,
+        page=2,
+        page_size=2,
+    )
+
+    assert [c["comment"] for c in comments] == ["Comment 5", "Comment 7"]
+    assert total == 5
+
+
+def test_cold_item_is_backfilled_once(mocker, config):
+    fetch = mocker.patch(
+        "util.taiga_history.fetch_comments",
+        return_value=(
+            [
+                comment_event("Second", "2024-01-02T00:00:00.000Z"),
+                comment_event("First", "2024-01-01T00:00:00.000Z"),
+            ],
+            2,
+        ),
+    )
+
+    comments, total = taiga_history.get_comments(config, "token", "story", 3)
+    assert [c["comment"] for c in comments] == ["Second", "First"]
+    assert total == 2
+
+    # Webhooks are appended to the backfilled history
+    assert taiga_history.record_webhook(
+        config, webhook("Third", "2024-01-03T00:00:00.000Z")
+    )
+    comments, total = taiga_history.get_comments(
+        config, "token", "story", 3, page=1, page_size=2
+    )
+    assert [c["comment"] for c in comments] == ["Third", "Second"]
+    assert total == 3
+    fetch.assert_called_once()
+
+
+def test_edited_comments_trigger_a_new_backfill(mocker, config):
+    fetch = mocker.patch(
+        "util.taiga_history.fetch_comments",
+        return_value=([comment_event("First", "2024-01-01T00:00:00.000Z")], 1),
+    )
+    taiga_history.get_comments(config, "token", "story", 3)
+
+    taiga_history.record_webhook(
+        config,
+        webhook("Edited", "2024-01-02T00:00:00.000Z", edit_comment_date="2024-01-02"),
+    )
+    taiga_history.get_comments(config, "token", "story", 3)
+
+    assert fetch.call_count == 2
+
+
+def test_failed_backfill_uses_local_history(mocker, config):
+    mocker.patch("util.taiga_history.fetch_comments", return_value=([], None))
+    taiga_history.record_webhook(config, webhook("Only", "2024-01-01T00:00:00.000Z"))
+
+    comments, total = taiga_history.get_comments(config, "token", "story", 3)
+
+    assert [c["comment"] for c in comments] == ["Only"]
+    assert taiga_history.load(config, "story", 3)[1] is False
+
+
+def test_deleted_items_are_removed(config):
+    taiga_history.record_webhook(config, webhook("Only", "2024-01-01T00:00:00.000Z"))
+    assert taiga_history.record_webhook(
+        config, {"action": "delete", "type": "userstory", "data": {"id": 3}}
+    )
+    assert taiga_history.load(config, "story", 3) == ([], False)
+
+
+def test_comments_are_told_apart_by_history_id(mocker, config):
+    first = comment_event("+1", "2024-01-01T00:00:10.000Z")
+    second = comment_event("+1", "2024-01-01T00:00:40.000Z")
+    mocker.patch(
+        "util.taiga_history.fetch_comments",
+        return_value=([{**second, "id": "b"}, {**first, "id": "a"}], 2),
+    )
+
+    comments, total = taiga_history.get_comments(config, "token", "story", 3)
+    assert total == 2
+
+    # A webhook delivered twice is only shown once
+    taiga_history.record_webhook(config, webhook("Hi", "2024-01-02T00:00:00.000Z"))
+    taiga_history.record_webhook(config, webhook("Hi", "2024-01-02T00:00:00.000Z"))
+    comments, total = taiga_history.get_comments(config, "token", "story", 3)
+    assert [c["comment"] for c in comments] == ["Hi", "+1", "+1"]
+
+
+def test_webhook_after_backfill_is_not_shown_twice(mocker, config):
+    mocker.patch(
+        "util.taiga_history.fetch_comments",
+        return_value=(
+            [{**comment_event("Done", "2024-01-01T00:00:00.120Z"), "id": "a"}],
+            1,
+        ),
+    )
+    taiga_history.get_comments(config, "token", "story", 3)
+
+    # The webhook for the same comment arrives late, stamped a moment apart
+    taiga_history.record_webhook(config, webhook("Done", "2024-01-01T00:00:00.450Z"))
+    # The same text posted again later is a new comment
+    taiga_history.record_webhook(config, webhook("Done", "2024-01-01T01:00:00.000Z"))
+
+    comments, total = taiga_history.get_comments(config, "token", "story", 3)
+    assert [c["created_at"] for c in comments] == [
+        "2024-01-01T01:00:00.000Z",
+        "2024-01-01T00:00:00.120Z",
+    ]
+    assert total == 2
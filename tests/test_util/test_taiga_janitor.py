@@ -0,0 +1,64 @@
+import pytest
+
+from util import taiga_janitor
+
+
+@pytest.fixture(autouse=True)
+def action_files(tmp_path, mocker):
+    mocker.patch.object(
+        taiga_janitor, "template_actions_path", str(tmp_path / "actions.json")
+    )
+    mocker.patch.object(
+        taiga_janitor, "template_journal_path", str(tmp_path / "actions.journal")
+    )
+
+
+def test_journal_replayed_over_snapshot(mocker):
+    taiga_janitor.save_template_actions({"1": ["2"]})
+    taiga_janitor.record_template_action(1, 3)
+    taiga_janitor.record_template_action(5, 2)
+    taiga_janitor.record_template_action(5, 2)
+
+    assert taiga_janitor.load_template_actions() == {"1": ["2", "3"], "5": ["2"]}
+
+    # Nothing is compacted until the journal is long enough
+    assert not taiga_janitor.compact_template_actions()
+    mocker.patch.object(taiga_janitor, "journal_compact_after", 3)
+    assert taiga_janitor.compact_template_actions()
+    assert taiga_janitor.read_template_journal() == []
+    assert taiga_janitor.load_template_actions() == {"1": ["2", "3"], "5": ["2"]}
+
+
+def test_sync_templates_creates_missing_tasks(mocker):
+    taigacon = mocker.Mock()
+    template = mocker.Mock(id=1, subject="Template", status=2, tags=[])
+    story = mocker.Mock(id=2, subject="Someone", status=2, tags=[["bot-managed"]])
+    taigacon.user_stories.list.return_value = [template, story]
+    taigacon.tasks.list.return_value = [
+        mocker.Mock(user_story=1, subject="Visit", status=5),
+        mocker.Mock(user_story=1, subject="Sign up", status=5),
+        mocker.Mock(user_story=2, subject="Visit", status=4),
+    ]
+
+    assert taiga_janitor.sync_templates(taigacon, project_id=1) == 1
+    taigacon.tasks.create.assert_called_once_with(
+        project=1, user_story=2, status=5, subject="Sign up"
+    )
+    assert taiga_janitor.load_template_actions() == {"2": ["2"]}
+
+    # Stories are only synced once per status
+    assert taiga_janitor.sync_templates(taigacon, project_id=1) == 0
+
+
+def test_compaction_holds_the_journal_lock(mocker):
+    taiga_janitor.record_template_action(1, 2)
+    flock = mocker.spy(taiga_janitor.fcntl, "flock")
+
+    assert taiga_janitor.compact_template_actions(force=True)
+    taiga_janitor.record_template_action(1, 3)
+
+    assert [call.args[1] for call in flock.call_args_list] == [
+        taiga_janitor.fcntl.LOCK_EX,
+        taiga_janitor.fcntl.LOCK_UN,
+    ] * 2
+    assert taiga_janitor.load_template_actions() == {"1": ["2", "3"]}
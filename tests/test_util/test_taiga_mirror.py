@@ -0,0 +1,127 @@
+import pytest
+
+from util import taiga_mirror, taigalink
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "taiga": {"url": "https://taiga.example"},
+        "mirror_path": str(tmp_path / "mirror.sqlite"),
+    }
+
+
+def make_item(item_id: int, **fields) -> dict:
+    item = {
+        "id": item_id,
+        "subject": f"Item {item_id}",
+        "project": 1,
+        "assigned_to": None,
+        "user_story": None,
+        "due_date": None,
+        "watchers": [],
+        "is_closed": False,
+        "version": 1,
+    }
+    item.update(fields)
+    return item
+
+
+@pytest.fixture
+def reconciled(mocker, config):
+    open_items = {
+        "userstories": [
+            make_item(1, assigned_to=5, watchers=[6]),
+            make_item(2, project=2, due_date="2024-01-01"),
+        ],
+        "issues": [make_item(3, assigned_to=6)],
+        "tasks": [make_item(4, assigned_to=5, user_story=1)],
+    }
+
+    def fake_get(url, **kwargs):
+        response = mocker.Mock(status_code=200)
+        response.json.return_value = open_items[url.split("/")[-1]]
+        return response
+
+    mocker.patch("requests.get", side_effect=fake_get)
+    assert taiga_mirror.reconcile(config, "token")
+
+
+def test_query_by_index(config, reconciled):
+    def ids(items):
+        return [item["id"] for item in items]
+
+    assert ids(taiga_mirror.query(config, "story", assigned_to=5)) == [1]
+    assert ids(taiga_mirror.query(config, "story", watcher=6)) == [1]
+    assert ids(taiga_mirror.query(config, "story", project=2)) == [2]
+    assert ids(taiga_mirror.query(config, "story", has_due_date=True)) == [2]
+    assert ids(taiga_mirror.query(config, "task", user_story=1)) == [4]
+    assert taiga_mirror.get_item(config, "issue", "3")["assigned_to"] == 6
+
+
+def test_taigalink_reads_open_items_from_mirror(mocker, config, reconciled):
+    get = mocker.patch("requests.get")
+
+    stories = taigalink.get_stories(
+        taiga_id=5, config=config, taiga_auth_token="token", exclude_done=True
+    )
+    tasks = taigalink.get_tasks(
+        config=config, taiga_auth_token="token", exclude_done=True, taiga_id=5
+    )
+
+    assert [story["id"] for story in stories] == [1]
+    assert [task["id"] for task in tasks] == [4]
+    get.assert_not_called()
+
+
+def test_promoting_a_mirrored_issue_reads_its_details(mocker, config, reconciled):
+    # Mirrored rows come from list endpoints, which leave out the description
+    get = mocker.patch("requests.get")
+    get.return_value.status_code = 200
+    get.return_value.json.side_effect = [
+        make_item(3, assigned_to=6, description="Details", tags=[]),
+        [],
+    ]
+    mocker.patch("util.taiga_history.all_comments", return_value=[])
+    create_item = mocker.patch.object(taigalink, "create_item", return_value=(10, 1))
+    mocker.patch("requests.delete").return_value.status_code = 204
+
+    assert taigalink.promote_issue(config, "token", 3) == 10
+    assert create_item.call_args.kwargs["description"] == "Details"
+    assert get.call_args_list[0].args[0] == "https://taiga.example/api/v1/issues/3"
+
+
+def test_webhooks_update_the_mirror(mocker, config, reconciled):
+    get = mocker.patch("requests.get")
+    get.return_value.status_code = 200
+    get.return_value.json.return_value = make_item(1, assigned_to=7, watchers=[])
+
+    assert taiga_mirror.apply_webhook(
+        config, "token", {"action": "change", "type": "userstory", "data": {"id": 1}}
+    )
+    assert taiga_mirror.query(config, "story", assigned_to=7)[0]["id"] == 1
+    assert taiga_mirror.query(config, "story", watcher=6) == []
+
+    # Closed items drop out of the mirror
+    get.return_value.json.return_value = make_item(1, is_closed=True)
+    taiga_mirror.apply_webhook(
+        config, "token", {"action": "change", "type": "userstory", "data": {"id": 1}}
+    )
+    assert taiga_mirror.get_item(config, "story", 1) is None
+
+    taiga_mirror.apply_webhook(
+        config, "token", {"action": "delete", "type": "issue", "data": {"id": 3}}
+    )
+    assert taiga_mirror.query(config, "issue") == []
+
+
+def test_out_of_date_mirror_is_not_used(config, reconciled):
+    config["mirror_max_age"] = 0
+    assert taiga_mirror.query(config, "story") is None
+    assert taiga_mirror.get_item(config, "story", 1) is None
+
+
+def test_failed_reconcile_keeps_previous_copy(mocker, config, reconciled):
+    mocker.patch("requests.get").return_value.status_code = 500
+    assert not taiga_mirror.reconcile(config, "token")
+    assert len(taiga_mirror.query(config, "story")) == 2
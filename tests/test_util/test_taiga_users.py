@@ -0,0 +1,52 @@
+from util import taiga_users
+
+
+def response(mocker, status_code: int, json: dict | None = None):
+    mock = mocker.Mock()
+    mock.status_code = status_code
+    mock.json.return_value = json or {}
+    return mock
+
+
+def test_details_are_remembered(mocker, tmp_path):
+    config = {
+        "taiga": {"url": "https://taiga.example"},
+        "user_memo_path": str(tmp_path / "users.json"),
+    }
+    users = [
+        {"id": 1, "date_joined": "2024-01-01"},
+        {"id": 2, "date_joined": "2024-02-01"},
+    ]
+    get = mocker.patch(
+        "requests.get",
+        side_effect=lambda url, headers: response(
+            mocker,
+            200,
+            {"email": f"{url[-1]}@example.com", "username": f"user{url[-1]}"},
+        ),
+    )
+
+    details = taiga_users.get_details(config, "token", users)
+    assert details == {
+        1: {"email": "1@example.com", "username": "user1"},
+        2: {"email": "2@example.com", "username": "user2"},
+    }
+    assert get.call_count == 2
+
+    # A recreated user is fetched again, everyone else comes from disk
+    users[1]["date_joined"] = "2024-03-01"
+    assert taiga_users.get_details(config, "token", users) == details
+    assert get.call_count == 3
+
+
+def test_failed_fetches_are_retried(mocker, tmp_path):
+    config = {
+        "taiga": {"url": "https://taiga.example"},
+        "user_memo_path": str(tmp_path / "users.json"),
+    }
+    users = [{"id": 1, "date_joined": "2024-01-01"}]
+    get = mocker.patch("requests.get", return_value=response(mocker, 500))
+
+    assert taiga_users.get_details(config, "token", users) == {}
+    assert taiga_users.get_details(config, "token", users) == {}
+    assert get.call_count == 2
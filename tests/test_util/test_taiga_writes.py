@@ -0,0 +1,138 @@
+from util import taiga_writes
+
+config = {"taiga": {"url": "https://taiga.example"}}
+
+
+def response(mocker, status_code: int, json: dict | None = None):
+    mock = mocker.Mock()
+    mock.status_code = status_code
+    mock.json.return_value = json or {}
+    mock.text = ""
+    return mock
+
+
+def test_fields_written_in_one_patch(mocker):
+    patch = mocker.patch(
+        "requests.patch", return_value=response(mocker, 200, {"version": 4})
+    )
+
+    assert taiga_writes.update_item(
+        config=config,
+        taiga_auth_token="token",
+        item_type="story",
+        item_id=10,
+        fields={"subject": "New subject", "status": 3},
+        version=3,
+    )
+
+    patch.assert_called_once()
+    assert patch.call_args.args[0] == "https://taiga.example/api/v1/userstories/10"
+    assert patch.call_args.kwargs["json"] == {
+        "subject": "New subject",
+        "status": 3,
+        "version": 3,
+    }
+
+
+def test_conflict_refetches_and_rebases(mocker):
+    patch = mocker.patch(
+        "requests.patch",
+        side_effect=[
+            response(mocker, 412),
+            response(mocker, 200, {"version": 6, "watchers": [1, 2, 3]}),
+        ],
+    )
+    get = mocker.patch(
+        "requests.get",
+        return_value=response(mocker, 200, {"version": 5, "watchers": [1, 2]}),
+    )
+
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token="token",
+        item_type="issue",
+        item_id=7,
+        fields={"watchers": [1, 3]},
+        version=4,
+        rebase=lambda current: {"watchers": current["watchers"] + [3]},
+    )
+
+    assert updated == {"version": 6, "watchers": [1, 2, 3]}
+    get.assert_called_once()
+    assert patch.call_args_list[1].kwargs["json"] == {
+        "watchers": [1, 2, 3],
+        "version": 5,
+    }
+
+
+def test_gives_up_after_repeated_conflicts(mocker):
+    patch = mocker.patch("requests.patch", return_value=response(mocker, 412))
+    mocker.patch("requests.get", return_value=response(mocker, 200, {"version": 1}))
+
+    assert (
+        taiga_writes.versioned_patch(
+            url="https://taiga.example/api/v1/tasks/1",
+            taiga_auth_token="token",
+            fields={"status": 4},
+            version=0,
+            rebase=lambda current: {"status": 4},
+            retries=2,
+        )
+        is False
+    )
+    assert patch.call_count == 3
+
+
+def test_other_errors_are_not_retried(mocker):
+    patch = mocker.patch("requests.patch", return_value=response(mocker, 400))
+
+    assert not taiga_writes.update_item(
+        config=config,
+        taiga_auth_token="token",
+        item_type="task",
+        item_id=1,
+        fields={"status": 4},
+        version=1,
+    )
+    patch.assert_called_once()
+
+
+def test_conflicts_need_a_rebase(mocker):
+    patch = mocker.patch("requests.patch", return_value=response(mocker, 412))
+    get = mocker.patch("requests.get")
+
+    # Someone else changed the task, blindly resending would undo their change
+    assert (
+        taiga_writes.update_item(
+            config=config,
+            taiga_auth_token="token",
+            item_type="task",
+            item_id=1,
+            fields={"status": 4},
+            version=1,
+        )
+        is False
+    )
+    patch.assert_called_once()
+    get.assert_not_called()
+
+
+def test_rebase_can_drop_a_change(mocker):
+    patch = mocker.patch("requests.patch", return_value=response(mocker, 412))
+    mocker.patch(
+        "requests.get", return_value=response(mocker, 200, {"version": 2, "status": 5})
+    )
+
+    assert (
+        taiga_writes.update_item(
+            config=config,
+            taiga_auth_token="token",
+            item_type="task",
+            item_id=1,
+            fields={"status": 4},
+            version=1,
+            rebase=lambda current: None,
+        )
+        is None
+    )
+    patch.assert_called_once()
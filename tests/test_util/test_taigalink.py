@@ -0,0 +1,255 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from util import taigalink
+
+config = {"taiga": {"url": "https://taiga.example"}}
+
+
+def test_create_item_single_request(mocker):
+    post = mocker.patch("requests.post")
+    post.return_value.status_code = 201
+    post.return_value.json.return_value = {
+        "id": 10,
+        "version": 1,
+        "watchers": [5, 6],
+        "due_date": "2024-01-01",
+    }
+    patch = mocker.patch("requests.patch")
+
+    result = taigalink.create_item(
+        config=config,
+        taiga_auth_token="token",
+        project_id=1,
+        item_type="story",
+        subject="New card",
+        watchers=[5, 6],
+        due_date="2024-01-01",
+    )
+
+    assert result == (10, 1)
+    assert post.call_args.kwargs["json"]["watchers"] == [5, 6]
+    assert post.call_args.kwargs["json"]["due_date"] == "2024-01-01"
+    patch.assert_not_called()
+
+
+def test_create_item_coalesces_ignored_fields(mocker):
+    post = mocker.patch("requests.post")
+    post.return_value.status_code = 201
+    post.return_value.json.return_value = {
+        "id": 10,
+        "version": 1,
+        "watchers": [],
+        "due_date": None,
+    }
+    patch = mocker.patch("requests.patch")
+    patch.return_value.status_code = 200
+    patch.return_value.json.return_value = {"version": 2}
+
+    result = taigalink.create_item(
+        config=config,
+        taiga_auth_token="token",
+        project_id=1,
+        item_type="issue",
+        subject="New issue",
+        watchers=[5],
+        due_date="2024-01-01",
+    )
+
+    assert result == (10, 2)
+    patch.assert_called_once()
+    assert patch.call_args.args[0] == "https://taiga.example/api/v1/issues/10"
+    assert patch.call_args.kwargs["json"] == {
+        "watchers": [5],
+        "due_date": "2024-01-01",
+        "version": 1,
+    }
+
+
+@pytest.fixture
+def taiga_cache():
+    return {
+        "boards": {
+            1: {
+                "statuses": {"issue": {30: {"name": "New"}}},
+                "severities": {10: {"name": "Minor"}, 11: {"name": "Critical"}},
+                "types": {20: {"name": "Bug"}},
+                "priorities": {},
+            }
+        },
+        "projects": {"by_name_with_extra": {"infrastructure": 1, "infra": 1}},
+    }
+
+
+def test_item_mapper_uses_cache(mocker, taiga_cache):
+    get = mocker.patch("requests.get")
+    taigacon = mocker.Mock()
+
+    for item, field_type, expected in [
+        ("critical", "severity", 11),
+        ("BUG", "type", 20),
+        ("new", "status", 30),
+        ("Infra", "board", 1),
+    ]:
+        assert (
+            taigalink.item_mapper(
+                item=item,
+                field_type=field_type,
+                project_id="1",
+                taiga_auth_token="token",
+                config=config,
+                taigacon=taigacon,
+                taiga_cache=taiga_cache,
+            )
+            == expected
+        )
+
+    get.assert_not_called()
+    taigacon.projects.list.assert_not_called()
+
+
+def test_item_mapper_refreshes_index_on_miss(mocker, taiga_cache):
+    get = mocker.patch("requests.get")
+    get.return_value.status_code = 200
+    get.return_value.json.return_value = [
+        {"id": 21, "name": "Enhancement"},
+        {"id": 20, "name": "Bug"},
+    ]
+
+    def lookup():
+        return taigalink.item_mapper(
+            item="Enhancement",
+            field_type="type",
+            project_id=1,
+            taiga_auth_token="token",
+            config=config,
+            taigacon=None,
+            taiga_cache=taiga_cache,
+        )
+
+    assert lookup() == 21
+    assert lookup() == 21
+    get.assert_called_once()
+    assert get.call_args.args[0] == "https://taiga.example/api/v1/issue-types"
+
+
+def test_name_index_is_built_once_by_concurrent_lookups(mocker, taiga_cache):
+    build = taigalink.build_name_index
+
+    def slow_build(cache):
+        time.sleep(0.05)
+        return build(cache)
+
+    build_name_index = mocker.patch(
+        "util.taigalink.build_name_index", side_effect=slow_build
+    )
+
+    def lookup(_):
+        return taigalink.item_mapper(
+            item="Bug",
+            field_type="type",
+            project_id=1,
+            taiga_auth_token="token",
+            config=config,
+            taigacon=None,
+            taiga_cache=taiga_cache,
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(lookup, range(8))) == [20] * 8
+    build_name_index.assert_called_once()
+
+
+def test_name_index_can_be_dumped(taiga_cache):
+    taiga_cache["name_index"] = taigalink.build_name_index(taiga_cache)
+    assert json.loads(json.dumps(taiga_cache))["name_index"]["type"]["1"] == {"bug": 20}
+
+
+def test_plan_board_memberships_groups_by_project():
+    role_low = {"id": 1, "name": "Viewer"}
+    role_high = {"id": 2, "name": "Admin"}
+    taiga_cache = {
+        "boards": {
+            10: {
+                "name": "Public",
+                "private": False,
+                "members": {100: {}},
+                "lowest_role": role_low,
+                "highest_role": role_high,
+            },
+            20: {
+                "name": "Private",
+                "private": True,
+                "members": {},
+                "lowest_role": role_low,
+                "highest_role": role_high,
+            },
+        },
+        "users": {100: {}, 101: {}, 102: {}},
+    }
+    config = {"taiga-channel": {"10": "C10", "20": "C20"}}
+    channels = [
+        {"id": "C10", "name": "public", "is_private": False},
+        {"id": "C20", "name": "private", "is_private": False},
+        {"id": "C99", "name": "other", "is_private": False},
+    ]
+    channel_members = {
+        "C10": ["U100", "U101", "U102", "U103", "U999"],
+        "C20": ["U101"],
+        "C99": ["U102"],
+    }
+    slack_to_taiga = {"U100": 100, "U101": 101, "U102": 102, "U103": 103}
+
+    additions = taigalink.plan_board_memberships(
+        taiga_cache=taiga_cache,
+        config=config,
+        channels=channels,
+        channel_members=channel_members,
+        slack_to_taiga=slack_to_taiga,
+    )
+
+    # Private boards are only joined from private channels, unknown users are skipped
+    assert additions == {10: {"role": role_low, "users": [101, 102]}}
+
+    channels[1]["is_private"] = True
+    additions = taigalink.plan_board_memberships(
+        taiga_cache=taiga_cache,
+        config=config,
+        channels=channels,
+        channel_members=channel_members,
+        slack_to_taiga=slack_to_taiga,
+    )
+    assert additions[20] == {"role": role_high, "users": [101]}
+
+
+def test_failed_bulk_membership_falls_back_to_each_user(mocker):
+    post = mocker.patch(
+        "requests.post",
+        side_effect=lambda url, **kwargs: mocker.Mock(
+            status_code=(
+                400
+                if url.endswith("bulk_create") or kwargs["json"]["username"] == "gone"
+                else 201
+            ),
+            text="",
+        ),
+    )
+
+    added = taigalink.add_board_members(
+        config=config,
+        taiga_auth_token="token",
+        project_id=1,
+        role_id=2,
+        usernames=["jane", "gone", "john"],
+    )
+
+    assert added == {"jane": True, "gone": False, "john": True}
+    assert post.call_count == 4
+    assert post.call_args.kwargs["json"] == {
+        "role": 2,
+        "project": 1,
+        "username": "john",
+    }
@@ -0,0 +1,208 @@
+import pytest
+
+from util import contact_facts, tasks, tidyhq, training
+
+
+@pytest.fixture(autouse=True)
+def clear_memo(mocker):
+    mocker.patch.object(tasks, "check_memo", {})
+    mocker.patch.dict(tasks.check_stats, {"hits": 0, "misses": 0, "matrix": 0})
+
+
+def test_checks_are_reused_until_cache_refresh(mocker):
+    check = mocker.Mock(__name__="has_key", return_value=True)
+    cache = {"time": 1}
+
+    for _ in range(3):
+        assert tasks.run_check(check, config={}, contact_id="1", tidyhq_cache=cache)
+    tasks.run_check(check, config={}, contact_id="2", tidyhq_cache=cache)
+    assert check.call_count == 2
+    assert tasks.check_stats == {"hits": 2, "misses": 2, "matrix": 0}
+
+    # A refreshed cache invalidates earlier results
+    tasks.run_check(check, config={}, contact_id="1", tidyhq_cache={"time": 2})
+    assert check.call_count == 3
+    assert len(tasks.check_memo) == 1
+
+
+config = {
+    "tidyhq": {
+        "ids": {"slack": 1, "key_status": 2, "photo_id": 3, "concession": 4},
+        "training_prefix": "[Training] ",
+    }
+}
+
+
+def make_contact(contact_id: int, **extra) -> dict:
+    contact = {
+        "id": contact_id,
+        "custom_fields": [],
+        "groups": [],
+        "phone_number": None,
+        "emergency_contact_person": None,
+        "emergency_contact_number": None,
+    }
+    contact.update(extra)
+    return contact
+
+
+@pytest.fixture
+def tidyhq_cache():
+    return {
+        "time": 1,
+        "contacts": [
+            make_contact(
+                1,
+                custom_fields=[
+                    {"id": 1, "value": "U1"},
+                    {"id": 2, "value": [{"title": "Enabled"}]},
+                    {"id": 3, "value": "photo.jpg"},
+                ],
+                groups=[
+                    {"id": 10, "label": "[Training] Induction (Member)"},
+                    {"id": 11, "label": "[Training] Lathe"},
+                    {"id": 12, "label": "Billing - Monthly"},
+                ],
+                phone_number="0400000000",
+                emergency_contact_person="Someone",
+                emergency_contact_number="0400000000",
+            ),
+            make_contact(
+                2,
+                custom_fields=[
+                    {"id": 1, "value": ""},
+                    {"id": 2, "value": [{"title": "Disabled"}]},
+                    {"id": 4, "value": "sighted"},
+                ],
+                groups=[{"id": 13, "label": "[Training] Induction (Visitor)"}],
+            ),
+            make_contact(3),
+        ],
+        "memberships": [
+            {
+                "contact_id": 1,
+                "state": "expired",
+                "membership_level": {"name": "Visitor"},
+                "start_date": "2020-01-01T08:00:00+08:00",
+                "end_date": "2020-02-01",
+            },
+            {
+                "contact_id": 1,
+                "state": "activated",
+                "membership_level": {"name": "Full Membership"},
+                "start_date": "2021-01-01T08:00:00+08:00",
+                "end_date": "2099-01-01",
+            },
+            {
+                "contact_id": 2,
+                "state": "activated",
+                "membership_level": {"name": "Visitor"},
+                "start_date": "2099-01-01T08:00:00+08:00",
+                "end_date": "2099-02-01",
+            },
+        ],
+        "invoices": {
+            "1": [
+                {"paid": False, "amount": 60, "payments": []},
+                {"paid": True, "amount": 225, "payments": [{"type": "bank"}]},
+            ],
+            "2": [{"paid": True, "amount": 135, "payments": [{"type": "card"}]}],
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_facts(mocker):
+    mocker.patch.object(contact_facts, "current_table", None)
+
+
+def test_fact_table_matches_raw_cache(tidyhq_cache):
+    table = contact_facts.build(config=config, tidyhq_cache=tidyhq_cache)
+
+    for contact in tidyhq_cache["contacts"]:
+        contact_id = contact["id"]
+        row = table["rows"][str(contact_id)]
+
+        def field(name):
+            return tidyhq.get_custom_field(
+                config=config,
+                cache=tidyhq_cache,
+                contact_id=contact_id,
+                field_map_name=name,
+            )
+
+        assert table["inductions"][row] == set(
+            training.get_inductions_for_contact(
+                config=config, contact_id=contact_id, tidyhq_cache=tidyhq_cache
+            )
+        )
+        assert table["membership_type"][row] == tidyhq.get_membership_type(
+            contact_id=contact_id, tidyhq_cache=tidyhq_cache
+        )
+        assert table["billing_group"][row] == tidyhq.check_for_groups(
+            contact_id=contact_id, tidyhq_cache=tidyhq_cache, group_string="Billing"
+        )
+        assert table["membership_levels"][row] == {
+            membership["membership_level"]["name"]
+            for membership in tidyhq.get_memberships_for_contact(
+                contact_id=contact_id, cache=tidyhq_cache
+            )
+        }
+        assert table["has_photo_id"][row] == bool(field("photo_id"))
+        assert table["has_concession"][row] == bool(field("concession"))
+        assert table["has_slack"][row] == bool(
+            field("slack") and field("slack")["value"]
+        )
+
+
+def test_checks_read_from_fact_table(tidyhq_cache):
+    def check(predicate):
+        return [
+            predicate(config=config, contact_id=contact_id, tidyhq_cache=tidyhq_cache)
+            for contact_id in ["1", "2", "3", None]
+        ]
+
+    assert check(tasks.has_key) == [True, False, False, False]
+    assert check(tasks.joined_slack) == [True, False, False, False]
+    assert check(tasks.member_signup) == [True, False, False, False]
+    assert check(tasks.visitor_signup) == [True, True, False, False]
+    assert check(tasks.visitor_induction) == [True, True, False, False]
+    assert check(tasks.at_least_one_tool) == [True, False, False, False]
+    assert check(tasks.check_payment_method) == [True, False, False, False]
+    assert check(tasks.bond_invoice_sent) == [True, True, False, False]
+    assert check(tasks.bond_invoice_paid) == [True, True, False, False]
+    assert check(tasks.member_18month) == [True, False, False, False]
+    assert check(tasks.member_2week) == [True, False, False, False]
+    # Same number as the contact's own
+    assert check(tasks.valid_emergency) == [False, False, False, False]
+    assert tasks.concession_not_needed("1", tidyhq_cache, config)
+    assert not tasks.concession_not_needed("2", tidyhq_cache, config)
+
+
+def test_emergency_details_must_differ_from_own_number():
+    contact = make_contact(
+        1,
+        phone_number="0400000000",
+        emergency_contact_person="Someone",
+        emergency_contact_number="+61 400 000 001",
+    )
+    assert contact_facts.valid_emergency_details(contact)
+    contact["emergency_contact_number"] = "+61400000000"
+    assert not contact_facts.valid_emergency_details(contact)
+
+
+def test_matrix_matches_single_checks(tidyhq_cache):
+    eligibility = tasks.eligibility_matrix(
+        config=config, tidyhq_cache=tidyhq_cache, contact_ids=[1, 2, 3, 99]
+    )
+
+    assert eligibility["contacts"] == ["1", "2", "3", "99"]
+    for contact_id in eligibility["contacts"]:
+        completed = tasks.eligible_tasks(eligibility, contact_id)
+        for subject in eligibility["tasks"]:
+            eligible = tasks.task_checks[subject](
+                config=config, contact_id=contact_id, tidyhq_cache=tidyhq_cache
+            )
+            assert tasks.matrix_lookup(eligibility, contact_id, subject) == eligible
+            assert (subject in completed) == eligible
+    assert tasks.matrix_lookup(eligibility, "4", "Join Slack") is None
@@ -0,0 +1,679 @@
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from util import (
+    conditional_closing,
+    contact_facts,
+    lease,
+    taiga_janitor,
+    taiga_writes,
+    taigalink,
+    tasks,
+    tidyhq,
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+# The simulation should settle in a handful of iterations, anything more means stages are fighting each other
+max_iterations = 50
+
+# Status and custom attribute IDs on the Attendee board, other boards set their own (see boards.board_configs)
+attendee_ids = {
+    "complete_status": 4,
+    "not_applicable_status": 23,
+    "new_story_status": 2,
+    "attributes": taigalink.attendee_attributes,
+}
+
+
+def get_json(url: str, taiga_auth_token: str, params: dict | None = None):
+    """Fetch a list or object from Taiga. Returns None if the request fails."""
+    response = requests.get(
+        url,
+        headers={
+            "Authorization": f"Bearer {taiga_auth_token}",
+            "x-disable-pagination": "True",
+        },
+        params=params,
+    )
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch {url}: {response.status_code}")
+        return None
+    return response.json()
+
+
+def load_snapshot(config: dict, taiga_auth_token: str, project_id: int) -> dict | None:
+    """Read everything the attendee pipeline looks at on a board in one pass.
+
+    Custom attributes are fetched concurrently since Taiga only returns them one story at a time.
+    Returns None if anything couldn't be fetched.
+    """
+    api = f"{config['taiga']['url']}/api/v1"
+    stories = get_json(f"{api}/userstories", taiga_auth_token, {"project": project_id})
+    all_tasks = get_json(f"{api}/tasks", taiga_auth_token, {"project": project_id})
+    task_statuses = get_json(
+        f"{api}/task-statuses", taiga_auth_token, {"project": project_id}
+    )
+    if stories is None or all_tasks is None or task_statuses is None:
+        return None
+
+    snapshot = {
+        "stories": {},
+        "tasks": {},
+        "closed_statuses": [
+            status["id"] for status in task_statuses if status["is_closed"]
+        ],
+        "actions": taiga_janitor.load_template_actions(),
+    }
+    for story in stories:
+        snapshot["stories"][story["id"]] = {
+            "id": story["id"],
+            "subject": story["subject"],
+            "status": story["status"],
+            "version": story["version"],
+            "bot_managed": any(tag[0] == "bot-managed" for tag in story["tags"]),
+            "attributes": {},
+        }
+        snapshot["tasks"][story["id"]] = []
+    for task in all_tasks:
+        if task["user_story"] in snapshot["tasks"]:
+            snapshot["tasks"][task["user_story"]].append(
+                {
+                    "id": task["id"],
+                    "subject": task["subject"],
+                    "status": task["status"],
+                    "version": task["version"],
+                }
+            )
+
+    managed = [story for story in snapshot["stories"].values() if story["bot_managed"]]
+    with ThreadPoolExecutor(
+        max_workers=config.get("attendee_workers", 4), thread_name_prefix="snapshot"
+    ) as executor:
+        attributes = list(
+            executor.map(
+                lambda story: get_json(
+                    f"{api}/userstories/custom-attributes-values/{story['id']}",
+                    taiga_auth_token,
+                ),
+                managed,
+            )
+        )
+    for story, values in zip(managed, attributes):
+        if values is None:
+            return None
+        story["attributes"] = values.get("attributes_values", {})
+
+    logger.info(
+        f"Loaded snapshot of {len(snapshot['stories'])} stories and {len(all_tasks)} tasks"
+    )
+    return snapshot
+
+
+def contact_ids(snapshot: dict, ids: dict = attendee_ids) -> list[str]:
+    """Return the TidyHQ IDs of the bot managed stories in a snapshot, the contacts whose tasks are checked."""
+    field = ids["attributes"]["tidyhq_id"]
+    return [
+        str(story["attributes"][field])
+        for story in snapshot["stories"].values()
+        if story["bot_managed"] and story["attributes"].get(field)
+    ]
+
+
+def managed_stories(state: dict) -> list[dict]:
+    """Return the bot managed stories in a simulated board that belong to the shard being processed."""
+    return [
+        story
+        for story in state["stories"].values()
+        if story["bot_managed"] and story.get("in_shard", True)
+    ]
+
+
+def is_closed(task: dict, context: dict) -> bool:
+    """Check whether a simulated task has a closed status."""
+    return task["status"] in context["closed_statuses"]
+
+
+def progress(story: dict, story_statuses: dict) -> bool:
+    """Move a story to the next column, like taigalink.progress_story."""
+    current_order = taigalink.id_to_order(story_statuses, story["status"])
+    if current_order == len(story_statuses) - 1:
+        return False
+    new_status = taigalink.order_to_id(story_statuses, current_order + 1)
+    if not new_status:
+        return False
+    story["status"] = new_status
+    return True
+
+
+def status_name(story: dict, story_statuses: dict) -> str | None:
+    """Return the name of the column a story is in."""
+    return story_statuses.get(story["status"], {}).get("name")
+
+
+def map_emails(state: dict, context: dict) -> int:
+    """Simulate tidyhq.email_to_tidyhq."""
+    made_changes = 0
+    for story in managed_stories(state):
+        attributes = story["attributes"]
+        if (
+            not attributes
+            or attributes.get(context["tidyhq_field"])
+            or not attributes.get(context["email_field"])
+        ):
+            continue
+        contact = context["contacts_by_email"].get(attributes[context["email_field"]])
+        if contact:
+            attributes[context["tidyhq_field"]] = contact["id"]
+            made_changes += 1
+    return made_changes
+
+
+def pull_tidyhq(state: dict, context: dict) -> int:
+    """Simulate intake.pull_tidyhq."""
+    # Only the first shard creates stories so workers don't create duplicates
+    if not context["import_from_tidyhq"] or context["shard"] != 0:
+        return 0
+    made_changes = 0
+    # Contacts with stories in other shards still have stories
+    story_contacts = [
+        story["attributes"].get(context["tidyhq_field"])
+        for story in state["stories"].values()
+        if story["bot_managed"]
+    ]
+    for contact_id in tidyhq.get_useful_contacts(tidyhq_cache=context["tidyhq_cache"]):
+        if contact_id in story_contacts:
+            continue
+        ref = f"new-{len(state['stories'])}"
+        state["stories"][ref] = {
+            "id": ref,
+            "subject": tidyhq.format_contact(
+                contact=tidyhq.get_contact(
+                    contact_id=contact_id, tidyhq_cache=context["tidyhq_cache"]
+                ),  # type: ignore
+            ),
+            "status": context["new_story_status"],
+            "version": None,
+            "bot_managed": True,
+            "attributes": {context["tidyhq_field"]: contact_id},
+        }
+        state["tasks"][ref] = []
+        story_contacts.append(contact_id)
+        made_changes += 1
+    return made_changes
+
+
+def sync_templates(state: dict, context: dict) -> int:
+    """Simulate taiga_janitor.sync_templates."""
+    made_changes = 0
+    for story in managed_stories(state):
+        done = state["actions"].setdefault(str(story["id"]), [])
+        if str(story["status"]) in done:
+            continue
+        if story["status"] not in context["templates"]:
+            continue
+        existing = [task["subject"] for task in state["tasks"][story["id"]]]
+        for template_task in context["templates"][story["status"]]:
+            if template_task["subject"] in existing:
+                continue
+            state["tasks"][story["id"]].append(
+                {
+                    "id": None,
+                    "subject": template_task["subject"],
+                    "status": template_task["status"],
+                    "version": None,
+                }
+            )
+            made_changes += 1
+        done.append(str(story["status"]))
+    return made_changes
+
+
+def check_tasks(state: dict, context: dict) -> int:
+    """Simulate tasks.check_all_tasks."""
+    made_changes = 0
+    for story in managed_stories(state):
+        tidyhq_id = story["attributes"].get(context["tidyhq_field"])
+        for task in state["tasks"][story["id"]]:
+            if is_closed(task, context) or (
+                context["task_statuses"].get(task["status"]) == "Not applicable"
+            ):
+                continue
+            if task["subject"] not in tasks.task_checks:
+                continue
+
+            check = tasks.matrix_lookup(
+                context["eligibility"], tidyhq_id, task["subject"]
+            )
+            if check is None:
+                check = tasks.run_check(
+                    tasks.task_checks[task["subject"]],
+                    config=context["config"],
+                    contact_id=tidyhq_id,
+                    tidyhq_cache=context["tidyhq_cache"],
+                )
+            else:
+                tasks.check_stats["matrix"] += 1
+
+            if check and task["status"] != context["complete_status"]:
+                task["status"] = context["complete_status"]
+                made_changes += 1
+            elif (
+                task["subject"] == "Proof of concession sighted"
+                and task["status"] != context["not_applicable_status"]
+                and tasks.concession_not_needed(
+                    contact_id=tidyhq_id,
+                    tidyhq_cache=context["tidyhq_cache"],
+                    config=context["config"],
+                )
+            ):
+                task["status"] = context["not_applicable_status"]
+                made_changes += 1
+    return made_changes
+
+
+def progress_stories(state: dict, context: dict) -> int:
+    """Simulate taiga_janitor.progress_stories."""
+    made_changes = 0
+    for story in managed_stories(state):
+        complete = all(
+            is_closed(task, context)
+            or context["task_statuses"].get(task["status"])
+            in ["Optional", "Not applicable"]
+            for task in state["tasks"][story["id"]]
+        )
+        if complete and progress(story, context["story_statuses"]):
+            made_changes += 1
+    return made_changes
+
+
+def close_by_order(state: dict, context: dict) -> int:
+    """Simulate conditional_closing.close_by_order."""
+    made_changes = 0
+    for story in managed_stories(state):
+        closable = context["closable"].get(story["status"], frozenset())
+        for task in state["tasks"][story["id"]]:
+            if task["status"] in [
+                context["complete_status"],
+                context["not_applicable_status"],
+            ]:
+                continue
+            if task["subject"] in closable:
+                task["status"] = context["complete_status"]
+                made_changes += 1
+    return made_changes
+
+
+def progress_on_tidyhq(state: dict, context: dict) -> int:
+    """Simulate taiga_janitor.progress_on_tidyhq."""
+    made_changes = 0
+    for story in managed_stories(state):
+        if status_name(story, context["story_statuses"]) not in [
+            "Prospective",
+            "Intake",
+        ]:
+            continue
+        if story["attributes"].get(context["tidyhq_field"]) and progress(
+            story, context["story_statuses"]
+        ):
+            made_changes += 1
+    return made_changes
+
+
+def progress_on_membership(state: dict, context: dict) -> int:
+    """Simulate taiga_janitor.progress_on_membership."""
+    made_changes = 0
+    for story in managed_stories(state):
+        if status_name(story, context["story_statuses"]) != "Attendee":
+            continue
+        tidyhq_id = story["attributes"].get(context["tidyhq_field"])
+        if not tidyhq_id:
+            continue
+        membership = contact_facts.lookup(
+            config=context["config"],
+            tidyhq_cache=context["tidyhq_cache"],
+            contact_id=tidyhq_id,
+            fact="membership_type",
+        )
+        if membership not in ["Full", "Concession", "Sponsor"]:
+            continue
+        if progress(story, context["story_statuses"]):
+            made_changes += 1
+    return made_changes
+
+
+# Stages in the order attendee.py runs them
+stages = [
+    ("email_mapping", map_emails),
+    ("intake", pull_tidyhq),
+    ("templates", sync_templates),
+    ("tasks", check_tasks),
+    ("progress", progress_stories),
+    ("closed_by_order", close_by_order),
+    ("progress_on_tidyhq", progress_on_tidyhq),
+    ("progress_on_membership", progress_on_membership),
+]
+
+
+def simulate(
+    snapshot: dict,
+    config: dict,
+    tidyhq_cache: dict,
+    story_statuses: dict,
+    task_statuses: dict,
+    eligibility: dict | None = None,
+    import_from_tidyhq: bool = False,
+    shard: int = 0,
+    shards: int = 1,
+    task_map: dict[int, list] | None = None,
+    ids: dict = attendee_ids,
+) -> dict:
+    """Run every attendee stage against a board snapshot in memory until nothing changes.
+
+    Only stories in the given shard of the board are changed, see lease.in_shard.
+    task_map overrides the tasks closed by column, see conditional_closing.order_task_map.
+    ids gives the status and custom attribute IDs of the board, see attendee_ids.
+    Returns a JSON serialisable plan of the writes needed to bring the board to the simulated state.
+    """
+    state = copy.deepcopy(snapshot)
+    for story in state["stories"].values():
+        story["in_shard"] = lease.in_shard(story["id"], shard, shards)
+
+    contacts_by_email = {}
+    for contact in tidyhq_cache["contacts"]:
+        contacts_by_email.setdefault(contact["email_address"], contact)
+
+    templates = {}
+    for story in snapshot["stories"].values():
+        if story["subject"] == "Template":
+            templates[story["status"]] = [
+                {"status": task["status"], "subject": task["subject"]}
+                for task in snapshot["tasks"][story["id"]]
+            ]
+
+    context = {
+        "config": config,
+        "tidyhq_cache": tidyhq_cache,
+        "story_statuses": story_statuses,
+        "task_statuses": task_statuses,
+        "closed_statuses": set(snapshot["closed_statuses"]),
+        "eligibility": eligibility,
+        "import_from_tidyhq": import_from_tidyhq,
+        "shard": shard,
+        "contacts_by_email": contacts_by_email,
+        "templates": templates,
+        "closable": conditional_closing.closable_tasks(story_statuses, task_map),
+        "complete_status": ids["complete_status"],
+        "not_applicable_status": ids["not_applicable_status"],
+        "new_story_status": ids["new_story_status"],
+        "tidyhq_field": ids["attributes"]["tidyhq_id"],
+        "email_field": ids["attributes"]["email"],
+    }
+
+    changes = {name: 0 for name, _ in stages}
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        made_changes = 0
+        for name, stage in stages:
+            stage_changes = stage(state, context)
+            changes[name] += stage_changes
+            made_changes += stage_changes
+        if not made_changes:
+            break
+    else:
+        logger.error(f"Simulation did not settle after {max_iterations} iterations")
+
+    return diff(snapshot, state, iterations, changes)
+
+
+def diff(snapshot: dict, state: dict, iterations: int, changes: dict) -> dict:
+    """Work out the writes that turn a snapshot into a simulated board."""
+    plan = {
+        "iterations": iterations,
+        "changes": changes,
+        "create_stories": [],
+        "set_attributes": [],
+        "update_stories": [],
+        "create_tasks": [],
+        "update_tasks": [],
+        "template_actions": [],
+    }
+
+    for story_id, story in state["stories"].items():
+        original = snapshot["stories"].get(story_id)
+        if original is None:
+            # New stories are created straight into their final column
+            plan["create_stories"].append(
+                {
+                    "ref": story_id,
+                    "subject": story["subject"],
+                    "status": story["status"],
+                }
+            )
+            original = {"status": story["status"], "attributes": {}}
+        elif story["status"] != original["status"]:
+            plan["update_stories"].append(
+                {
+                    "story": story_id,
+                    "subject": story["subject"],
+                    "from_status": original["status"],
+                    "status": story["status"],
+                    "version": story["version"],
+                }
+            )
+
+        for field, value in story["attributes"].items():
+            if original["attributes"].get(field) != value:
+                plan["set_attributes"].append(
+                    {"story": story_id, "field": field, "value": value}
+                )
+
+        original_tasks = {
+            task["id"]: task for task in snapshot["tasks"].get(story_id, [])
+        }
+        new_tasks = {}
+        for task in state["tasks"][story_id]:
+            if task["id"] is None:
+                # Template tasks are created with the status they'd end up with
+                new_tasks.setdefault(task["status"], []).append(task["subject"])
+            elif task["status"] != original_tasks[task["id"]]["status"]:
+                plan["update_tasks"].append(
+                    {
+                        "task": task["id"],
+                        "subject": task["subject"],
+                        "from_status": original_tasks[task["id"]]["status"],
+                        "status": task["status"],
+                        "version": task["version"],
+                    }
+                )
+        for status, subjects in new_tasks.items():
+            plan["create_tasks"].append(
+                {"story": story_id, "status": status, "subjects": subjects}
+            )
+
+        done = snapshot["actions"].get(str(story_id), [])
+        for status in state["actions"].get(str(story_id), []):
+            if status not in done:
+                plan["template_actions"].append({"story": story_id, "status": status})
+
+    return plan
+
+
+def create_story(
+    config: dict, taiga_auth_token: str, project_id: int, story: dict
+) -> int | None:
+    """Create a bot managed story. Returns its ID."""
+    response = requests.post(
+        f"{config['taiga']['url']}/api/v1/userstories",
+        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+        json={
+            "project": project_id,
+            "subject": story["subject"],
+            "status": story["status"],
+            "tags": ["bot-managed"],
+        },
+    )
+    if response.status_code != 201:
+        logger.error(f"Failed to create story {story['subject']}")
+        return None
+    return response.json()["id"]
+
+
+def create_tasks(
+    config: dict,
+    taiga_auth_token: str,
+    project_id: int,
+    story_id: int,
+    status: int,
+    subjects: list[str],
+) -> bool:
+    """Create several tasks with the same status on a story in one request."""
+    response = requests.post(
+        f"{config['taiga']['url']}/api/v1/tasks/bulk_create",
+        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+        json={
+            "project_id": project_id,
+            "us_id": story_id,
+            "status_id": status,
+            "bulk_tasks": "\n".join(subjects),
+        },
+    )
+    if response.status_code != 200:
+        logger.error(f"Failed to create tasks on story {story_id}")
+        return False
+    return True
+
+
+def write_status(
+    config: dict, taiga_auth_token: str, item_type: str, item_id: int, change: dict
+) -> bool | None:
+    """Move a story or task to its planned status.
+
+    If it has been modified since the snapshot the status is only written if nobody else has moved it.
+    Returns whether the write succeeded or None if it was skipped because of a conflicting move.
+    """
+    written = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type=item_type,
+        item_id=item_id,
+        fields={"status": change["status"]},
+        version=change["version"],
+        rebase=lambda current: (
+            {"status": change["status"]}
+            if current["status"] == change["from_status"]
+            else None
+        ),
+    )
+    if written is None:
+        logger.info(
+            f"Not moving {item_type} {change['subject']}, it was moved since the snapshot"
+        )
+        return None
+    return bool(written)
+
+
+def apply(
+    plan: dict, config: dict, taiga_auth_token: str, project_id: int
+) -> dict[str, int]:
+    """Make the writes in a plan, in parallel where they don't depend on each other.
+
+    Statuses that someone else has changed since the snapshot are left alone and counted as skipped.
+    Stops making writes if the lease on the board is lost, the remaining writes are counted as skipped.
+    Returns the number of writes that succeeded, were skipped and failed.
+    """
+    results = []
+    if lease.lost.is_set():
+        logger.error("Lease lost, not applying the plan")
+        return {"succeeded": 0, "skipped": 0, "failed": 0}
+    with ThreadPoolExecutor(
+        max_workers=config.get("attendee_workers", 4), thread_name_prefix="apply"
+    ) as executor:
+        # New stories need IDs before anything can be attached to them
+        created = list(
+            executor.map(
+                lambda story: create_story(config, taiga_auth_token, project_id, story),
+                plan["create_stories"],
+            )
+        )
+        story_ids = {
+            story["ref"]: story_id
+            for story, story_id in zip(plan["create_stories"], created)
+            if story_id
+        }
+        results += [bool(story_id) for story_id in created]
+
+        def resolve(story_id):
+            return (
+                story_ids.get(story_id)
+                if str(story_id).startswith("new-")
+                else story_id
+            )
+
+        jobs = []
+        # Which story each create_tasks job is for, by position in jobs
+        task_jobs = {}
+        for change in plan["set_attributes"]:
+            if resolve(change["story"]):
+                jobs.append(
+                    lambda change=change: taigalink.set_custom_field(
+                        config=config,
+                        taiga_auth_token=taiga_auth_token,
+                        story_id=resolve(change["story"]),
+                        field_id=change["field"],
+                        value=change["value"],
+                    )
+                )
+        for change in plan["update_stories"]:
+            jobs.append(
+                lambda change=change: write_status(
+                    config, taiga_auth_token, "story", change["story"], change
+                )
+            )
+        for change in plan["create_tasks"]:
+            if resolve(change["story"]):
+                task_jobs[len(jobs)] = change["story"]
+                jobs.append(
+                    lambda change=change: create_tasks(
+                        config=config,
+                        taiga_auth_token=taiga_auth_token,
+                        project_id=project_id,
+                        story_id=resolve(change["story"]),
+                        status=change["status"],
+                        subjects=change["subjects"],
+                    )
+                )
+        for change in plan["update_tasks"]:
+            jobs.append(
+                lambda change=change: write_status(
+                    config, taiga_auth_token, "task", change["task"], change
+                )
+            )
+        # Writes that haven't started when the lease is lost are skipped
+        job_results = list(
+            executor.map(lambda job: None if lease.lost.is_set() else job(), jobs)
+        )
+        results += job_results
+    if lease.lost.is_set():
+        logger.error("Lease lost, the remaining writes were skipped")
+
+    # Templates that weren't fully applied are retried next run
+    failed_stories = {
+        story for index, story in task_jobs.items() if not job_results[index]
+    }
+    for action in plan["template_actions"]:
+        story_id = resolve(action["story"])
+        if story_id and action["story"] not in failed_stories:
+            taiga_janitor.record_template_action(story_id, action["status"])
+
+    return {
+        "succeeded": results.count(True),
+        "skipped": results.count(None),
+        "failed": results.count(False),
+    }
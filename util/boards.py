@@ -0,0 +1,209 @@
+import logging
+import multiprocessing
+
+from taiga import TaigaAPI
+
+from util import attendee_plan, contact_facts, tasks
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+# State shared by every board. Set before the pool is started so forked workers inherit it instead of copying it
+shared: dict = {}
+
+
+def board_configs(config: dict) -> list[dict] | None:
+    """Return the boards the pipeline should run over. Defaults to just the Attendee board.
+
+    Each board is {"name": project name, "import": bool, "order_task_map": {order: [task subjects]}} plus the
+    status and custom attribute IDs in attendee_plan.attendee_ids, which only the Attendee board can leave out.
+    Returns None if a board is missing any IDs.
+    """
+    boards = []
+    for board in config.get("boards", [{"name": "Attendee"}]):
+        board = dict(board)
+        # JSON keys are always strings
+        if "order_task_map" in board:
+            board["order_task_map"] = {
+                int(order): subjects
+                for order, subjects in board["order_task_map"].items()
+            }
+
+        if board["name"] == "Attendee":
+            board = {**attendee_plan.attendee_ids, **board}
+        missing = [key for key in attendee_plan.attendee_ids if key not in board]
+        missing += [
+            f"attributes.{key}"
+            for key in attendee_plan.attendee_ids["attributes"]
+            if key not in board.get("attributes", {})
+        ]
+        if missing:
+            logger.error(f"{board['name']} board is missing {', '.join(missing)}")
+            return None
+        # Taiga keys custom attribute values by string ID
+        board["attributes"] = {
+            key: str(field) for key, field in board["attributes"].items()
+        }
+        boards.append(board)
+    return boards
+
+
+def board_ids(board: dict) -> dict:
+    """Return the status and custom attribute IDs of a board, as given to attendee_plan.simulate."""
+    return {key: board[key] for key in attendee_plan.attendee_ids}
+
+
+def load_board(taigacon, name: str) -> dict | None:
+    """Find a board by name and work out its story and task statuses.
+
+    Returns {"project_id": id, "story_statuses": {id: status}, "task_statuses": {id: name}} or None if the board doesn't exist.
+    """
+    project = None
+    for candidate in taigacon.projects.list():
+        if candidate.name == name:
+            project = candidate
+            break
+
+    if not project:
+        logger.error(f"{name} project not found")
+        return None
+
+    # Reconstruct status IDs because the Taiga API endpoint for them doesn't work
+    story_statuses = {}
+    for story in taigacon.user_stories.list(project=project.id):
+        story_statuses[story.status] = None
+    for status in story_statuses.keys():
+        story_statuses[status] = taigacon.user_story_statuses.get(status).to_dict()
+
+    task_statuses = {
+        status.id: status.name
+        for status in taigacon.task_statuses.list(project=project.id)
+    }
+
+    return {
+        "project_id": project.id,
+        "story_statuses": story_statuses,
+        "task_statuses": task_statuses,
+    }
+
+
+def managed_contacts(
+    taigacon, config: dict, taiga_auth_token: str, boards: list[dict]
+) -> list[str] | None:
+    """Return the TidyHQ IDs of the bot managed stories on several boards.
+
+    Returns None if any of the boards couldn't be read.
+    """
+    contact_ids = set()
+    for board in boards:
+        name = board["name"]
+        details = load_board(taigacon, name)
+        if not details:
+            return None
+        snapshot = attendee_plan.load_snapshot(
+            config=config,
+            taiga_auth_token=taiga_auth_token,
+            project_id=details["project_id"],
+        )
+        if not snapshot:
+            logger.error(f"Failed to load a snapshot of the {name} board")
+            return None
+        contact_ids.update(attendee_plan.contact_ids(snapshot, board_ids(board)))
+    return sorted(contact_ids)
+
+
+def run_board(board: dict) -> dict | None:
+    """Simulate the attendee pipeline on a single board and apply or return the plan.
+
+    Reads everything that isn't board specific from shared.
+    Returns {"project_id": id, "plan": plan, "results": write counts} or None if the board couldn't be loaded.
+    """
+    config = shared["config"]
+    taiga_auth_token = shared["taiga_auth_token"]
+    options = shared["options"]
+
+    # Connections aren't carried across a fork so each board gets its own
+    taigacon = TaigaAPI(host=config["taiga"]["url"], token=taiga_auth_token)
+    details = load_board(taigacon, board["name"])
+    if not details:
+        return None
+
+    snapshot = attendee_plan.load_snapshot(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        project_id=details["project_id"],
+    )
+    if not snapshot:
+        logger.error(f"Failed to load a snapshot of the {board['name']} board")
+        return None
+
+    # Only contacts on the board have their tasks checked
+    eligibility = tasks.eligibility_matrix(
+        config=config,
+        tidyhq_cache=shared["tidyhq_cache"],
+        contact_ids=attendee_plan.contact_ids(snapshot, board_ids(board)),
+    )
+
+    plan = attendee_plan.simulate(
+        snapshot=snapshot,
+        config=config,
+        tidyhq_cache=shared["tidyhq_cache"],
+        story_statuses=details["story_statuses"],
+        task_statuses=details["task_statuses"],
+        eligibility=eligibility,
+        import_from_tidyhq=options.get("import", False) and board.get("import", True),
+        shard=options.get("shard", 0),
+        shards=options.get("shards", 1),
+        task_map=board.get("order_task_map"),
+        ids=board_ids(board),
+    )
+    logger.info(
+        f"{board['name']} settled after {plan['iterations']} iterations: {plan['changes']}"
+    )
+
+    if options.get("review"):
+        return {"project_id": details["project_id"], "plan": plan, "results": None}
+
+    results = attendee_plan.apply(
+        plan=plan,
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        project_id=details["project_id"],
+    )
+    return {"project_id": details["project_id"], "plan": plan, "results": results}
+
+
+def run_boards(
+    boards: list[dict],
+    config: dict,
+    taiga_auth_token: str,
+    tidyhq_cache: dict,
+    options: dict,
+) -> dict[str, dict | None]:
+    """Run the pipeline over several boards at once, one process per board up to board_workers.
+
+    The TidyHQ cache and contact fact table are built once here and inherited by the workers.
+    Each worker evaluates eligibility for the contacts on its own board.
+    options can contain import, review, shard and shards.
+    Returns the result of run_board for each board, keyed by name.
+    """
+    # Build the fact table before forking so workers don't each build their own
+    contact_facts.get_table(config=config, tidyhq_cache=tidyhq_cache)
+    shared.update(
+        {
+            "config": config,
+            "taiga_auth_token": taiga_auth_token,
+            "tidyhq_cache": tidyhq_cache,
+            "options": options,
+        }
+    )
+
+    workers = min(config.get("board_workers", 4), len(boards))
+    if workers <= 1:
+        results = [run_board(board) for board in boards]
+    else:
+        with multiprocessing.get_context("fork").Pool(processes=workers) as pool:
+            results = pool.map(run_board, boards)
+
+    return {board["name"]: result for board, result in zip(boards, results)}
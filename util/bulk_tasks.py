@@ -0,0 +1,72 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+from util import taiga_writes
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+
+def apply_changes(
+    config: dict,
+    taiga_auth_token: str,
+    changes: list[tuple[int, int | None, dict]],
+    dry_run: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+    still_applies: Callable[[dict], bool] | None = None,
+) -> dict[str, int]:
+    """Write changes to many tasks on a bounded pool of workers.
+
+    changes is a list of (task id, version, fields).
+    If a task has been modified since it was listed, still_applies is called with the refetched task and the change
+    is retried if it returns True or skipped if not. Without still_applies a version conflict is a failure.
+    progress is called with (done, total) after each write, otherwise progress is logged every bulk_progress_interval writes.
+    In a dry run nothing is written.
+
+    Returns {"planned": n, "succeeded": n, "skipped": n, "failed": n}
+    """
+    results = {"planned": len(changes), "succeeded": 0, "skipped": 0, "failed": 0}
+    if dry_run or not changes:
+        return results
+
+    interval = config.get("bulk_progress_interval", 25)
+
+    def write(change: tuple[int, int | None, dict]) -> dict | None | bool:
+        task_id, version, fields = change
+        return taiga_writes.update_item(
+            config=config,
+            taiga_auth_token=taiga_auth_token,
+            item_type="task",
+            item_id=task_id,
+            fields=fields,
+            version=version,
+            rebase=(
+                (lambda current: fields if still_applies(current) else None)
+                if still_applies
+                else None
+            ),
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=config.get("bulk_workers", 8), thread_name_prefix="bulk_tasks"
+    ) as executor:
+        futures = {executor.submit(write, change): change for change in changes}
+        for done, future in enumerate(as_completed(futures), start=1):
+            written = future.result()
+            if written:
+                results["succeeded"] += 1
+            elif written is None:
+                results["skipped"] += 1
+                logger.info(f"Skipped task {futures[future][0]}, it no longer applies")
+            else:
+                results["failed"] += 1
+                logger.error(f"Failed to write to task {futures[future][0]}")
+
+            if progress:
+                progress(done, len(changes))
+            elif done % interval == 0 or done == len(changes):
+                logger.info(f"Wrote {done}/{len(changes)} tasks")
+
+    return results
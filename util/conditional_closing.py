@@ -1,73 +1,90 @@
 import logging
 import sys
 
-from util import taigalink
+from util import bulk_tasks
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
 
 
+# Tasks that are closed once a story reaches a column, keyed by column order
+# Reminder: Orders are 0-indexed
+order_task_map: dict[int, list] = {
+    3: ["Respond to enquiry", "Encourage to visit"],
+    4: ["Signed up as a member", "Visit"],
+    7: [
+        "Held membership for at least two weeks",
+        "No indications of Code of Conduct violations",
+        "Competent to decide who can come in outside of events",
+        "Works well unsupervised",
+        "Undertakes tasks safely",
+        "Cleans own work area",
+        "Communicates issues to Management Committee if they arise",
+        "No history of invoice deliquency",
+        "Offered backing for key",
+        "Keyholder motion put to committee",
+        "Keyholder motion successful",
+        "Send keyholder documentation",
+        "Send bond invoice",
+        "Confirm bond invoice paid",
+    ],
+}
+
+
+def closable_tasks(
+    story_statuses: dict, task_map: dict[int, list] | None = None
+) -> dict[int, frozenset]:
+    """Work out which tasks can be closed in each story status, keyed by status ID.
+
+    A story closes the tasks mapped to its own order, every order before it, and the next order.
+    task_map defaults to order_task_map.
+    """
+    if task_map is None:
+        task_map = order_task_map
+    table = {}
+    for status_id, status in story_statuses.items():
+        table[status_id] = frozenset(
+            subject
+            for current_order in range(0, status["order"] + 2)
+            for subject in task_map.get(current_order, [])
+        )
+    return table
+
+
 def close_by_order(
     taigacon, project_id: str, config: dict, taiga_auth_token: str, story_statuses: dict
 ) -> int:
     """Close tasks once a story reaches a certain order."""
-    made_changes: int = 0
-    # Reminder: Orders are 0-indexed
-    task_map: dict[int, list] = {
-        3: ["Respond to enquiry", "Encourage to visit"],
-        4: ["Signed up as a member", "Visit"],
-        7: [
-            "Held membership for at least two weeks",
-            "No indications of Code of Conduct violations",
-            "Competent to decide who can come in outside of events",
-            "Works well unsupervised",
-            "Undertakes tasks safely",
-            "Cleans own work area",
-            "Communicates issues to Management Committee if they arise",
-            "No history of invoice deliquency",
-            "Offered backing for key",
-            "Keyholder motion put to committee",
-            "Keyholder motion successful",
-            "Send keyholder documentation",
-            "Send bond invoice",
-            "Confirm bond invoice paid",
-        ],
+    changes = []
+    closable = closable_tasks(story_statuses)
+
+    # Map each bot managed story to its status
+    stories = {
+        story.id: int(story.status)
+        for story in taigacon.user_stories.list(project=project_id, tags="bot-managed")
     }
 
-    stories = taigacon.user_stories.list(project=project_id, tags="bot-managed")
-    for story in stories:
-
-        # Check over each task in the story
-        tasks = taigacon.tasks.list(user_story=story.id)
-        for task in tasks:
-            # If the task is already complete, skip it
-            if task.status in [4, 23]:
-                logger.debug(f"Task {task.subject} is already completed")
-                continue
-
-            # Look for task in map up until the position of the story
-            order: int = taigalink.id_to_order(
-                story_statuses=story_statuses, status_id=int(story.status)
-            )
-            for current_order in range(0, order + 2):
-                logger.debug(
-                    f"Checking task {task.subject} against tasks for order: {current_order}"
-                )
-                if task.subject in task_map.get(current_order, []):
-                    logger.debug(f"Completing task {task.subject}")
-                    updating = taigalink.update_task(
-                        task_id=task.id,
-                        status=4,
-                        taiga_auth_token=taiga_auth_token,
-                        config=config,
-                        version=task.version,
-                    )
-                    if updating:
-                        logger.info(f"Task {task.subject} marked as complete")
-                        made_changes += 1
-                    else:
-                        logger.error(f"Failed to mark task {task.subject} as complete")
-    return made_changes
+    # Check every task in the project rather than fetching them story by story
+    for task in taigacon.tasks.list(project=project_id):
+        if task.user_story not in stories:
+            continue
+
+        # If the task is already complete, skip it
+        if task.status in [4, 23]:
+            logger.debug(f"Task {task.subject} is already completed")
+            continue
+
+        if task.subject in closable.get(stories[task.user_story], frozenset()):
+            logger.debug(f"Completing task {task.subject}")
+            changes.append((task.id, task.version, {"status": 4}))
+
+    # Close every task in one bulk write
+    results = bulk_tasks.apply_changes(
+        config=config, taiga_auth_token=taiga_auth_token, changes=changes
+    )
+    if results["failed"]:
+        logger.error(f"Failed to mark {results['failed']} tasks as complete")
+    return results["succeeded"]
 
 
 def remove_by_status():
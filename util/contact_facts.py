@@ -0,0 +1,246 @@
+import logging
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+from util import misc, tidyhq
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+# Bond invoices are specific amounts for concession, full respectively
+# This is a best guess without retrieving the full invoice details
+bond_amounts = [135, 225]
+
+# The facts known about every contact, one list per fact in the same order as contact_ids
+columns = [
+    "has_slack",
+    "has_key",
+    "has_photo_id",
+    "has_concession",
+    "billing_group",
+    "membership_levels",
+    "membership_type",
+    "membership_start",
+    "inductions",
+    "last_payment_method",
+    "bond_sent",
+    "bond_paid",
+    "emergency_valid",
+]
+
+# How each column is indexed for checks over every contact at once, see index_columns
+flag_columns = [
+    "has_slack",
+    "has_key",
+    "has_photo_id",
+    "has_concession",
+    "billing_group",
+    "bond_sent",
+    "bond_paid",
+    "emergency_valid",
+]
+set_columns = ["membership_levels", "inductions"]
+value_columns = ["membership_type", "last_payment_method"]
+date_columns = ["membership_start"]
+
+# The table built from the most recent TidyHQ cache
+current_table: dict | None = None
+
+
+def valid_emergency_details(contact: dict) -> bool:
+    """Check whether a contact has usable emergency contact details."""
+    contact_number = contact.get("phone_number")
+    emergency_name = contact.get("emergency_contact_person")
+    emergency_number = contact.get("emergency_contact_number")
+
+    # Confirm that all three fields are filled out
+    if not (contact_number and emergency_name and emergency_number):
+        return False
+
+    # Confirm that the emergency contact number is a valid phone number
+    if not misc.valid_phone_number(emergency_number):
+        return False
+
+    # The emergency contact number can't be the contact's own number
+    return contact_number[-9:] != emergency_number[-9:]
+
+
+def contact_row(
+    config: dict, contact: dict, memberships: list[dict], invoices: list[dict]
+) -> dict:
+    """Work out the facts about a single contact."""
+    ids = config["tidyhq"]["ids"]
+    fields = {field["id"]: field for field in contact["custom_fields"]}
+
+    key_status = fields.get(ids.get("key_status"))
+    slack = fields.get(ids.get("slack"))
+
+    inductions = frozenset(
+        group["label"].replace(config["tidyhq"]["training_prefix"], "")
+        for group in contact["groups"]
+        if config["tidyhq"]["training_prefix"] in group["label"]
+    )
+
+    membership_type = "None"
+    membership_start = None
+    if memberships:
+        # The membership that ends last is the current one
+        most_recent = max(memberships, key=lambda x: x["end_date"])
+        membership_type = tidyhq.classify_membership(most_recent)
+        # Format is 2019-11-01T08:00:00+08:00
+        membership_start = datetime.strptime(
+            most_recent["start_date"].split("T")[0], "%Y-%m-%d"
+        ).timestamp()
+
+    # Invoices are sorted newest first
+    last_payment_method = None
+    for invoice in invoices:
+        if invoice["paid"]:
+            last_payment_method = invoice["payments"][0]["type"]
+            break
+    bond_invoice = next(
+        (invoice for invoice in invoices if invoice["amount"] in bond_amounts), None
+    )
+
+    return {
+        "has_slack": bool(slack and slack["value"]),
+        "has_key": bool(
+            key_status
+            and any(value["title"] == "Enabled" for value in key_status["value"])
+        ),
+        "has_photo_id": ids.get("photo_id") in fields,
+        "has_concession": ids.get("concession") in fields,
+        "billing_group": any(
+            "Billing" in group["label"] for group in contact["groups"]
+        ),
+        "membership_levels": frozenset(
+            membership["membership_level"]["name"] for membership in memberships
+        ),
+        "membership_type": membership_type,
+        "membership_start": membership_start,
+        "inductions": inductions,
+        "last_payment_method": last_payment_method,
+        "bond_sent": bond_invoice is not None,
+        "bond_paid": bool(bond_invoice and bond_invoice["paid"]),
+        "emergency_valid": valid_emergency_details(contact),
+    }
+
+
+def build(config: dict, tidyhq_cache: dict) -> dict:
+    """Work out the facts task checks need about every contact in a single pass over the cache.
+
+    Returns {"time": cache time, "contact_ids": [...], "rows": {contact_id: row number}, <fact>: [...], ...}
+    Contact IDs are stored as strings.
+    """
+    memberships = {}
+    for membership in tidyhq_cache["memberships"]:
+        memberships.setdefault(str(membership["contact_id"]), []).append(membership)
+
+    table = {"time": tidyhq_cache.get("time"), "contact_ids": [], "rows": {}}
+    table.update({column: [] for column in columns})
+
+    for contact in tidyhq_cache["contacts"]:
+        contact_id = str(contact["id"])
+        row = contact_row(
+            config=config,
+            contact=contact,
+            memberships=memberships.get(contact_id, []),
+            invoices=tidyhq_cache["invoices"].get(contact_id, []),
+        )
+        table["rows"][contact_id] = len(table["contact_ids"])
+        table["contact_ids"].append(contact_id)
+        for column in columns:
+            table[column].append(row[column])
+
+    table["bits"] = index_columns(table)
+    logger.info(f"Built facts for {len(table['contact_ids'])} contacts")
+    return table
+
+
+def to_bits(rows: list[int]) -> int:
+    """Return a bitset with the bit for each row set."""
+    bitmap = bytearray(len(rows) and max(rows) // 8 + 1)
+    for row in rows:
+        bitmap[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def index_columns(table: dict) -> dict:
+    """Index the fact columns as bitsets with one bit per contact row so a check can cover every contact at once.
+
+    Flags become a single bitset, set and value columns a bitset per member/value
+    and date columns a sorted array('d') of epochs with the bitset of rows on or before each one.
+    """
+    bits = {}
+    for column in flag_columns:
+        bits[column] = to_bits(
+            [row for row, value in enumerate(table[column]) if value]
+        )
+
+    for column in set_columns + value_columns:
+        members: dict = {}
+        for row, value in enumerate(table[column]):
+            for member in (value or []) if column in set_columns else [value]:
+                members.setdefault(member, []).append(row)
+        bits[column] = {member: to_bits(rows) for member, rows in members.items()}
+
+    for column in date_columns:
+        dates: dict[float, list[int]] = {}
+        for row, value in enumerate(table[column]):
+            if value is not None:
+                dates.setdefault(value, []).append(row)
+        epochs = array("d", sorted(dates))
+        before = []
+        running = 0
+        for epoch in epochs:
+            running |= to_bits(dates[epoch])
+            before.append(running)
+        bits[column] = (epochs, before)
+
+    return bits
+
+
+def any_of(table: dict, column: str, members) -> int:
+    """Return the rows whose set or value column contains any of members."""
+    result = 0
+    for member in members:
+        result |= table["bits"][column].get(member, 0)
+    return result
+
+
+def matching(table: dict, column: str, predicate) -> int:
+    """Return the rows whose set or value column contains a member that predicate accepts."""
+    return any_of(
+        table, column, [member for member in table["bits"][column] if predicate(member)]
+    )
+
+
+def on_or_before(table: dict, column: str, epoch: float) -> int:
+    """Return the rows whose date column is on or before epoch."""
+    epochs, before = table["bits"][column]
+    count = bisect_right(epochs, epoch)
+    return before[count - 1] if count else 0
+
+
+def get_table(config: dict, tidyhq_cache: dict) -> dict:
+    """Return the fact table for a cache, building it if the cache has been refreshed since it was last built."""
+    global current_table
+    if current_table is None or current_table["time"] != tidyhq_cache.get("time"):
+        current_table = build(config=config, tidyhq_cache=tidyhq_cache)
+    return current_table
+
+
+def lookup(
+    config: dict, tidyhq_cache: dict, contact_id: str | int | None, fact: str
+) -> object | None:
+    """Look up a single fact about a contact. Returns None if the contact isn't in the cache."""
+    if contact_id is None:
+        return None
+    table = get_table(config=config, tidyhq_cache=tidyhq_cache)
+    row = table["rows"].get(str(contact_id))
+    if row is None:
+        logger.error(f"Contact {contact_id} not found in cache")
+        return None
+    return table[fact][row]
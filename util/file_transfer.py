@@ -0,0 +1,213 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal
+
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+# Size of the chunks read from downloads and written to uploads
+chunk_size = 64 * 1024
+
+# Shared pool so concurrent requests can't open an unbounded number of transfers
+executor: ThreadPoolExecutor | None = None
+
+# Map types to url segments
+url_segments = {"issue": "issues", "task": "tasks", "story": "userstories"}
+
+
+class MultipartStream:
+    """A multipart/form-data body that pulls the file part from an iterator of chunks as it's sent.
+
+    requests will send this with a Content-Length header if the length of the file is known
+    and fall back to chunked transfer encoding otherwise.
+    """
+
+    def __init__(
+        self,
+        fields: dict,
+        filename: str,
+        chunks,
+        file_length: int | None = None,
+    ):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+
+        preamble = b""
+        for name, value in fields.items():
+            preamble += (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode()
+        filename = filename.replace('"', "")
+        preamble += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="attached_file"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        epilogue = f"\r\n--{self.boundary}--\r\n".encode()
+
+        # requests only looks for a len attribute so it's only set when we know the size
+        if file_length is not None:
+            self.len = len(preamble) + file_length + len(epilogue)
+
+        self._parts = self._iter_parts(preamble, chunks, epilogue)
+        self._buffer = b""
+
+    @staticmethod
+    def _iter_parts(preamble: bytes, chunks, epilogue: bytes):
+        yield preamble
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+        yield epilogue
+
+    def __iter__(self):
+        if self._buffer:
+            yield self._buffer
+            self._buffer = b""
+        yield from self._parts
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._parts)
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def get_executor(config: dict) -> ThreadPoolExecutor:
+    """Return the shared transfer pool, creating it on first use."""
+    global executor
+    if not executor:
+        executor = ThreadPoolExecutor(
+            max_workers=config.get("transfer_workers", 4),
+            thread_name_prefix="file_transfer",
+        )
+    return executor
+
+
+def transfer_file(
+    taiga_auth_token: str,
+    config: dict,
+    project_id: str | int,
+    item_type: str,
+    item_id: str | int,
+    url: str,
+    filename: str | None = None,
+    description: str | None = None,
+    source: Literal["slack", "taiga"] = "slack",
+) -> bool:
+    """Stream a file from Slack (or an existing Taiga attachment) straight into a Taiga attachment upload.
+
+    The file is never held in memory in full."""
+
+    if item_type not in url_segments:
+        logger.error(f"Item type {item_type} not supported")
+        return False
+
+    upload_url = (
+        f"{config['taiga']['url']}/api/v1/{url_segments[item_type]}/attachments"
+    )
+
+    if source == "slack":
+        download_token = config["slack"]["bot_token"]
+    else:
+        download_token = taiga_auth_token
+
+    if not filename:
+        filename = url.split("?")[0].split("/")[-1]
+
+    fields = {"project": project_id, "object_id": item_id}
+    if description:
+        fields["description"] = description
+
+    try:
+        with requests.get(
+            url=url,
+            headers={"Authorization": f"Bearer {download_token}"},
+            stream=True,
+            timeout=30,
+        ) as download:
+            if download.status_code != 200:
+                logger.error(f"Failed to download file {url}: {download.status_code}")
+                return False
+
+            # The length can only be trusted if the body isn't being decompressed on the way through
+            file_length = None
+            if download.headers.get("Content-Length") and not download.headers.get(
+                "Content-Encoding"
+            ):
+                file_length = int(download.headers["Content-Length"])
+
+            body = MultipartStream(
+                fields=fields,
+                filename=filename,
+                chunks=download.iter_content(chunk_size=chunk_size),
+                file_length=file_length,
+            )
+
+            upload = requests.post(
+                upload_url,
+                headers={
+                    "Authorization": f"Bearer {taiga_auth_token}",
+                    "Content-Type": body.content_type,
+                },
+                data=body,
+                timeout=120,
+            )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to transfer file {url}: {e}")
+        return False
+
+    if upload.status_code == 201:
+        return True
+    else:
+        logger.error(f"Failed to attach file: {upload.status_code}")
+        logger.error(upload_url)
+        logger.error(filename)
+        logger.error(upload.text)
+        return False
+
+
+def transfer_files(
+    taiga_auth_token: str,
+    config: dict,
+    project_id: str | int,
+    item_type: str,
+    item_id: str | int,
+    files: list[dict],
+    source: Literal["slack", "taiga"] = "slack",
+) -> list[bool]:
+    """Transfer several files in parallel using the shared pool.
+
+    Each file is a dict with a url and optionally a filename and description.
+    Returns whether each transfer succeeded, in the same order as the files were provided.
+    """
+
+    futures = [
+        get_executor(config).submit(
+            transfer_file,
+            taiga_auth_token=taiga_auth_token,
+            config=config,
+            project_id=project_id,
+            item_type=item_type,
+            item_id=item_id,
+            url=file["url"],
+            filename=file.get("filename"),
+            description=file.get("description"),
+            source=source,
+        )
+        for file in files
+    ]
+
+    return [future.result() for future in futures]
@@ -0,0 +1,157 @@
+import fcntl
+import json
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+# Active leases are kept in a single file that is flocked while being read or changed
+# flock is released by the OS if a process dies so a crash can't leave this locked
+lease_path = "attendee_leases.json"
+
+# Set when a heartbeat fails to renew its lease, another run may now be writing to the same stories
+# Created before any board workers are forked so they see it being set
+lost = multiprocessing.get_context("fork").Event()
+
+
+def in_shard(story_id: int | str, shard: int, shards: int) -> bool:
+    """Check whether a story belongs to a shard. Stories that haven't been created yet belong to shard 0."""
+    try:
+        return int(story_id) % shards == shard
+    except ValueError:
+        return shard == 0
+
+
+def overlaps(first: dict, second: dict) -> bool:
+    """Check whether two shards could contain the same story.
+
+    Story IDs in shard i of n and shard j of m overlap unless i and j differ modulo gcd(n, m).
+    Shards of different boards never overlap.
+    """
+    if first.get("board", "Attendee") != second.get("board", "Attendee"):
+        return False
+    divisor = math.gcd(first["shards"], second["shards"])
+    return first["shard"] % divisor == second["shard"] % divisor
+
+
+def read_leases(f) -> dict:
+    """Read the leases that haven't expired from an open lease file."""
+    f.seek(0)
+    try:
+        leases = json.load(f)
+    except json.JSONDecodeError:
+        leases = {}
+    now = time.time()
+    return {
+        lease_id: lease for lease_id, lease in leases.items() if lease["expires"] > now
+    }
+
+
+def write_leases(f, leases: dict):
+    """Replace the contents of an open lease file."""
+    f.seek(0)
+    f.truncate()
+    json.dump(leases, f)
+    f.flush()
+
+
+def update_leases(change):
+    """Apply change to the current leases while holding the lease file lock. Returns what change returns."""
+    with open(lease_path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            leases = read_leases(f)
+            result = change(leases)
+            write_leases(f, leases)
+            return result
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def acquire(
+    board: str = "Attendee",
+    shard: int = 0,
+    shards: int = 1,
+    ttl: float = 600,
+    wait: float = 0,
+    force: bool = False,
+) -> str | None:
+    """Take a lease on a shard of a board, waiting up to wait seconds for overlapping leases to end.
+
+    force drops any overlapping leases instead of waiting for them.
+    Returns the lease ID or None if the shard is still leased.
+    """
+    requested = {"board": board, "shard": shard, "shards": shards}
+    lease_id = uuid.uuid4().hex
+    deadline = time.time() + wait
+
+    def take(leases: dict) -> bool:
+        conflicts = [
+            other_id for other_id, lease in leases.items() if overlaps(lease, requested)
+        ]
+        if conflicts and not force:
+            return False
+        for other_id in conflicts:
+            logger.error(f"Dropping lease held by {leases[other_id]['owner']}")
+            del leases[other_id]
+        leases[lease_id] = {
+            **requested,
+            "owner": f"{socket.gethostname()}:{os.getpid()}",
+            "expires": time.time() + ttl,
+        }
+        return True
+
+    while True:
+        if update_leases(take):
+            logger.info(f"Acquired lease on {board} shard {shard}/{shards}")
+            return lease_id
+        if time.time() >= deadline:
+            logger.error(f"{board} shard {shard}/{shards} is already leased")
+            return None
+        time.sleep(min(5, max(deadline - time.time(), 0)))
+
+
+def renew(lease_id: str, ttl: float = 600) -> bool:
+    """Push back the expiry of a lease. Returns False if the lease has expired or been taken over."""
+
+    def extend(leases: dict) -> bool:
+        if lease_id not in leases:
+            return False
+        leases[lease_id]["expires"] = time.time() + ttl
+        return True
+
+    renewed = update_leases(extend)
+    if not renewed:
+        logger.error(f"Lease {lease_id} was lost")
+    return renewed
+
+
+def release(lease_id: str):
+    """Give up a lease."""
+    update_leases(lambda leases: leases.pop(lease_id, None))
+    logger.info(f"Released lease {lease_id}")
+
+
+def heartbeat(lease_id: str, ttl: float = 600) -> threading.Event:
+    """Renew a lease in the background every third of its ttl until the returned event is set.
+
+    Sets lost if the lease can't be renewed.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(ttl / 3):
+            if not renew(lease_id, ttl):
+                lost.set()
+                return
+
+    threading.Thread(target=beat, name="lease_heartbeat", daemon=True).start()
+    return stop
@@ -0,0 +1,336 @@
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+history_map = {
+    "userstory": "userstory",
+    "story": "userstory",
+    "issue": "issue",
+    "task": "task",
+}
+
+# Number of comments requested per page when backfilling an item
+backfill_page_size = 100
+
+# Seconds between a webhook's date and a history entry's created_at for them to be the same comment
+webhook_match_window = 10
+
+
+def fetch_comments(
+    config: dict,
+    taiga_auth_token: str,
+    item_type: str,
+    item_id: int | str,
+    page: int = 1,
+    page_size: int = 10,
+) -> tuple[list[dict], int | None]:
+    """Get a page of the comment history of a story, task or issue from Taiga, most recent first.
+
+    Returns the comment events and the total number of comments on the item, the total is None if the request fails.
+    """
+    if item_type not in history_map:
+        logger.error(f"Type {item_type} not supported")
+        return [], None
+
+    response = requests.get(
+        f"{config['taiga']['url']}/api/v1/history/{history_map[item_type]}/{item_id}",
+        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+        params={"type": "comment", "page": page, "page_size": page_size},
+    )
+
+    if response.status_code != 200:
+        logger.error(
+            f"Failed to get comments for {item_type} {item_id}: {response.status_code}"
+        )
+        return [], None
+
+    events = response.json()
+
+    if "x-pagination-count" in response.headers:
+        return events, int(response.headers["x-pagination-count"])
+
+    # Taiga returned the full history, cut the page out of it
+    events = [event for event in events if event["comment"]]
+    return events[(page - 1) * page_size : page * page_size], len(events)
+
+
+def history_path(config: dict, item_type: str, item_id: int | str) -> str:
+    """Return the path of the history file for an item."""
+    directory = config.get("history_dir", "history")
+    return os.path.join(directory, f"{history_map[item_type]}-{int(item_id)}.jsonl")
+
+
+@contextmanager
+def locked(path: str):
+    """Hold an exclusive flock on a history file, creating it if needed.
+
+    Backfills replace the file, so the lock is retaken if the file was swapped out while waiting for it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    while True:
+        f = open(path, "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            break
+        f.close()
+    try:
+        yield f
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def append(config: dict, item_type: str, item_id: int | str, records: list[dict]):
+    """Append records to the history file of an item."""
+    with locked(history_path(config, item_type, item_id)) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def mark_stale(config: dict, item_type: str, item_id: int | str):
+    """Mark the local history of an item as out of date, it will be backfilled the next time it's read."""
+    if item_type not in history_map:
+        return
+    if os.path.exists(history_path(config, item_type, item_id)):
+        append(config, item_type, item_id, [{"stale": time.time()}])
+
+
+def event_key(record: dict) -> tuple:
+    """Identify a comment by its Taiga history entry ID. Webhook payloads don't carry one."""
+    if record.get("id"):
+        return ("id", record["id"])
+    return (record["user"]["name"], record["comment"], record["created_at"])
+
+
+def timestamp(value: str) -> float | None:
+    """Convert a Taiga date to an epoch, None if it can't be parsed."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def drop_webhook_copies(events: list[dict]) -> list[dict]:
+    """Drop webhook records of comments that are also in the history as backfilled entries.
+
+    Webhooks don't carry the history entry ID, so a copy delivered after a backfill is matched on its author and
+    comment with a created_at within webhook_match_window seconds of the backfilled entry.
+    """
+    backfilled: dict[tuple, list[float]] = {}
+    for event in events:
+        if event.get("id"):
+            backfilled.setdefault((event["user"]["name"], event["comment"]), []).append(
+                timestamp(event["created_at"])
+            )
+
+    kept = []
+    for event in events:
+        if not event.get("id"):
+            created = timestamp(event["created_at"])
+            matches = backfilled.get((event["user"]["name"], event["comment"]), [])
+            if created is not None and any(
+                other is not None and abs(created - other) <= webhook_match_window
+                for other in matches
+            ):
+                continue
+        kept.append(event)
+    return kept
+
+
+def read_events(f, item_type: str, item_id: int | str) -> tuple[list[dict], bool]:
+    """Read the comments in an open history file, oldest first.
+
+    Returns the comments and whether the history is known to be complete.
+    """
+    events = []
+    seen = set()
+    complete = False
+    for line in f:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # A partially written line, the rest of the file is still usable
+            logger.error(f"Skipping corrupt history line for {item_type} {item_id}")
+            continue
+        if "backfilled" in record:
+            complete = True
+        elif "stale" in record:
+            complete = False
+        else:
+            # Webhooks can be delivered more than once
+            key = event_key(record)
+            if key not in seen:
+                seen.add(key)
+                events.append(record)
+
+    return drop_webhook_copies(events), complete
+
+
+def load(config: dict, item_type: str, item_id: int | str) -> tuple[list[dict], bool]:
+    """Read the local comment history of an item, oldest first.
+
+    Returns the comments and whether the history is known to be complete.
+    """
+    try:
+        with open(history_path(config, item_type, item_id)) as f:
+            return read_events(f, item_type, item_id)
+    except FileNotFoundError:
+        return [], False
+
+
+def backfill(
+    config: dict, taiga_auth_token: str, item_type: str, item_id: int | str
+) -> list[dict] | None:
+    """Replace the local history of an item with its full comment history from Taiga.
+
+    Returns the comments oldest first or None if they couldn't be fetched.
+    """
+    fetched = []
+    page = 1
+    while True:
+        events, total = fetch_comments(
+            config=config,
+            taiga_auth_token=taiga_auth_token,
+            item_type=item_type,
+            item_id=item_id,
+            page=page,
+            page_size=backfill_page_size,
+        )
+        if total is None:
+            logger.error(f"Failed to backfill history for {item_type} {item_id}")
+            return None
+        fetched += events
+        if len(fetched) >= total or not events:
+            break
+        page += 1
+
+    # Deleted comments are never shown
+    fetched = [event for event in fetched if not event.get("delete_comment_date")]
+    fetched.reverse()
+
+    path = history_path(config, item_type, item_id)
+    with locked(path):
+        # Keep anything a webhook delivered while we were fetching
+        with open(path) as current:
+            local, _ = read_events(current, item_type, item_id)
+        newest = max((event["created_at"] for event in fetched), default="")
+        seen = {(event["user"]["name"], event["comment"]) for event in fetched}
+        fetched += [
+            event
+            for event in local
+            if event["created_at"] > newest
+            and (event["user"]["name"], event["comment"]) not in seen
+        ]
+
+        # Swapped in while still holding the lock, anyone waiting on the old file reopens it
+        with open(f"{path}.tmp", "w") as tmp:
+            tmp.write(json.dumps({"backfilled": time.time()}) + "\n")
+            for event in fetched:
+                tmp.write(json.dumps(event) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+    logger.info(f"Backfilled {len(fetched)} comments for {item_type} {item_id}")
+    return fetched
+
+
+def all_comments(
+    config: dict, taiga_auth_token: str, item_type: str, item_id: int | str
+) -> list[dict]:
+    """Get every comment on an item from the local history, most recent first (like Taiga).
+
+    Items without a complete local history are backfilled from Taiga first.
+    """
+    if item_type not in history_map:
+        logger.error(f"Type {item_type} not supported")
+        return []
+
+    events, complete = load(config, item_type, item_id)
+    if not complete:
+        # Fall back to what we have locally if Taiga can't be reached
+        events = (
+            backfill(
+                config=config,
+                taiga_auth_token=taiga_auth_token,
+                item_type=item_type,
+                item_id=item_id,
+            )
+            or events
+        )
+
+    return events[::-1]
+
+
+def get_comments(
+    config: dict,
+    taiga_auth_token: str,
+    item_type: str,
+    item_id: int | str,
+    page: int = 1,
+    page_size: int = 10,
+) -> tuple[list[dict], int]:
+    """Get a page of the comments on an item from the local history, most recent first.
+
+    Returns the comment events and the total number of comments on the item.
+    """
+    events = all_comments(config, taiga_auth_token, item_type, item_id)
+    return events[(page - 1) * page_size : page * page_size], len(events)
+
+
+def record_webhook(config: dict, data: dict) -> bool:
+    """Apply a Taiga webhook payload to the local history.
+
+    Returns True if the history was changed.
+    """
+    if data.get("type") not in history_map:
+        return False
+    item_type = data["type"]
+    item_id = data["data"]["id"]
+
+    if data["action"] == "delete":
+        try:
+            os.remove(history_path(config, item_type, item_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    change = data.get("change") or {}
+    if data["action"] != "change" or not change.get("comment"):
+        return False
+
+    # Webhooks don't identify which comment was edited or deleted
+    if change.get("delete_comment_date") or change.get("edit_comment_date"):
+        mark_stale(config, item_type, item_id)
+        return True
+
+    append(
+        config,
+        item_type,
+        item_id,
+        [
+            {
+                "comment": change["comment"],
+                "user": {
+                    "name": data["by"]["full_name"],
+                    "photo": data["by"].get("photo"),
+                },
+                "created_at": data["date"],
+                "delete_comment_date": None,
+                "delete_comment_user": None,
+            }
+        ],
+    )
+    return True
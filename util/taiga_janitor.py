@@ -1,6 +1,10 @@
+import fcntl
 import json
 import logging
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pprint import pprint
 
 from util import taigalink, tidyhq
@@ -9,17 +13,117 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
 
 
-def sync_templates(taigacon, project_id: str) -> int:
-    """Copy tasks from template stories to user stories."""
-    made_changes: int = 0
+# Template actions are kept as a compacted snapshot plus a journal of actions recorded since
+template_actions_path = "template_actions.json"
+template_journal_path = "template_actions.journal"
 
-    # Load a list of past actions
+# Fold the journal into the snapshot once it has this many entries
+journal_compact_after = 500
+
+
+@contextmanager
+def journal_lock():
+    """Hold an exclusive flock on the journal while appending to it or compacting it.
+
+    Compaction truncates the journal in place rather than replacing it so the lock always covers the current file.
+    """
+    with open(template_journal_path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_template_journal() -> list[dict]:
+    """Read the template actions recorded since the last compaction."""
+    entries = []
     try:
-        with open("template_actions.json") as f:
+        with open(template_journal_path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A run that crashed mid write can leave a partial last line
+                    logger.error(f"Skipping corrupt template journal entry: {line}")
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def load_template_actions() -> dict[str, list[str]]:
+    """Load the statuses each story has already had template tasks created for, keyed by story ID."""
+    try:
+        with open(template_actions_path) as f:
             actions = json.load(f)
     except FileNotFoundError:
         actions = {}
 
+    for entry in read_template_journal():
+        done = actions.setdefault(entry["story"], [])
+        if entry["status"] not in done:
+            done.append(entry["status"])
+    return actions
+
+
+def record_template_action(story_id: int | str, status: int | str):
+    """Record that template tasks have been created for a story in a status."""
+    with journal_lock() as f:
+        f.write(json.dumps({"story": str(story_id), "status": str(status)}) + "\n")
+
+
+def write_template_actions(actions: dict[str, list[str]], journal):
+    """Replace the snapshot and clear the journal, the caller must hold journal_lock."""
+    with open(f"{template_actions_path}.tmp", "w") as f:
+        json.dump(actions, f)
+    os.replace(f"{template_actions_path}.tmp", template_actions_path)
+    journal.truncate(0)
+
+
+def save_template_actions(actions: dict[str, list[str]]):
+    """Replace the saved template actions with a new snapshot and clear the journal."""
+    with journal_lock() as journal:
+        write_template_actions(actions, journal)
+
+
+def compact_template_actions(force: bool = False) -> bool:
+    """Fold the journal into the snapshot if it has grown past journal_compact_after entries."""
+    # Held from reading the journal to clearing it so no action recorded in between is lost
+    with journal_lock() as journal:
+        if not force and len(read_template_journal()) < journal_compact_after:
+            return False
+        write_template_actions(load_template_actions(), journal)
+    logger.info("Compacted template actions")
+    return True
+
+
+def create_task(taigacon, project_id: str, story_id: int, task: dict) -> bool:
+    """Create a single task from a template. Returns whether it was created."""
+    try:
+        taigacon.tasks.create(
+            project=project_id,
+            user_story=story_id,
+            status=task["status"],
+            subject=task["subject"],
+        )
+    except Exception as e:
+        logger.error(f"Failed to create task {task['subject']} on story {story_id}")
+        logger.error(e)
+        return False
+    logger.info(f"Created task {task['subject']} with status {task['status']}")
+    return True
+
+
+def sync_templates(taigacon, project_id: str, workers: int = 4) -> int:
+    """Copy tasks from template stories to user stories."""
+    # Load a list of past actions
+    actions = load_template_actions()
+
+    # List every task in the project at once and group them by story
+    story_tasks = {}
+    for task in taigacon.tasks.list(project=project_id):
+        story_tasks.setdefault(task.user_story, []).append(task)
+
     # Find template stories
     templates = {}
 
@@ -28,34 +132,27 @@ def sync_templates(taigacon, project_id: str) -> int:
     for story in stories:
         # Check if the story is a template story
         if story.subject == "Template":
-            # Get the tasks for the template story
-            raw_tasks = taigacon.tasks.list(user_story=story.id)
-            tasks = []
-            for task in raw_tasks:
-                tasks.append({"status": task.status, "subject": task.subject})
+            templates[story.status] = [
+                {"status": task.status, "subject": task.subject}
+                for task in story_tasks.get(story.id, [])
+            ]
 
-            templates[story.status] = tasks
+    # Work out the tasks missing from each story
+    creations = []
+    synced = []
 
     # Find all user stories that include our bot managed tag
     # We don't filter the bot-managed tag in the query because template stories don't have that tag
     for story in stories:
-        tagged = False
-        for tag in story.tags:
-            if tag[0] == "bot-managed":
-                logger.debug(f"Story {story.subject} includes the tag 'bot-managed'")
-                tagged = True
-
-        if not tagged:
+        if not any(tag[0] == "bot-managed" for tag in story.tags):
             continue
 
         # Check if we have already created tasks for this story in the current state
-
-        if str(story.id) in actions:
-            if str(story.status) in actions[str(story.id)]:
-                logger.debug(
-                    f"Tasks for story {story.subject} already created in state {story.status}"
-                )
-                continue
+        if str(story.status) in actions.get(str(story.id), []):
+            logger.debug(
+                f"Tasks for story {story.subject} already created in state {story.status}"
+            )
+            continue
 
         # Check if we have a template for this type of story
         if story.status not in templates:
@@ -63,37 +160,32 @@ def sync_templates(taigacon, project_id: str) -> int:
             continue
 
         logger.debug(f"Found template for story {story.subject}")
-        template = templates[story.status]
-
-        # Get a list of existing tasks for the story
-        raw_tasks = taigacon.tasks.list(user_story=story.id)
-        existing_tasks = []
-        for task in raw_tasks:
-            existing_tasks.append(task.subject)
-
-        for task in template:
+        existing_tasks = [task.subject for task in story_tasks.get(story.id, [])]
+        for task in templates[story.status]:
             if task["subject"] in existing_tasks:
                 logger.debug(f"Task {task['subject']} already exists")
                 continue
-
-            logger.info(f"Creating task {task['subject']} with status {task['status']}")
-            taigacon.tasks.create(
-                project=project_id,
-                user_story=story.id,
-                status=task["status"],
-                subject=task["subject"],
+            creations.append((story.id, task))
+        synced.append(story)
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="templates"
+    ) as executor:
+        created = list(
+            executor.map(
+                lambda creation: create_task(taigacon, project_id, *creation),
+                creations,
             )
-            made_changes += 1
-
-        if str(story.id) not in actions:
-            actions[str(story.id)] = []
-        actions[str(story.id)].append(str(story.status))
+        )
 
-        # Update our saved actions
-        with open("template_actions.json", "w") as f:
-            json.dump(actions, f)
+    # Stories with failed tasks are left unrecorded so they are retried next time
+    failed = {story_id for (story_id, _), ok in zip(creations, created) if not ok}
+    for story in synced:
+        if story.id not in failed:
+            record_template_action(story.id, story.status)
+    compact_template_actions()
 
-    return made_changes
+    return created.count(True)
 
 
 def progress_stories(
@@ -242,10 +334,17 @@ def progress_on_membership(
 
 
 def add_useful_fields(
-    project_id: str, taigacon, taiga_auth_token: str, config: dict, tidyhq_cache: dict
+    project_id: str,
+    taigacon,
+    taiga_auth_token: str,
+    config: dict,
+    tidyhq_cache: dict,
+    attributes: dict = taigalink.attendee_attributes,
 ):
     """Add useful fields to stories.
 
+    attributes gives the board's custom attribute IDs, see taigalink.attendee_attributes.
+
     Current useful fields:
     * Clickable TidyHQ contact link
     * Membership type
@@ -253,68 +352,54 @@ def add_useful_fields(
     # Iterate over all user stories
     stories = taigacon.user_stories.list(project=project_id, tags="bot-managed")
     for story in stories:
+        custom_attributes, _ = taigalink.get_custom_fields_for_story(
+            story_id=story.id, taiga_auth_token=taiga_auth_token, config=config
+        )
+        tidyhq_id = custom_attributes.get(attributes["tidyhq_id"])
 
         # Set TidyHQ contact URL
 
         # Check if the story has a TidyHQ link set
-        tidyhq_url = taigalink.get_tidyhq_url(
-            story_id=story.id, taiga_auth_token=taiga_auth_token, config=config
-        )
-
-        if tidyhq_url:
+        if custom_attributes.get(attributes["tidyhq_url"]):
             logger.debug(f"Story {story.subject} already has a TidyHQ URL set")
-        else:
-            # Check if the story has a TidyHQ ID set
-            tidyhq_id = taigalink.get_tidyhq_id(
-                story_id=story.id, taiga_auth_token=taiga_auth_token, config=config
-            )
-
-            if tidyhq_id:
-                logger.debug(f"Story {story.subject} has a TidyHQ ID set but no URL")
+        elif tidyhq_id:
+            logger.debug(f"Story {story.subject} has a TidyHQ ID set but no URL")
 
-                # Set the TidyHQ URL
-                taigalink.set_custom_field(
-                    config=config,
-                    taiga_auth_token=taiga_auth_token,
-                    story_id=story.id,
-                    field_id=3,
-                    value=f"https://{tidyhq_cache['org']['domain_prefix']}.tidyhq.com/contacts/{tidyhq_id}",
-                )
+            # Set the TidyHQ URL
+            taigalink.set_custom_field(
+                config=config,
+                taiga_auth_token=taiga_auth_token,
+                story_id=story.id,
+                field_id=attributes["tidyhq_url"],
+                value=f"https://{tidyhq_cache['org']['domain_prefix']}.tidyhq.com/contacts/{tidyhq_id}",
+            )
 
         # Set TidyHQ membership type
 
         # Check if the story has a membership type set
-        membership_type = taigalink.get_member_type(
-            story_id=story.id, taiga_auth_token=taiga_auth_token, config=config
+        if custom_attributes.get(attributes["membership"]):
+            logger.debug(f"Story {story.subject} already has a membership type set")
+            continue
+
+        if not tidyhq_id:
+            logger.debug(f"Story {story.subject} does not have a TidyHQ ID set")
+            continue
+
+        # Get the membership type
+        membership = tidyhq.get_membership_type(
+            contact_id=tidyhq_id, tidyhq_cache=tidyhq_cache
         )
 
-        if not membership_type:
-            # Check if the story has a TidyHQ ID set
-            tidyhq_id = taigalink.get_tidyhq_id(
-                story_id=story.id, taiga_auth_token=taiga_auth_token, config=config
+        if membership:
+            logger.debug(
+                f"Setting membership type for story {story.subject} to {membership}"
+            )
+            taigalink.set_custom_field(
+                config=config,
+                taiga_auth_token=taiga_auth_token,
+                story_id=story.id,
+                field_id=attributes["membership"],
+                value=membership,
             )
-
-            if tidyhq_id:
-                # Get the membership type
-                membership = tidyhq.get_membership_type(
-                    contact_id=tidyhq_id, tidyhq_cache=tidyhq_cache
-                )
-
-                if membership:
-                    logger.debug(
-                        f"Setting membership type for story {story.subject} to {membership}"
-                    )
-                    taigalink.set_custom_field(
-                        config=config,
-                        taiga_auth_token=taiga_auth_token,
-                        story_id=story.id,
-                        field_id=4,
-                        value=membership,
-                    )
-                else:
-                    logger.debug(f"Contact {tidyhq_id} does not have a membership")
-            else:
-                logger.debug(f"Story {story.subject} does not have a TidyHQ ID set")
         else:
-            logger.debug(f"Story {story.subject} already has a membership type set")
-            continue
+            logger.debug(f"Contact {tidyhq_id} does not have a membership")
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from util import taiga_writes
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+item_types = ["story", "issue", "task"]
+
+schema = """
+CREATE TABLE IF NOT EXISTS items (
+    item_type TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    project INTEGER,
+    assigned_to INTEGER,
+    user_story INTEGER,
+    due_date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (item_type, id)
+);
+CREATE INDEX IF NOT EXISTS items_assigned_to ON items (assigned_to, item_type);
+CREATE INDEX IF NOT EXISTS items_project ON items (project, item_type);
+CREATE INDEX IF NOT EXISTS items_user_story ON items (user_story);
+CREATE INDEX IF NOT EXISTS items_due_date ON items (due_date);
+CREATE TABLE IF NOT EXISTS watchers (
+    watcher INTEGER NOT NULL,
+    item_type TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (watcher, item_type, id)
+);
+CREATE INDEX IF NOT EXISTS watchers_item ON watchers (item_type, id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Each thread keeps its own connection per database
+connections = threading.local()
+
+
+def connect(config: dict) -> sqlite3.Connection:
+    """Return a connection to the mirror database, creating it if required."""
+    path = config.get("mirror_path", "mirror.sqlite")
+    if not hasattr(connections, "open"):
+        connections.open = {}
+    if path not in connections.open:
+        # The webhook receiver writes while the app and scripts read
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
+        connections.open[path] = conn
+    return connections.open[path]
+
+
+def store_item(conn: sqlite3.Connection, item_type: str, item: dict):
+    """Insert or replace an item, closed items are removed instead since only open items are mirrored."""
+    if item.get("is_closed"):
+        remove_item(conn, item_type, item["id"])
+        return
+
+    conn.execute(
+        "INSERT OR REPLACE INTO items (item_type, id, project, assigned_to, user_story, due_date, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            item_type,
+            item["id"],
+            item.get("project"),
+            item.get("assigned_to"),
+            item.get("user_story"),
+            item.get("due_date"),
+            json.dumps(item),
+        ),
+    )
+    conn.execute(
+        "DELETE FROM watchers WHERE item_type = ? AND id = ?", (item_type, item["id"])
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO watchers (watcher, item_type, id) VALUES (?, ?, ?)",
+        [(watcher, item_type, item["id"]) for watcher in item.get("watchers") or []],
+    )
+
+
+def remove_item(conn: sqlite3.Connection, item_type: str, item_id: int):
+    """Remove an item from the mirror."""
+    conn.execute(
+        "DELETE FROM items WHERE item_type = ? AND id = ?", (item_type, item_id)
+    )
+    conn.execute(
+        "DELETE FROM watchers WHERE item_type = ? AND id = ?", (item_type, item_id)
+    )
+
+
+def fetch_open_items(
+    config: dict, taiga_auth_token: str, item_type: str
+) -> list[dict] | None:
+    """List every open item of a type from Taiga. Returns None if the request fails."""
+    response = requests.get(
+        f"{config['taiga']['url']}/api/v1/{taiga_writes.type_map[item_type]}",
+        headers={
+            "Authorization": f"Bearer {taiga_auth_token}",
+            "x-disable-pagination": "True",
+        },
+        params={"status__is_closed": False},
+    )
+    if response.status_code != 200:
+        logger.error(f"Failed to list open {item_type}s: {response.status_code}")
+        return None
+    return response.json()
+
+
+def reconcile(config: dict, taiga_auth_token: str) -> bool:
+    """Replace the mirror with the open items currently in Taiga.
+
+    Webhooks keep the mirror current between reconciliations, this catches anything they missed.
+    """
+    fetched = {}
+    for item_type in item_types:
+        items = fetch_open_items(config, taiga_auth_token, item_type)
+        if items is None:
+            logger.error("Mirror not reconciled, keeping the previous copy")
+            return False
+        fetched[item_type] = items
+
+    conn = connect(config)
+    with conn:
+        conn.execute("DELETE FROM items")
+        conn.execute("DELETE FROM watchers")
+        for item_type, items in fetched.items():
+            for item in items:
+                store_item(conn, item_type, item)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('reconciled', ?)",
+            (str(time.time()),),
+        )
+
+    logger.info(
+        f"Mirror reconciled: {', '.join(f'{len(items)} {item_type}s' for item_type, items in fetched.items())}"
+    )
+    return True
+
+
+def is_fresh(config: dict) -> bool:
+    """Check whether the mirror has been reconciled recently enough to be read from."""
+    if not os.path.exists(config.get("mirror_path", "mirror.sqlite")):
+        return False
+    row = (
+        connect(config)
+        .execute("SELECT value FROM meta WHERE key = 'reconciled'")
+        .fetchone()
+    )
+    if not row:
+        return False
+    return time.time() - float(row[0]) < config.get("mirror_max_age", 6 * 60 * 60)
+
+
+def apply_webhook(config: dict, taiga_auth_token: str, data: dict) -> bool:
+    """Update the mirror from a Taiga webhook payload.
+
+    Webhook payloads are shaped differently to the API so the current item is fetched instead.
+    Returns True if the mirror was changed.
+    """
+    item_type = "story" if data.get("type") == "userstory" else data.get("type")
+    if item_type not in item_types:
+        return False
+    item_id = data["data"]["id"]
+
+    conn = connect(config)
+    if data["action"] == "delete":
+        with conn:
+            remove_item(conn, item_type, item_id)
+        return True
+
+    response = requests.get(
+        f"{config['taiga']['url']}/api/v1/{taiga_writes.type_map[item_type]}/{item_id}",
+        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+    )
+    if response.status_code != 200:
+        logger.error(
+            f"Failed to fetch {item_type} {item_id} for the mirror: {response.status_code}"
+        )
+        return False
+
+    with conn:
+        store_item(conn, item_type, response.json())
+    return True
+
+
+def query(
+    config: dict,
+    item_type: str,
+    assigned_to: int | None = None,
+    watcher: int | None = None,
+    project: int | None = None,
+    user_story: int | None = None,
+    has_due_date: bool = False,
+) -> list[dict] | None:
+    """Find open items in the mirror.
+
+    Returns None if the mirror is out of date, callers should go to Taiga instead.
+    """
+    if not is_fresh(config):
+        return None
+
+    sql = "SELECT items.data FROM items"
+    conditions = ["items.item_type = ?"]
+    params: list = [item_type]
+    if watcher is not None:
+        sql += " JOIN watchers ON watchers.item_type = items.item_type AND watchers.id = items.id"
+        conditions.append("watchers.watcher = ?")
+        params.append(watcher)
+    for column, value in [
+        ("assigned_to", assigned_to),
+        ("project", project),
+        ("user_story", user_story),
+    ]:
+        if value is not None:
+            conditions.append(f"items.{column} = ?")
+            params.append(value)
+    if has_due_date:
+        conditions.append("items.due_date IS NOT NULL")
+
+    sql += f" WHERE {' AND '.join(conditions)} ORDER BY items.id"
+    rows = connect(config).execute(sql, params).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def get_item(config: dict, item_type: str, item_id: int | str) -> dict | None:
+    """Get an open item from the mirror. Returns None if it isn't mirrored or the mirror is out of date."""
+    if item_type == "userstory":
+        item_type = "story"
+    if not is_fresh(config):
+        return None
+    row = (
+        connect(config)
+        .execute(
+            "SELECT data FROM items WHERE item_type = ? AND id = ?",
+            (item_type, int(item_id)),
+        )
+        .fetchone()
+    )
+    return json.loads(row[0]) if row else None
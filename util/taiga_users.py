@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+
+def memo_key(user: dict) -> str:
+    """Return the key user details are remembered under.
+
+    A user that has been deleted and recreated gets a new join date so stale details aren't reused.
+    """
+    return f"{user['id']}-{user.get('date_joined')}"
+
+
+def load_memo(config: dict) -> dict:
+    """Read the remembered user details from disk."""
+    try:
+        with open(config.get("user_memo_path", "taiga_users.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_memo(config: dict, memo: dict):
+    """Write the remembered user details to disk."""
+    path = config.get("user_memo_path", "taiga_users.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(memo, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def fetch_user(config: dict, taiga_auth_token: str, user_id: int) -> dict | None:
+    """Get the full details of a Taiga user, including their email address."""
+    response = requests.get(
+        f"{config['taiga']['url']}/api/v1/users/{user_id}",
+        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+    )
+    if response.status_code != 200:
+        logger.error(f"Failed to get user info for {user_id}: {response.status_code}")
+        return None
+    return response.json()
+
+
+def get_details(
+    config: dict, taiga_auth_token: str, users: list[dict], fresh: bool = False
+) -> dict[int, dict]:
+    """Get the full details of several Taiga users, keyed by user ID.
+
+    Details are remembered on disk so only new users are fetched, fetches are made concurrently.
+    Users whose details can't be fetched are left out.
+    """
+    memo = {} if fresh else load_memo(config)
+    missing = [user for user in users if memo_key(user) not in memo]
+
+    if missing:
+        with ThreadPoolExecutor(
+            max_workers=config.get("user_fetch_workers", 8),
+            thread_name_prefix="taiga_users",
+        ) as executor:
+            fetched = executor.map(
+                lambda user: fetch_user(config, taiga_auth_token, user["id"]), missing
+            )
+            for user, details in zip(missing, fetched):
+                if details:
+                    memo[memo_key(user)] = {
+                        "email": details.get("email"),
+                        "username": details["username"],
+                    }
+
+    # Drop users that no longer exist
+    memo = {
+        memo_key(user): memo[memo_key(user)] for user in users if memo_key(user) in memo
+    }
+    save_memo(config, memo)
+    logger.info(f"Fetched {len(missing)} of {len(users)} Taiga users")
+
+    return {
+        user["id"]: memo[memo_key(user)] for user in users if memo_key(user) in memo
+    }
@@ -0,0 +1,112 @@
+import logging
+from typing import Callable, Literal
+
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+type_map = {
+    "userstory": "userstories",
+    "story": "userstories",
+    "issue": "issues",
+    "task": "tasks",
+}
+
+
+def versioned_patch(
+    url: str,
+    taiga_auth_token: str,
+    fields: dict,
+    version: int | None = None,
+    rebase: Callable[[dict], dict | None] | None = None,
+    retries: int = 3,
+) -> dict | None | Literal[False]:
+    """PATCH a versioned Taiga resource, refetching and retrying if someone else has modified it in the meantime.
+
+    If no version is provided the current one is fetched first.
+    rebase is called with the refetched resource after a conflict and should return the fields to send,
+    or None if the change no longer applies. Without a rebase a conflict is a failure, since retrying
+    would overwrite whatever the other writer changed.
+
+    Returns the updated resource, None if the rebase dropped the change or False if it fails.
+    """
+    headers = {"Authorization": f"Bearer {taiga_auth_token}"}
+
+    for attempt in range(retries + 1):
+        if version is None:
+            response = requests.get(url, headers=headers)
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch {url}: {response.status_code}")
+                return False
+            current = response.json()
+            version = current["version"]
+            if attempt > 0:
+                fields = rebase(current)  # type: ignore
+                if fields is None:
+                    logger.info(
+                        f"Skipped writing to {url}, it was changed in the meantime"
+                    )
+                    return None
+
+        response = requests.patch(
+            url, headers=headers, json={**fields, "version": version}
+        )
+
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 412:
+            if not rebase:
+                logger.error(
+                    f"Version conflict writing {', '.join(fields)} to {url}, someone else has changed it"
+                )
+                return False
+            logger.info(
+                f"Version conflict writing {', '.join(fields)} to {url}, retrying ({attempt + 1}/{retries})"
+            )
+            version = None
+            continue
+        else:
+            logger.error(
+                f"Failed to write {', '.join(fields)} to {url}: {response.status_code}"
+            )
+            logger.error(response.text)
+            return False
+
+    logger.error(
+        f"Gave up writing {', '.join(fields)} to {url} after {retries} conflicts"
+    )
+    return False
+
+
+def update_item(
+    config: dict,
+    taiga_auth_token: str,
+    item_type: str,
+    item_id: int | str,
+    fields: dict,
+    version: int | None = None,
+    rebase: Callable[[dict], dict | None] | None = None,
+) -> dict | None | Literal[False]:
+    """Write several fields of a story, task or issue in a single request.
+
+    Conflicts are only retried with a rebase, see versioned_patch.
+    Returns the updated item, None if the rebase dropped the change or False if it fails.
+    """
+    if item_type not in type_map:
+        logger.error(f"Type {item_type} not supported")
+        return False
+
+    if not fields:
+        logger.debug(f"No changes to write to {item_type} {item_id}")
+        return {"version": version}
+
+    url = f"{config['taiga']['url']}/api/v1/{type_map[item_type]}/{item_id}"
+    return versioned_patch(
+        url=url,
+        taiga_auth_token=taiga_auth_token,
+        fields=fields,
+        version=version,
+        rebase=rebase,
+    )
@@ -1,13 +1,14 @@
 import logging
 import re
 import sys
+import threading
 from pprint import pformat, pprint
 from typing import Literal
 
 import requests
 
 from slack import misc as slack_misc
-from util import tidyhq
+from util import file_transfer, taiga_history, taiga_mirror, taiga_writes, tidyhq
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
@@ -40,12 +41,21 @@ def get_custom_fields_for_story(
     return custom_attributes, version
 
 
+# Custom attribute IDs on the Attendee board, other boards give their own in the boards config
+attendee_attributes = {
+    "tidyhq_id": "1",
+    "email": "2",
+    "tidyhq_url": "3",
+    "membership": "4",
+}
+
+
 def get_tidyhq_id(story_id: str, taiga_auth_token: str, config: dict) -> str | None:
     """Retrieve the TidyHQ ID for a specific story if set."""
     custom_attributes, version = get_custom_fields_for_story(
         story_id, taiga_auth_token, config
     )
-    return custom_attributes.get("1", None)
+    return custom_attributes.get(attendee_attributes["tidyhq_id"], None)
 
 
 def get_email(story_id: str, taiga_auth_token: str, config: dict) -> str | None:
@@ -53,7 +63,7 @@ def get_email(story_id: str, taiga_auth_token: str, config: dict) -> str | None:
     custom_attributes, version = get_custom_fields_for_story(
         story_id, taiga_auth_token, config
     )
-    return custom_attributes.get("2", None)
+    return custom_attributes.get(attendee_attributes["email"], None)
 
 
 def get_tidyhq_url(story_id: str, taiga_auth_token: str, config: dict) -> str | None:
@@ -61,7 +71,7 @@ def get_tidyhq_url(story_id: str, taiga_auth_token: str, config: dict) -> str |
     custom_attributes, version = get_custom_fields_for_story(
         story_id, taiga_auth_token, config
     )
-    return custom_attributes.get("3", None)
+    return custom_attributes.get(attendee_attributes["tidyhq_url"], None)
 
 
 def get_member_type(story_id: str, taiga_auth_token: str, config: dict) -> str | None:
@@ -69,31 +79,27 @@ def get_member_type(story_id: str, taiga_auth_token: str, config: dict) -> str |
     custom_attributes, version = get_custom_fields_for_story(
         story_id, taiga_auth_token, config
     )
-    return custom_attributes.get("4", None)
+    return custom_attributes.get(attendee_attributes["membership"], None)
 
 
 def update_task(
     task_id: str, status: int, taiga_auth_token: str, config: dict, version: int
 ) -> bool:
     """Update the status of a task."""
-    task_url = f"{config['taiga']['url']}/api/v1/tasks/{task_id}"
-    response = requests.patch(
-        task_url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
-        json={
-            "status": status,
-            "version": version,
-        },
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type="task",
+        item_id=task_id,
+        fields={"status": status},
+        version=version,
     )
 
-    if response.status_code == 200:
+    if updated:
         return True
 
     else:
-        logger.error(
-            f"Failed to update task {task_id} with status {status}: {response.status_code}"
-        )
-        logger.error(response.json())
+        logger.error(f"Failed to update task {task_id} with status {status}")
         return False
 
 
@@ -123,24 +129,20 @@ def progress_story(
         logger.error(f"Failed to find a status with order {new_order}")
         return False
 
-    update_url = f"{config['taiga']['url']}/api/v1/userstories/{story_id}"
-    response = requests.patch(
-        update_url,
-        headers={
-            "Authorization": f"Bearer {taiga_auth_token}",
-            "Content-Type": "application/json",
-        },
-        json={"status": new_status, "version": story.version},
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type="story",
+        item_id=story_id,
+        fields={"status": new_status},
+        version=story.version,
     )
 
-    if response.status_code == 200:
+    if updated:
         logger.debug(f"User story {story_id} status updated to {new_status + 1}")
         return True
     else:
-        logger.error(
-            f"Failed to update user story {story_id} status: {response.status_code}"
-        )
-        logger.error(response.json())
+        logger.error(f"Failed to update user story {story_id} status")
         return False
 
 
@@ -171,18 +173,19 @@ def set_custom_field(
 
     # Update the custom field
     custom_attributes[field_id] = value
-    custom_attributes_url = f"{config['taiga']['url']}/api/v1/userstories/custom-attributes-values/{story_id}"
 
-    response = requests.patch(
-        custom_attributes_url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
-        json={
-            "attributes_values": custom_attributes,
-            "version": version,
+    # If another field was changed in the meantime keep it and set ours on top
+    updated = taiga_writes.versioned_patch(
+        url=custom_attributes_url,
+        taiga_auth_token=taiga_auth_token,
+        fields={"attributes_values": custom_attributes},
+        version=version,
+        rebase=lambda current: {
+            "attributes_values": {**current["attributes_values"], field_id: value}
         },
     )
 
-    if response.status_code == 200:
+    if updated:
         logger.info(
             f"Updated story {story_id} with custom attribute {field_id}: {value}"
         )
@@ -190,9 +193,8 @@ def set_custom_field(
 
     else:
         logger.error(
-            f"Failed to update story {story_id} with custom attribute {field_id}: {value}: {response.status_code}"
+            f"Failed to update story {story_id} with custom attribute {field_id}: {value}"
         )
-        logger.error(response.json())
 
     return False
 
@@ -335,6 +337,11 @@ def create_item(
         data["severity"] = severity
     if status:
         data["status"] = status
+    # Taiga accepts watchers and due dates on creation so everything can go in one request
+    if watchers:
+        data["watchers"] = watchers
+    if due_date:
+        data["due_date"] = due_date
 
     create_url = f"{config['taiga']['url']}/api/v1/{type_map[item_type]}"
     response = requests.post(
@@ -345,40 +352,34 @@ def create_item(
         json=data,
     )
     if response.status_code == 201:
-        logger.info(
-            f"Created {item_type} {response.json()['id']} on project {project_id}"
-        )
-        story_id = response.json()["id"]
-
-        version = response.json()["version"]
-
-        # Add watchers if provided
-        if watchers:
-            current_watchers = []
-            for watcher in watchers:
-                added_watcher = watch(
-                    type_str=item_type,
-                    item_id=story_id,
-                    watchers=current_watchers,
-                    taiga_id=watcher,
-                    taiga_auth_token=taiga_auth_token,
-                    config=config,
-                    version=version,
-                )
-                if added_watcher:
-                    current_watchers.append(watcher)
-                    version += 1
+        created = response.json()
+        logger.info(f"Created {item_type} {created['id']} on project {project_id}")
+        story_id = created["id"]
 
-        # Add due date if provided
-        if due_date:
+        version = created["version"]
+
+        # Older Taiga versions ignore some fields on creation, fix them up with a single PATCH
+        missing = {}
+        if watchers and not set(watchers).issubset(created.get("watchers") or []):
+            missing["watchers"] = list(
+                set(created.get("watchers") or []) | set(watchers)
+            )
+        if due_date and created.get("due_date") != due_date:
+            missing["due_date"] = due_date
+
+        if missing:
             response = requests.patch(
-                create_url,
+                f"{create_url}/{story_id}",
                 headers={"Authorization": f"Bearer {taiga_auth_token}"},
-                json={"due_date": due_date, "version": version},
+                json={**missing, "version": version},
             )
             if response.status_code == 200:
-                logger.info(f"Added due date to {item_type} {story_id}")
+                logger.info(f"Added {', '.join(missing)} to {item_type} {story_id}")
                 version = response.json()["version"]
+            else:
+                logger.error(
+                    f"Failed to add {', '.join(missing)} to {item_type} {story_id}: {response.status_code}"
+                )
 
         return story_id, version
 
@@ -390,6 +391,36 @@ def create_item(
         return False, None
 
 
+# Board metadata that can be looked up by name
+# field type: (key in taiga_cache["boards"], API endpoint)
+mapper_fields = {
+    "severity": ("severities", "severities"),
+    "priority": ("priorities", "priorities"),
+    "type": ("types", "issue-types"),
+    "status": ("statuses", "issue-statuses"),
+}
+
+
+# Handlers run concurrently, only one of them should build or update the name index of the shared cache
+name_index_lock = threading.Lock()
+
+
+def build_name_index(taiga_cache: dict) -> dict:
+    """Build a case-insensitive name to ID index for the metadata of every board in the cache.
+
+    The index is keyed by field type then project ID so it can be dumped with the rest of the cache.
+    Statuses are issue statuses.
+    """
+    index = {field_type: {} for field_type in mapper_fields}
+    for project_id, board in taiga_cache["boards"].items():
+        for field_type, (key, _) in mapper_fields.items():
+            objects = board[key]["issue"] if field_type == "status" else board[key]
+            index[field_type][project_id] = {
+                obj["name"].lower(): obj_id for obj_id, obj in objects.items()
+            }
+    return index
+
+
 def item_mapper(
     item: str | None,
     field_type: str,
@@ -397,20 +428,22 @@ def item_mapper(
     taiga_auth_token: str,
     config: dict,
     taigacon,
+    taiga_cache: dict | None = None,
 ) -> int:
-    """Map an item to a Taiga ID."""
+    """Map an item to a Taiga ID.
+
+    Names are resolved through the cache where possible, Taiga is only queried if the name isn't found.
+    """
     if not item:
         return False
-    # Construct the url
-    if field_type == "severity":
-        url = f"{config['taiga']['url']}/api/v1/severities?project={project_id}"
-    elif field_type == "priority":
-        url = f"{config['taiga']['url']}/api/v1/priorities?project={project_id}"
-    elif field_type == "type":
-        url = f"{config['taiga']['url']}/api/v1/issue-types?project={project_id}"
-    elif field_type == "status":
-        url = f"{config['taiga']['url']}/api/v1/statuses?project={project_id}"
-    elif field_type in ["board", "project"]:
+    name = item.lower().strip()
+
+    if field_type in ["board", "project"]:
+        if taiga_cache:
+            project_id = taiga_cache["projects"]["by_name_with_extra"].get(name)
+            if project_id:
+                return int(project_id)
+
         # Map project names to IDs
         projects = taigacon.projects.list()
         project_ids: dict[str, int] = {
@@ -418,21 +451,50 @@ def item_mapper(
         }
 
         # Duplicate similar board names for QoL
-        project_ids["infra"] = project_ids["infrastructure"]
-        project_ids["laser"] = project_ids["lasers"]
-        project_ids["printer"] = project_ids["3d"]
-        project_ids["printers"] = project_ids["3d"]
-
-        project_id = project_ids.get(item.lower(), None)  # type: ignore
+        for alias, project_name in [
+            ("infra", "infrastructure"),
+            ("laser", "lasers"),
+            ("printer", "3d"),
+            ("printers", "3d"),
+        ]:
+            if project_name in project_ids:
+                project_ids[alias] = project_ids[project_name]
+
+        if taiga_cache:
+            taiga_cache["projects"]["by_name_with_extra"].update(project_ids)
+
+        project_id = project_ids.get(name, None)  # type: ignore
         if not project_id:
             logger.error(f"Project ID for {item} not found")
             return False
         return int(project_id)
 
+    if field_type not in mapper_fields:
+        logger.error(f"Field type {field_type} not supported")
+        return False
+
+    if project_id is not None:
+        project_id = int(project_id)
+
+    if taiga_cache:
+        # Normally built by setup_cache, only caches built elsewhere need it here
+        if "name_index" not in taiga_cache:
+            with name_index_lock:
+                if "name_index" not in taiga_cache:
+                    taiga_cache["name_index"] = build_name_index(taiga_cache)
+        object_id = taiga_cache["name_index"][field_type].get(project_id, {}).get(name)
+        if object_id is not None:
+            return object_id
+        logger.info(f"{field_type} {item} not in cache for project {project_id}")
+
     # Fetch the items
     response = requests.get(
-        url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+        f"{config['taiga']['url']}/api/v1/{mapper_fields[field_type][1]}",
+        headers={
+            "Authorization": f"Bearer {taiga_auth_token}",
+            "x-disable-pagination": "True",
+        },
+        params={"project": project_id},
     )
 
     if response.status_code != 200:
@@ -446,14 +508,14 @@ def item_mapper(
     logger.debug(f"Fetched objects: {objects}")
     logger.debug(f"Looking for item: {item}")
 
-    for object in objects:
-        try:
-            if object["name"].lower() == item.lower():
-                return object["id"]
-        except TypeError:
-            print(object)
+    names = {obj["name"].lower(): obj["id"] for obj in objects}
 
-    return False
+    # Refresh the index so the next lookup doesn't need to go to Taiga
+    if taiga_cache and project_id is not None:
+        with name_index_lock:
+            taiga_cache["name_index"][field_type][project_id] = names
+
+    return names.get(name, False)
 
 
 def map_slack_names_to_taiga_usernames(input_string: str, taiga_users: dict) -> str:
@@ -523,9 +585,17 @@ def get_tasks(
     """Get all tasks assigned to a user or story.
 
     User will take precedence over story if both are provided.
-    Pass exclude_done=True to exclude tasks that have a closed status.
+    Pass exclude_done=True to exclude tasks that have a closed status, these are read from the mirror where possible.
     """
 
+    if exclude_done:
+        if taiga_id:
+            mirrored = taiga_mirror.query(config, "task", assigned_to=taiga_id)
+        else:
+            mirrored = taiga_mirror.query(config, "task", user_story=story_id)
+        if mirrored is not None:
+            return mirrored
+
     if taiga_id:
         params = {"assigned_to": taiga_id}
     elif story_id:
@@ -551,7 +621,14 @@ def get_tasks(
 def get_stories(
     taiga_id: int, config: dict, taiga_auth_token: str, exclude_done: bool = False
 ):
-    """Get all stories assigned to a user."""
+    """Get all stories assigned to a user.
+
+    Open stories are read from the mirror where possible.
+    """
+    if exclude_done:
+        mirrored = taiga_mirror.query(config, "story", assigned_to=taiga_id)
+        if mirrored is not None:
+            return mirrored
 
     url = f"{config['taiga']['url']}/api/v1/userstories"
     response = requests.get(
@@ -571,7 +648,14 @@ def get_stories(
 def get_issues(
     taiga_id: int, config: dict, taiga_auth_token: str, exclude_done: bool = False
 ):
-    """Get all issues assigned to a user."""
+    """Get all issues assigned to a user.
+
+    Open issues are read from the mirror where possible.
+    """
+    if exclude_done:
+        mirrored = taiga_mirror.query(config, "issue", assigned_to=taiga_id)
+        if mirrored is not None:
+            return mirrored
 
     url = f"{config['taiga']['url']}/api/v1/issues"
     response = requests.get(
@@ -588,6 +672,29 @@ def get_issues(
     return issues
 
 
+def open_items_by_assignee(config: dict, taiga_auth_token: str) -> dict | None:
+    """Get every open story, issue and task grouped by assignee.
+
+    Items are read from the mirror where possible, otherwise each type is fetched from Taiga in a single request.
+    Returns {taiga_id: {"story": [...], "issue": [...], "task": [...]}} or None if the items couldn't be fetched.
+    """
+    by_assignee = {}
+    for item_type in taiga_mirror.item_types:
+        items = taiga_mirror.query(config, item_type)
+        if items is None:
+            items = taiga_mirror.fetch_open_items(config, taiga_auth_token, item_type)
+        if items is None:
+            return None
+        for item in items:
+            if not item.get("assigned_to"):
+                continue
+            assignee = by_assignee.setdefault(
+                item["assigned_to"], {"story": [], "issue": [], "task": []}
+            )
+            assignee[item_type].append(item)
+    return by_assignee
+
+
 def sort_tasks_by_user_story(tasks):
     """Sort tasks by user story."""
     user_stories = {}
@@ -749,6 +856,16 @@ def get_info(
     return False
 
 
+def users_by_name(taiga_cache: dict) -> dict[str, int]:
+    """Return an index of Taiga users by lowercase full name, building it if the cache doesn't have one."""
+    if "users_by_name" not in taiga_cache:
+        taiga_cache["users_by_name"] = {
+            user["name"].lower(): user_id
+            for user_id, user in taiga_cache["users"].items()
+        }
+    return taiga_cache["users_by_name"]
+
+
 def add_comment(
     type_str: str,
     item_id: int,
@@ -768,19 +885,18 @@ def add_comment(
         logger.error(f"Type {type_str} not supported")
         return False
 
-    url = f"{config['taiga']['url']}/api/v1/{type_map[type_str]}/{item_id}"
-
-    response = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
-        json={"comment": comment, "version": version},
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type=type_str,
+        item_id=item_id,
+        fields={"comment": comment},
+        version=version,
     )
-    if response.status_code == 200:
+    if updated:
         return True
     else:
-        logger.error(
-            f"Failed to add comment to {type_str} {item_id}: {response.status_code}"
-        )
+        logger.error(f"Failed to add comment to {type_str} {item_id}")
         return False
 
 
@@ -792,10 +908,11 @@ def mark_complete(
     item_type: str | None = None,
     item: dict | None = None,
     status_id: int | None = None,
-) -> bool:
+) -> dict | Literal[False]:
     """Mark an item as complete.
 
     Can either pass the item directly or provide the ID and type. If a status ID is provided it will be used instead of the default (first) closing status.
+    Returns the updated item.
     """
 
     if not item:
@@ -814,24 +931,22 @@ def mark_complete(
         logger.error(f"Type {item_type} not supported")
         return False
 
-    url = f"{config['taiga']['url']}/api/v1/{type_map[item_type]}/{item_id}"
-
     # Figure out what the closing status is
     if not status_id:
         status_id = taiga_cache["boards"][item["project"]]["closing_status"][item_type]
 
-    response = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
-        json={"status": status_id, "version": item["version"]},
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type=item_type,
+        item_id=item_id,
+        fields={"status": status_id},
+        version=item["version"],
     )
-    if response.status_code == 200:
-        return True
+    if updated:
+        return updated
     else:
-        logger.error(
-            f"Failed to mark {item_type} {item_id} as complete: {response.status_code}"
-        )
-        logger.error(response.json())
+        logger.error(f"Failed to mark {item_type} {item_id} as complete")
         return False
 
 
@@ -850,19 +965,23 @@ def watch(
         logger.error(f"Type {type_str} not supported")
         return False
 
-    url = f"{config['taiga']['url']}/api/v1/{type_map[type_str]}/{item_id}"
-
-    response = requests.patch(
-        url,
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
-        json={"watchers": watchers + [taiga_id], "version": version},
+    # If the watchers changed in the meantime add ours to the current list
+    updated = taiga_writes.update_item(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type=type_str,
+        item_id=item_id,
+        fields={"watchers": watchers + [taiga_id]},
+        version=version,
+        rebase=lambda current: {
+            "watchers": current["watchers"]
+            + ([taiga_id] if taiga_id not in current["watchers"] else [])
+        },
     )
-    if response.status_code == 200:
+    if updated:
         return True
     else:
-        logger.error(
-            f"Failed to add watcher to {type_str} {item_id}: {response.status_code}"
-        )
+        logger.error(f"Failed to add watcher to {type_str} {item_id}")
         return False
 
 
@@ -1127,6 +1246,8 @@ def setup_cache(taiga_auth_token: str, config: dict, taigacon) -> dict:
     projects["by_name_with_extra"]["printers"] = projects["by_name_with_extra"]["3d"]
 
     cache["projects"] = projects
+    cache["name_index"] = build_name_index(cache)
+    users_by_name(cache)
 
     return cache
 
@@ -1156,11 +1277,12 @@ def promote_issue(
     }
 
     # Get issue comments
-    response = requests.get(
-        f"{config['taiga']['url']}/api/v1/history/issue/{issue_id}",
-        headers={"Authorization": f"Bearer {taiga_auth_token}"},
+    comments = taiga_history.all_comments(
+        config=config,
+        taiga_auth_token=taiga_auth_token,
+        item_type="issue",
+        item_id=issue_id,
     )
-    comments = response.json()
 
     # Create the user story
     story_id, version = create_item(
@@ -1188,17 +1310,22 @@ def promote_issue(
     attachments = response.json()
 
     if attachments:
-        for attachment in attachments:
-            attach_file(
-                taiga_auth_token=taiga_auth_token,
-                config=config,
-                project_id=issue["project"],
-                item_type="story",
-                item_id=story_id,
-                url=attachment["url"],
-                filename=attachment["attached_file"].split("/")[-1],
-                description=attachment["description"],
-            )
+        file_transfer.transfer_files(
+            taiga_auth_token=taiga_auth_token,
+            config=config,
+            project_id=issue["project"],
+            item_type="story",
+            item_id=story_id,
+            files=[
+                {
+                    "url": attachment["url"],
+                    "filename": attachment["attached_file"].split("/")[-1],
+                    "description": attachment["description"],
+                }
+                for attachment in attachments
+            ],
+            source="taiga",
+        )
 
     # Add comments to the story
     if comments:
@@ -1256,3 +1383,116 @@ def check_project_membership(taiga_cache: dict, project_id: int, taiga_id: int)
     """Check if the user is a member of the project."""
 
     return taiga_id in taiga_cache["boards"][int(project_id)]["members"]
+
+
+def plan_board_memberships(
+    taiga_cache: dict,
+    config: dict,
+    channels: list[dict],
+    channel_members: dict[str, list[str]],
+    slack_to_taiga: dict[str, int],
+) -> dict[int, dict]:
+    """Work out which channel members need to be added to the board mapped to each channel.
+
+    Public boards take the lowest role. Private boards only take members of private channels, with the highest role.
+    Returns {project_id: {"role": role, "users": [taiga_id, ...]}} for boards with members to add.
+    """
+    channel_projects = {
+        channel_id: int(project_id)
+        for project_id, channel_id in config["taiga-channel"].items()
+    }
+
+    additions = {}
+    for channel in channels:
+        project_id = channel_projects.get(channel["id"])
+        if project_id is None or project_id not in taiga_cache["boards"]:
+            continue
+        board = taiga_cache["boards"][project_id]
+
+        if board["private"] and not channel["is_private"]:
+            logger.info(
+                f"Project {board['name']} is private but #{channel['name']} is not, will not add members"
+            )
+            continue
+        role = board["highest_role"] if board["private"] else board["lowest_role"]
+
+        for slack_id in channel_members.get(channel["id"], []):
+            taiga_id = slack_to_taiga.get(slack_id)
+            if not taiga_id or taiga_id in board["members"]:
+                continue
+            if taiga_id not in taiga_cache["users"]:
+                logger.error(f"Taiga user {taiga_id} ({slack_id}) not in cache")
+                continue
+            project = additions.setdefault(project_id, {"role": role, "users": []})
+            if taiga_id not in project["users"]:
+                project["users"].append(taiga_id)
+
+    return additions
+
+
+def add_board_member(
+    config: dict, taiga_auth_token: str, project_id: int, role_id: int, username: str
+) -> bool:
+    """Add a single user to a board."""
+    response = requests.post(
+        f"{config['taiga']['url']}/api/v1/memberships",
+        headers={
+            "Authorization": f"Bearer {taiga_auth_token}",
+            "Content-Type": "application/json",
+        },
+        json={"role": role_id, "project": project_id, "username": username},
+    )
+
+    if response.status_code != 201:
+        logger.error(
+            f"Failed to add {username} to project {project_id}: {response.status_code}"
+        )
+        logger.error(response.text)
+        return False
+    return True
+
+
+def add_board_members(
+    config: dict,
+    taiga_auth_token: str,
+    project_id: int,
+    role_id: int,
+    usernames: list[str],
+) -> dict[str, bool]:
+    """Add several users to a board with the same role in a single request.
+
+    The bulk request fails as a whole if any user can't be added, in which case each user is added on their own.
+    Returns whether each user was added, keyed by username.
+    """
+    response = requests.post(
+        f"{config['taiga']['url']}/api/v1/memberships/bulk_create",
+        headers={
+            "Authorization": f"Bearer {taiga_auth_token}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "project_id": project_id,
+            "bulk_memberships": [
+                {"role_id": role_id, "username": username} for username in usernames
+            ],
+        },
+    )
+
+    if response.status_code in (200, 201):
+        logger.info(f"Added {len(usernames)} members to project {project_id}")
+        return {username: True for username in usernames}
+
+    logger.error(
+        f"Failed to add {len(usernames)} members to project {project_id} at once: {response.status_code}"
+    )
+    logger.error(response.text)
+    return {
+        username: add_board_member(
+            config=config,
+            taiga_auth_token=taiga_auth_token,
+            project_id=project_id,
+            role_id=role_id,
+            username=username,
+        )
+        for username in usernames
+    }
@@ -1,252 +1,165 @@
 import logging
-from datetime import datetime
+import time
 from pprint import pprint
 
-from util import misc, taigalink, tidyhq, training
+from util import contact_facts, taigalink
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
 
 
-def joined_slack(config: dict, contact_id: str, tidyhq_cache: dict) -> bool:
-    """Check if the contact has a Slack ID field set in TidyHQ."""
-    if contact_id == None:
-        return False
+# Check results for the current TidyHQ cache keyed by (check name, contact ID, cache time)
+# A contact's key status etc is the same for every task and loop iteration until the cache is refreshed
+check_memo: dict[tuple, bool] = {}
+# Results read from an eligibility matrix are counted separately as matrix
+check_stats = {"hits": 0, "misses": 0, "matrix": 0}
 
-    # Find the contact in the cache
-    contact = None
-    for c in tidyhq_cache["contacts"]:
-        if c["id"] == contact_id:
-            contact = c
-            break
-    if not contact:
-        logger.error(f"Contact {contact_id} not found in cache")
-        return False
 
-    # Check if the contact is already in the Slack group
-    for field in contact["custom_fields"]:
-        if field["id"] == config["tidyhq"]["ids"]["slack"]:
-            if field["value"]:
-                logger.debug(f"Contact {contact_id} has an associated slack account")
-                return True
-    return False
+def run_check(check, config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
+    """Run a task check for a contact, reusing the result if it's already been checked against this cache."""
+    key = (check.__name__, contact_id, tidyhq_cache.get("time"))
+    if key in check_memo:
+        check_stats["hits"] += 1
+        return check_memo[key]
 
+    # Results from an older cache will never be used again
+    if check_memo and next(iter(check_memo))[2] != key[2]:
+        check_memo.clear()
 
-def visitor_signup(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
-    """Check if the contact has ever signed up as a visitor or member."""
-
-    if contact_id == None:
+    check_stats["misses"] += 1
+    check_memo[key] = check(
+        config=config, contact_id=contact_id, tidyhq_cache=tidyhq_cache
+    )
+    return check_memo[key]
+
+
+# How each check is answered for every contact at once from the bitsets in the contact fact table
+# Each returns the bitset of fact table rows that pass, see contact_facts.index_columns
+# Checks are also given the current time so date comparisons across many contacts share it
+fact_checks = {
+    "joined_slack": lambda table, now: table["bits"]["has_slack"],
+    "visitor_signup": lambda table, now: contact_facts.matching(
+        table,
+        "membership_levels",
+        lambda level: level == "Visitor" or "Membership" in level,
+    ),
+    "member_signup": lambda table, now: contact_facts.matching(
+        table, "membership_levels", lambda level: "Membership" in level
+    ),
+    "member_induction": lambda table, now: contact_facts.any_of(
+        table, "inductions", ["Induction (Member)"]
+    ),
+    # The member induction bypasses the visitor induction
+    "visitor_induction": lambda table, now: contact_facts.any_of(
+        table, "inductions", ["Induction (Visitor)", "Induction (Member)"]
+    ),
+    "keyholder_induction": lambda table, now: contact_facts.any_of(
+        table, "inductions", ["Induction (Keyholder)"]
+    ),
+    "id_photo": lambda table, now: table["bits"]["has_photo_id"],
+    "check_payment_method": lambda table, now: contact_facts.any_of(
+        table, "last_payment_method", ["bank"]
+    ),
+    "bond_invoice_sent": lambda table, now: table["bits"]["bond_sent"],
+    "bond_invoice_paid": lambda table, now: table["bits"]["bond_paid"],
+    "check_billing_groups": lambda table, now: table["bits"]["billing_group"],
+    # Orientation inductions all have the word "Induction" in them, tool inductions don't
+    "at_least_one_tool": lambda table, now: contact_facts.matching(
+        table, "inductions", lambda induction: "Induction" not in induction
+    ),
+    "concession_sighted": lambda table, now: table["bits"]["has_concession"],
+    "member_2week": lambda table, now: contact_facts.on_or_before(
+        table, "membership_start", now - 14 * 86400
+    ),
+    "member_6month": lambda table, now: contact_facts.on_or_before(
+        table, "membership_start", now - 180 * 86400
+    ),
+    "member_18month": lambda table, now: contact_facts.on_or_before(
+        table, "membership_start", now - 540 * 86400
+    ),
+    "valid_emergency": lambda table, now: table["bits"]["emergency_valid"],
+    "has_key": lambda table, now: table["bits"]["has_key"],
+}
+
+
+def check_fact(
+    check: str, config: dict, contact_id: str | None, tidyhq_cache: dict
+) -> bool:
+    """Answer a check for a single contact from the contact fact table."""
+    if contact_id is None:
         return False
+    table = contact_facts.get_table(config=config, tidyhq_cache=tidyhq_cache)
+    row = table["rows"].get(str(contact_id))
+    if row is None:
+        logger.error(f"Contact {contact_id} not found in cache")
+        return False
+    return bool(fact_checks[check](table, time.time()) >> row & 1)
 
-    # Get all memberships for the contact
-
-    memberships = tidyhq.get_memberships_for_contact(
-        cache=tidyhq_cache, contact_id=contact_id
-    )
 
-    visitor = False
-    member = False
-    for membership in memberships:
-        if membership["membership_level"]["name"] == "Visitor":
-            logger.debug(f"Contact {contact_id} is a visitor")
-            visitor = True
+def joined_slack(config: dict, contact_id: str, tidyhq_cache: dict) -> bool:
+    """Check if the contact has a Slack ID field set in TidyHQ."""
+    return check_fact("joined_slack", config, contact_id, tidyhq_cache)
 
-        elif "Membership" in membership["membership_level"]["name"]:
-            logger.debug(f"Contact {contact_id} is a member")
-            member = True
 
-    return visitor or member
+def visitor_signup(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
+    """Check if the contact has ever signed up as a visitor or member."""
+    return check_fact("visitor_signup", config, contact_id, tidyhq_cache)
 
 
 def member_signup(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has ever signed up as a member."""
-    if contact_id == None:
-        return False
-
-    # Get all memberships for the contact
-
-    memberships = tidyhq.get_memberships_for_contact(
-        cache=tidyhq_cache, contact_id=contact_id
-    )
-
-    logger.debug(f"Contact {contact_id} has {len(memberships)} memberships")
-
-    for membership in memberships:
-        if "Membership" in membership["membership_level"]["name"]:
-            logger.debug(f"Contact {contact_id} is a member")
-            return True
-    return False
+    return check_fact("member_signup", config, contact_id, tidyhq_cache)
 
 
 def member_induction(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has been signed off for the member induction within Training Tracker."""
-    if contact_id == None:
-        return False
-
-    inductions = training.get_inductions_for_contact(
-        contact_id=contact_id, config=config, tidyhq_cache=tidyhq_cache
-    )
-
-    if "Induction (Member)" in inductions:
-        logger.debug(f"Contact {contact_id} has completed the member induction")
-        return True
-    return False
+    return check_fact("member_induction", config, contact_id, tidyhq_cache)
 
 
 def visitor_induction(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has been signed off for the visitor induction within Training Tracker."""
-    if contact_id == None:
-        return False
-
-    inductions = training.get_inductions_for_contact(
-        contact_id=contact_id, config=config, tidyhq_cache=tidyhq_cache
-    )
-
-    if "Induction (Visitor)" in inductions:
-        logger.debug(f"Contact {contact_id} has completed the visitor induction")
-        return True
-
-    elif "Induction (Member)" in inductions:
-        logger.debug(
-            f"Contact {contact_id} has completed the member induction (bypassing visitor induction)"
-        )
-        return True
-    return False
+    return check_fact("visitor_induction", config, contact_id, tidyhq_cache)
 
 
 def keyholder_induction(
     config: dict, contact_id: str | None, tidyhq_cache: dict
 ) -> bool:
     """Check if the contact has been signed off for the keyholder induction within Training Tracker."""
-    if contact_id == None:
-        return False
-
-    inductions = training.get_inductions_for_contact(
-        contact_id=contact_id, config=config, tidyhq_cache=tidyhq_cache
-    )
-
-    if "Induction (Keyholder)" in inductions:
-        logger.debug(f"Contact {contact_id} has completed the keyholder induction")
-        return True
-    return False
+    return check_fact("keyholder_induction", config, contact_id, tidyhq_cache)
 
 
 def id_photo(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has uploaded an ID photo."""
-    if contact_id == None:
-        return False
-
-    photo_url = tidyhq.get_custom_field(
-        config=config,
-        contact_id=contact_id,
-        cache=tidyhq_cache,
-        field_id=None,
-        field_map_name="photo_id",
-    )
-
-    if photo_url:
-        logger.debug(f"Contact {contact_id} has uploaded an ID photo")
-        return True
-    return False
+    return check_fact("id_photo", config, contact_id, tidyhq_cache)
 
 
 def check_payment_method(
     config: dict, contact_id: str | None, tidyhq_cache: dict
 ) -> bool:
     """Check if the contact's most recent payment was via bank transfer."""
-    if contact_id == None:
-        return False
-
-    payment_method = None
-
-    contact_id = str(contact_id)
-
-    # Confirm that the contact has at least one invoice
-    if contact_id not in tidyhq_cache["invoices"]:
-        logger.debug(f"Contact {contact_id} has no invoices")
-        return False
-
-    # Iterate over invoices for given contact id. Invoices are sorted newest first
-    for invoice in tidyhq_cache["invoices"][contact_id]:
-        if invoice["paid"]:
-            payment_method = invoice["payments"][0]["type"]
-            break
-
-    logger.debug(f"Contact {contact_id} last paid with: {payment_method}")
-
-    if payment_method == "bank":
-        return True
-    return False
+    return check_fact("check_payment_method", config, contact_id, tidyhq_cache)
 
 
 def bond_invoice_sent(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if we've sent an invoice for 135/225 to the contact. Does not check if it's been paid."""
-    if contact_id == None:
-        return False
-
-    contact_id = str(contact_id)
-    # Iterate over invoices for given contact id. Invoices are sorted newest first
-    for invoice in tidyhq_cache["invoices"][contact_id]:
-        # Bond invoices are specific amounts for concession, full respectively
-        # This is a best guess without retrieving the full invoice details
-        if invoice["amount"] in [135, 225]:
-            logger.debug(f"Contact {contact_id} may have been sent a bond invoice")
-            return True
-        logger.debug(f"Contact {contact_id} has not been sent a bond invoice")
-    return False
+    return check_fact("bond_invoice_sent", config, contact_id, tidyhq_cache)
 
 
 def bond_invoice_paid(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
-    """Check if we've sent an invoice for 135/225 to the contact. Does not check if it's been paid."""
-    if contact_id == None:
-        return False
-
-    contact_id = str(contact_id)
-    # Iterate over invoices for given contact id. Invoices are sorted newest first
-    for invoice in tidyhq_cache["invoices"][contact_id]:
-        # Bond invoices are specific amounts for concession, full respectively
-        # This is a best guess without retrieving the full invoice details
-        if invoice["amount"] in [135, 225]:
-            logger.debug(f"Contact {contact_id} may have been sent a bond invoice")
-            if invoice["paid"]:
-                logger.debug(f"Contact {contact_id} has paid their bond invoice")
-                return True
-            else:
-                logger.debug(f"Contact {contact_id} has not paid their bond invoice")
-                return False
-        logger.debug(f"Contact {contact_id} has not been sent a bond invoice")
-    return False
+    """Check if the most recent invoice for 135/225 sent to the contact has been paid."""
+    return check_fact("bond_invoice_paid", config, contact_id, tidyhq_cache)
 
 
 def check_billing_groups(
     config: dict, contact_id: str | None, tidyhq_cache: dict
 ) -> bool:
     """Check if the contact is in a group that contains the string 'Billing'."""
-    if contact_id == None:
-        return False
-
-    return tidyhq.check_for_groups(
-        contact_id=contact_id, tidyhq_cache=tidyhq_cache, group_string="Billing"
-    )
+    return check_fact("check_billing_groups", config, contact_id, tidyhq_cache)
 
 
 def at_least_one_tool(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has been signed off on at least one tool"""
-    if contact_id == None:
-        return False
-
-    inductions = training.get_inductions_for_contact(
-        contact_id=contact_id, config=config, tidyhq_cache=tidyhq_cache
-    )
-
-    for induction in inductions:
-        # Orientation inductions all have the word "Induction" in them, tool inductions don't
-        if "Induction" not in induction:
-            logger.debug(
-                f"Contact {contact_id} has completed at least one tool induction"
-            )
-            return True
-    return False
+    return check_fact("at_least_one_tool", config, contact_id, tidyhq_cache)
 
 
 def concession_sighted(
@@ -255,27 +168,20 @@ def concession_sighted(
     """Check if the contact has had their concession proof sighted and recorded in TidyHQ.
 
     _Does not_ return True if the user does not need to provide proof of concession."""
-    if contact_id == None:
-        return False
+    return check_fact("concession_sighted", config, contact_id, tidyhq_cache)
 
-    if tidyhq.get_custom_field(
-        config=config,
-        contact_id=contact_id,
-        cache=tidyhq_cache,
-        field_map_name="concession",
-    ):
-        return True
 
-    return False
-
-
-def concession_not_needed(contact_id: str | None, tidyhq_cache: dict) -> bool:
+def concession_not_needed(
+    contact_id: str | None, tidyhq_cache: dict, config: dict
+) -> bool:
     """Returns True if the contact does not need to provide proof of concession.
 
     Will also return False if the contact does not have an actual membership"""
-
-    member_type = tidyhq.get_membership_type(
-        contact_id=contact_id, tidyhq_cache=tidyhq_cache
+    member_type = contact_facts.lookup(
+        config=config,
+        tidyhq_cache=tidyhq_cache,
+        contact_id=contact_id,
+        fact="membership_type",
     )
 
     # Technically visitors etc also don't need to provide proof of concession but this task isn't added until they're a member
@@ -284,142 +190,116 @@ def concession_not_needed(contact_id: str | None, tidyhq_cache: dict) -> bool:
 
 def member_2week(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check whether the member has held their current membership for at least two weeks."""
-
-    if contact_id == None:
-        return False
-
-    memberships = tidyhq.get_memberships_for_contact(
-        cache=tidyhq_cache, contact_id=contact_id
-    )
-
-    most_recent = tidyhq.return_most_recent_membership(memberships)
-
-    # Check if the start date of the membership is at least two weeks ago
-    # Format is 2019-11-01T08:00:00+08:00
-    start_date = most_recent["start_date"].split("T")[0]
-    start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    days = (datetime.now() - start_date).days
-    if days >= 14:
-        logger.debug(
-            f"Contact {contact_id} has held their membership for at least two weeks"
-        )
-        return True
-    return False
+    return check_fact("member_2week", config, contact_id, tidyhq_cache)
 
 
 def member_6month(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check whether the member has held their current membership for at least six months (180 days)."""
-
-    if contact_id == None:
-        return False
-
-    memberships = tidyhq.get_memberships_for_contact(
-        cache=tidyhq_cache, contact_id=contact_id
-    )
-
-    most_recent = tidyhq.return_most_recent_membership(memberships)
-
-    # Check if the start date of the membership is at least two weeks ago
-    # Format is 2019-11-01T08:00:00+08:00
-    start_date = most_recent["start_date"].split("T")[0]
-    start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    days = (datetime.now() - start_date).days
-    if days >= 180:
-        logger.debug(
-            f"Contact {contact_id} has held their membership for at least 6 months"
-        )
-        return True
-    return False
+    return check_fact("member_6month", config, contact_id, tidyhq_cache)
 
 
 def member_18month(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check whether the member has held their current membership for at least 18 months (540 days)."""
-
-    if contact_id == None:
-        return False
-
-    memberships = tidyhq.get_memberships_for_contact(
-        cache=tidyhq_cache, contact_id=contact_id
-    )
-
-    most_recent = tidyhq.return_most_recent_membership(memberships)
-
-    # Check if the start date of the membership is at least two weeks ago
-    # Format is 2019-11-01T08:00:00+08:00
-    start_date = most_recent["start_date"].split("T")[0]
-    start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    days = (datetime.now() - start_date).days
-    if days >= 540:
-        logger.debug(
-            f"Contact {contact_id} has held their membership for at least 18 months"
-        )
-        return True
-    return False
+    return check_fact("member_18month", config, contact_id, tidyhq_cache)
 
 
 def valid_emergency(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has valid emergency contact details."""
-
-    if contact_id == None:
-        return False
-
-    contact = tidyhq.get_contact(contact_id=contact_id, tidyhq_cache=tidyhq_cache)
-
-    if not contact:
-        logger.error(f"Contact {contact_id} not found in cache")
-        return False
-
-    contact_number = contact.get("phone_number")
-    emergency_name = contact.get("emergency_contact_person")
-    emergency_number = contact.get("emergency_contact_number")
-
-    # Confirm that all three fields are filled out
-    if not (contact_number and emergency_name and emergency_number):
-        logger.debug(
-            f"Contact {contact_id} has at least one missing field of: {contact_number}, {emergency_name}, {emergency_number}"
-        )
-        return False
-
-    # Confirm that the emergency contact number is a valid phone number
-    if not misc.valid_phone_number(emergency_number):
-        logger.debug(f"Contact {contact_id} has an invalid emergency contact number")
-        return False
-
-    # Check if the emergency contact number is the same as the contact's number
-    if contact_number == emergency_number:
-        logger.debug(
-            f"Contact {contact_id} has the same emergency contact number as their own"
-        )
-        return False
-
-    if contact_number[-9:] == emergency_number[-9:]:
-        logger.debug(
-            f"Contact {contact_id} has the same emergency contact number as their own"
-        )
-        return False
-
-    return True
+    return check_fact("valid_emergency", config, contact_id, tidyhq_cache)
 
 
 def has_key(config: dict, contact_id: str | None, tidyhq_cache: dict) -> bool:
     """Check if the contact has a key enabled"""
-    if contact_id == None:
-        return False
+    return check_fact("has_key", config, contact_id, tidyhq_cache)
+
+
+# Tasks that can be ticked off automatically and the check that decides whether they are complete
+task_checks = {
+    "Join Slack": joined_slack,
+    "Signed up as a visitor": visitor_signup,
+    "Signed up as a member": member_signup,
+    "Discussed moving to membership": member_signup,
+    "Completed new member induction": member_induction,
+    "Completed new visitor induction": visitor_induction,
+    "Completed keyholder induction": keyholder_induction,
+    "Confirmed photo on tidyhq": id_photo,
+    "Confirmed paying via bank": check_payment_method,
+    "Send bond invoice": bond_invoice_sent,
+    "Added to billing groups": check_billing_groups,
+    "Received at least one tool induction": at_least_one_tool,
+    "Proof of concession sighted": concession_sighted,
+    "Held membership for at least two weeks": member_2week,
+    "Confirmed bond invoice paid": bond_invoice_paid,
+    "Has valid emergency contact details": valid_emergency,
+    "Keyholder motion put to committee": has_key,
+    "Keyholder motion successful": has_key,
+    "Send keyholder documentation": has_key,
+    "Send bond invoice": has_key,
+    "Confirmed bond invoice paid": has_key,
+    "No indications of Code of Conduct violations": has_key,
+    "Competent to decide who can come in outside of events": has_key,
+    "Works well unsupervised": has_key,
+    "Undertakes tasks safely": has_key,
+    "Cleans own work area": has_key,
+    "Communicates issues to Management Committee if they arise": has_key,
+    "Offered backing for key": has_key,
+    "Planned first project": member_6month,
+    "No history of invoice deliquency": member_18month,
+}
+
+
+def eligibility_matrix(
+    config: dict, tidyhq_cache: dict, contact_ids: list | None = None
+) -> dict:
+    """Evaluate every automatic task check for many contacts at once.
+
+    Each check is evaluated once over the bitsets of the contact fact table rather than a contact at a time.
+    Defaults to every contact in the cache. Contacts that aren't in the cache fail every check.
+    Returns {"contacts": [contact_id, ...], "tasks": [subject, ...], "rows": {contact_id: fact table row},
+    "checks": {subject: bitset of the fact table rows that pass}}, read it with matrix_lookup.
+    """
+    table = contact_facts.get_table(config=config, tidyhq_cache=tidyhq_cache)
+    if contact_ids is None:
+        contact_ids = table["contact_ids"]
+    contact_ids = [str(contact_id) for contact_id in contact_ids]
+    now = time.time()
+
+    # Several tasks share a check, each check is only evaluated once
+    results = {
+        check: fact_checks[check.__name__](table, now)
+        for check in set(task_checks.values())
+    }
+
+    return {
+        "contacts": contact_ids,
+        "tasks": list(task_checks),
+        "rows": {
+            contact_id: table["rows"].get(contact_id) for contact_id in contact_ids
+        },
+        "checks": {subject: results[check] for subject, check in task_checks.items()},
+    }
 
-    key_status = tidyhq.get_custom_field(
-        config=config,
-        contact_id=contact_id,
-        cache=tidyhq_cache,
-        field_map_name="key_status",
-    )
 
-    if not key_status:
+def matrix_lookup(eligibility: dict | None, contact_id, subject: str) -> bool | None:
+    """Look up a check result in an eligibility matrix. Returns None if it isn't covered."""
+    if not eligibility or contact_id is None:
+        return None
+    contact_id = str(contact_id)
+    if contact_id not in eligibility["rows"] or subject not in eligibility["checks"]:
+        return None
+    row = eligibility["rows"][contact_id]
+    if row is None:
         return False
+    return bool(eligibility["checks"][subject] >> row & 1)
+
 
-    for value in key_status["value"]:
-        if value["title"] == "Enabled":
-            return True
-    return False
+def eligible_tasks(eligibility: dict, contact_id) -> list[str]:
+    """Return the tasks in an eligibility matrix that a contact has completed."""
+    return [
+        subject
+        for subject in eligibility["tasks"]
+        if matrix_lookup(eligibility, contact_id, subject)
+    ]
 
 
 def check_all_tasks(
@@ -429,41 +309,13 @@ def check_all_tasks(
     tidyhq_cache: dict,
     project_id: str,
     task_statuses: dict,
+    eligibility: dict | None = None,
 ) -> int:
-    """Check for incomplete tasks that have a mapped function to check if they are complete."""
+    """Check for incomplete tasks that have a mapped function to check if they are complete.
+
+    Results are read from eligibility (see eligibility_matrix) where it covers the contact.
+    """
     made_changes = 0
-    task_function_map = {
-        "Join Slack": joined_slack,
-        "Signed up as a visitor": visitor_signup,
-        "Signed up as a member": member_signup,
-        "Discussed moving to membership": member_signup,
-        "Completed new member induction": member_induction,
-        "Completed new visitor induction": visitor_induction,
-        "Completed keyholder induction": keyholder_induction,
-        "Confirmed photo on tidyhq": id_photo,
-        "Confirmed paying via bank": check_payment_method,
-        "Send bond invoice": bond_invoice_sent,
-        "Added to billing groups": check_billing_groups,
-        "Received at least one tool induction": at_least_one_tool,
-        "Proof of concession sighted": concession_sighted,
-        "Held membership for at least two weeks": member_2week,
-        "Confirmed bond invoice paid": bond_invoice_paid,
-        "Has valid emergency contact details": valid_emergency,
-        "Keyholder motion put to committee": has_key,
-        "Keyholder motion successful": has_key,
-        "Send keyholder documentation": has_key,
-        "Send bond invoice": has_key,
-        "Confirmed bond invoice paid": has_key,
-        "No indications of Code of Conduct violations": has_key,
-        "Competent to decide who can come in outside of events": has_key,
-        "Works well unsupervised": has_key,
-        "Undertakes tasks safely": has_key,
-        "Cleans own work area": has_key,
-        "Communicates issues to Management Committee if they arise": has_key,
-        "Offered backing for key": has_key,
-        "Planned first project": member_6month,
-        "No history of invoice deliquency": member_18month,
-    }
 
     # Find all user stories that include our bot managed tag
     stories = taigacon.user_stories.list(project=project_id, tags="bot-managed")
@@ -483,14 +335,21 @@ def check_all_tasks(
             ]:
                 logger.debug(f"Task {task.subject} is not complete, optional, or N/A")
                 continue
-            if task.subject not in task_function_map:
+            if task.subject not in task_checks:
                 logger.debug(f"No function found for task {task.subject}")
                 continue
 
             logger.debug(f"Checking task {task.subject}")
-            check = task_function_map[task.subject](
-                config=config, tidyhq_cache=tidyhq_cache, contact_id=tidyhq_id
-            )
+            check = matrix_lookup(eligibility, tidyhq_id, task.subject)
+            if check is None:
+                check = run_check(
+                    task_checks[task.subject],
+                    config=config,
+                    contact_id=tidyhq_id,
+                    tidyhq_cache=tidyhq_cache,
+                )
+            else:
+                check_stats["matrix"] += 1
 
             # If the check is successful, mark the task as complete
             if check:
@@ -511,7 +370,7 @@ def check_all_tasks(
 
             if task.subject == "Proof of concession sighted":
                 if concession_not_needed(
-                    contact_id=tidyhq_id, tidyhq_cache=tidyhq_cache
+                    contact_id=tidyhq_id, tidyhq_cache=tidyhq_cache, config=config
                 ):
                     logger.debug(
                         f"Contact {tidyhq_id} does not need to provide proof of concession"
@@ -531,4 +390,7 @@ def check_all_tasks(
                             f"Failed to mark task {task.subject} as not applicable"
                         )
 
+    logger.info(
+        f"Task checks: {check_stats['matrix']} from the eligibility matrix, {check_stats['hits']} reused, {check_stats['misses']} evaluated"
+    )
     return made_changes
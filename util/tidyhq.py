@@ -585,22 +585,25 @@ def get_membership_type(contact_id, tidyhq_cache):
         logger.debug(f"Contact {contact_id} has no memberships")
         return "None"
 
-    most_recent = return_most_recent_membership(memberships)
+    return classify_membership(return_most_recent_membership(memberships))
 
-    # Check if the most recent membership is expired
-    if most_recent["state"] == "expired":
+
+def classify_membership(membership: dict) -> str | None:
+    """Returns the type of a single membership, see get_membership_type."""
+    # Check if the membership is expired
+    if membership["state"] == "expired":
         return "Expired"
 
-    elif "Concession" in most_recent["membership_level"]["name"]:
+    elif "Concession" in membership["membership_level"]["name"]:
         return "Concession"
 
-    elif "Full" in most_recent["membership_level"]["name"]:
+    elif "Full" in membership["membership_level"]["name"]:
         return "Full"
 
-    elif "Associate" in most_recent["membership_level"]["name"]:
+    elif "Associate" in membership["membership_level"]["name"]:
         return "Visitor"
 
-    elif "Sponsor" in most_recent["membership_level"]["name"]:
+    elif "Sponsor" in membership["membership_level"]["name"]:
         return "Sponsor"
 
     return None
@@ -681,6 +684,54 @@ def map_taiga_to_slack(
         return None
 
 
+def identity_index(
+    tidyhq_cache: dict, config: dict, key_field: str, value_field: str
+) -> dict[str, str]:
+    """Map one custom field to another for every contact in a single pass over the contacts.
+
+    Fields are named as in the config file, eg "taiga" and "slack".
+    The first contact with a given key wins, like the map_ functions.
+    """
+    index = {}
+    for contact in tidyhq_cache["contacts"]:
+        key = get_custom_field(
+            config=config, contact=contact, cache=tidyhq_cache, field_map_name=key_field
+        )
+        if not key or str(key["value"]) in index:
+            continue
+        value = get_custom_field(
+            config=config,
+            contact=contact,
+            cache=tidyhq_cache,
+            field_map_name=value_field,
+        )
+        index[str(key["value"])] = value["value"] if value else None
+    return {key: value for key, value in index.items() if value}
+
+
+def taiga_to_slack_index(tidyhq_cache: dict, config: dict) -> dict[str, str]:
+    """Map every Taiga user ID in the cache to a Slack user ID.
+
+    Use this instead of map_taiga_to_slack when looking up many users."""
+    return identity_index(tidyhq_cache, config, key_field="taiga", value_field="slack")
+
+
+def slack_to_taiga_index(tidyhq_cache: dict, config: dict) -> dict[str, int]:
+    """Map every Slack user ID in the cache to a Taiga user ID.
+
+    Use this instead of map_slack_to_taiga when looking up many users.
+    Contacts with a Taiga ID that isn't a number are skipped."""
+    index = {}
+    for slack_id, taiga_id in identity_index(
+        tidyhq_cache, config, key_field="slack", value_field="taiga"
+    ).items():
+        try:
+            index[slack_id] = int(taiga_id)
+        except (TypeError, ValueError):
+            logger.error(f"Invalid Taiga ID {taiga_id} for Slack user {slack_id}")
+    return index
+
+
 def map_slack_to_taiga(tidyhq_cache: dict, slack_id: str, config: dict) -> int | None:
     """Map Slack user IDs to Taiga user IDs."""
 